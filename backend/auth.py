@@ -0,0 +1,92 @@
+"""
+Authentication dependency - resolves the user that owns a request
+All debt and company data is scoped by the returned user ID, so the ID comes
+from a credential the server can check rather than from anything the client
+may simply claim. Clients send "Authorization: Bearer <token>", where a token
+is the user ID plus an HMAC-SHA256 signature of it under AUTH_SECRET; only a
+holder of the secret can issue one. Without AUTH_SECRET every request is
+refused. The profiling endpoints, which see every user's requests, take a
+separate admin token (PROFILING_TOKEN) instead.
+
+Issue a token for a user with:
+
+    python -m backend.auth issue <user_id>
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import re
+from typing import Optional
+from fastapi import Header, HTTPException
+from core.config import settings
+
+# User IDs end up in every query filter, so keep them short and predictable
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+def sign(user_id: str) -> str:
+    """URL-safe HMAC-SHA256 signature of a user ID under AUTH_SECRET"""
+    digest = hmac.new(settings.AUTH_SECRET.encode(), user_id.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def issue_token(user_id: str) -> str:
+    """Bearer token for a user ("<user_id>.<signature>")"""
+    if not settings.AUTH_SECRET:
+        raise ValueError("AUTH_SECRET is not set")
+    if not USER_ID_PATTERN.match(user_id):
+        raise ValueError(f"Invalid user ID '{user_id}'")
+    return f"{user_id}.{sign(user_id)}"
+
+def verify_token(token: str) -> Optional[str]:
+    """The user ID a token was issued for, or None if it is malformed or forged"""
+    # User IDs may contain dots; the signature never does
+    user_id, _, signature = token.rpartition(".")
+    if not settings.AUTH_SECRET or not USER_ID_PATTERN.match(user_id):
+        return None
+    if not hmac.compare_digest(signature, sign(user_id)):
+        return None
+    return user_id
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> str:
+    """Return the user ID of the request's bearer token"""
+    if not settings.AUTH_SECRET:
+        raise HTTPException(status_code=503, detail="Authentication is not configured (AUTH_SECRET is not set)")
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise HTTPException(status_code=401, detail="Missing bearer token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+    user_id = verify_token(token.strip())
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid bearer token",
+                            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'})
+    return user_id
+
+def valid_profiling_token(token: Optional[str]) -> bool:
+    """Whether token is the PROFILING_TOKEN admin token (never while it is unset)"""
+    if not settings.PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.PROFILING_TOKEN.encode())
+
+async def require_profiling_token(x_profile_token: Optional[str] = Header(None)) -> None:
+    """Admit only the PROFILING_TOKEN admin token (for /debug)"""
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=503, detail="Profile access is not configured (PROFILING_TOKEN is not set)")
+    if not valid_profiling_token(x_profile_token):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Profile-Token")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Issue API bearer tokens")
+    commands = parser.add_subparsers(dest="command", required=True)
+    issue = commands.add_parser("issue", help="Print a token for a user ID")
+    issue.add_argument("user_id")
+    args = parser.parse_args()
+    try:
+        print(issue_token(args.user_id))
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Company catalog - built-in companies merged with each user's custom ones
+The catalog is versioned by the storage's per-user change counter (and a
+hash of the built-in list), so clients can cache it and revalidate with
+If-None-Match. Built catalogs are kept in a small per-process LRU keyed on
+that version.
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Tuple
+
+# Common BNPL and financial companies in Malaysia, offered to every user
+BUILTIN_COMPANIES = [
+    "Atome",
+    "Grab PayLater",
+    "Shopee PayLater",
+    "Lazada PayLater",
+    "Pace",
+    "Rely",
+    "Hoolah",
+    "Maybank",
+    "CIMB",
+    "Public Bank",
+    "RHB Bank",
+    "Hong Leong Bank",
+    "AmBank",
+    "OCBC",
+    "UOB",
+    "Standard Chartered",
+    "HSBC",
+    "Citibank",
+]
+
+# Changes whenever the built-in list does, so deploys invalidate cached catalogs
+BUILTIN_REVISION = hashlib.blake2b("\n".join(BUILTIN_COMPANIES).encode(), digest_size=4).hexdigest()
+
+# Catalogs kept per process (one per user and version)
+CATALOG_CACHE_SIZE = 256
+
+_catalogs: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+
+def catalog_version(counter: int) -> str:
+    """Version stamp for a user's catalog"""
+    return f"{counter}-{BUILTIN_REVISION}"
+
+async def get_company_catalog(storage, user_id: str) -> dict:
+    """{"version", "companies": merged sorted names, "custom": [{"id", "name"}]}"""
+    version = catalog_version(await storage.get_company_catalog_version(user_id))
+    key = (user_id, version)
+    catalog = _catalogs.get(key)
+    if catalog is not None:
+        _catalogs.move_to_end(key)
+        return catalog
+
+    custom = await storage.get_custom_companies(user_id)
+    catalog = {
+        "version": version,
+        "companies": sorted(set(BUILTIN_COMPANIES).union(company["name"] for company in custom)),
+        "custom": custom
+    }
+    _catalogs[key] = catalog
+    while len(_catalogs) > CATALOG_CACHE_SIZE:
+        _catalogs.popitem(last=False)
+    return catalog
@@ -1,17 +1,78 @@
 """
 MongoDB connection setup using Motor (async driver)
+The client is created on first use in each process rather than at import:
+a Motor client must not be shared across a fork, so every API worker
+(including ones forked from a preloaded app) opens its own connection pool.
+
+Two database handles share that client: get_database() always reads from the
+primary (writes and the reads that must see them), while
+get_analytics_database() may read from secondaries within a staleness bound
+so dashboard aggregations, search and exports stay off the primary.
 """
+import os
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import ReadPreference, make_read_preference, read_pref_mode_from_name
 from core.config import settings
+from backend.profiling import MongoCommandTimer
+from backend.request_log import MongoCommandLog
+
+_client: Optional[AsyncIOMotorClient] = None
+# Process that created _client; a different PID means we are in a forked child
+_client_pid: Optional[int] = None
+
+def get_client():
+    """Returns this process's MongoDB client (used to start sessions/transactions)"""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        # Per-request database time is always logged; per-command timings only while profiling
+        listeners = [MongoCommandLog()]
+        if settings.PROFILING_ENABLED:
+            listeners.append(MongoCommandTimer())
+        _client = AsyncIOMotorClient(settings.MONGODB_URI, event_listeners=listeners)
+        _client_pid = os.getpid()
+    return _client
+
+def close_client():
+    """Close this process's client, if it has one; the next call to get_client reconnects"""
+    global _client
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client = None
 
-# Initialize MongoDB client
-client = AsyncIOMotorClient(settings.MONGODB_URI)
-database = client[settings.MONGODB_DB_NAME]
+def read_concern(level: str) -> ReadConcern:
+    """Read concern for a configured level ("" leaves it to the server)"""
+    return ReadConcern(level or None)
+
+def analytics_read_preference():
+    """Read preference for analytical reads, from the MONGODB_ANALYTICS_* settings"""
+    mode = read_pref_mode_from_name(settings.MONGODB_ANALYTICS_READ_PREFERENCE)
+    if mode == ReadPreference.PRIMARY.mode:
+        # A staleness bound is only valid when secondaries may be read
+        return ReadPreference.PRIMARY
+    return make_read_preference(mode, None, settings.MONGODB_ANALYTICS_MAX_STALENESS_SECONDS)
 
 def get_database():
-    """Returns the MongoDB database instance"""
-    return database
+    """Returns the MongoDB database instance (primary reads, for writes and transactional reads)"""
+    return get_client().get_database(
+        settings.MONGODB_DB_NAME,
+        read_preference=ReadPreference.PRIMARY,
+        read_concern=read_concern(settings.MONGODB_READ_CONCERN)
+    )
+
+def get_analytics_database():
+    """Returns a database handle for analytical reads that tolerate bounded staleness"""
+    return get_client().get_database(
+        settings.MONGODB_DB_NAME,
+        read_preference=analytics_read_preference(),
+        read_concern=read_concern(settings.MONGODB_ANALYTICS_READ_CONCERN)
+    )
 
 def get_collection():
     """Returns the debts collection"""
-    return database[settings.MONGODB_COLLECTION]
\ No newline at end of file
+    return get_database()[settings.MONGODB_COLLECTION]
+
+def get_analytics_collection():
+    """Returns the debts collection for analytical reads"""
+    return get_analytics_database()[settings.MONGODB_COLLECTION]
@@ -1,76 +1,883 @@
 """
 CRUD operations for debt records in MongoDB
 """
-from typing import List, Optional, Dict, Any
+import re
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import List, Optional, Dict, Any, Tuple
 from bson import ObjectId
-from pymongo import ReturnDocument
-from .connection import get_collection
+from pymongo import ASCENDING, DESCENDING, TEXT, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from core.config import settings
+from backend.money import LEGACY_CURRENCY, amounts_to_cents, from_cents, parse_cents
+from .connection import (
+    close_client, get_analytics_collection, get_analytics_database, get_client, get_collection, get_database
+)
+from .storage import JOB_ACTIVE_STATES, JOB_FAILED, JOB_QUEUED, DebtArchived, VersionConflict
+from .history import (
+    EVENT_CREATED, EVENT_UPDATED, EVENT_DELETED, TRACKED_FIELDS,
+    apply_event, event_state, rollup_deltas, rollups_from_events, utc_now
+)
 
 def debt_helper(debt) -> dict:
     """Convert MongoDB document to dictionary"""
     return {
         "id": str(debt["_id"]),
         "company_name": debt["company_name"],
-        "amount_owed": debt["amount_owed"],
-        "minimum_payment": debt["minimum_payment"],
+        "amount_owed": from_cents(debt["amount_owed_cents"]),
+        "minimum_payment": from_cents(debt["minimum_payment_cents"]),
+        "currency": debt["currency"],
         "due_date": debt["due_date"],
         "status": debt["status"],
-        "notes": debt.get("notes", "")
+        "notes": debt.get("notes", ""),
+        "version": debt.get("version", 1)
     }
 
-async def create_debt(debt_data: dict) -> dict:
+def archived_debt_helper(debt) -> dict:
+    """Convert an archived MongoDB document to dictionary"""
+    return {**debt_helper(debt), "paid_at": debt["paid_at"].isoformat()}
+
+# Soft-deleted debts stay in place until the TTL index purges them;
+# every read and write filters them out with this condition
+LIVE = {"deleted_at": None}
+ARCHIVE_COLLECTION = "debts_archive"
+PAID_OFF = "Paid Off"
+
+# Projection matching debt_helper, applied inside MongoDB so list reads
+# come back ready to serialise without a per-document copy in Python
+DEBT_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "company_name": 1,
+    "amount_owed": {"$divide": ["$amount_owed_cents", 100]},
+    "minimum_payment": {"$divide": ["$minimum_payment_cents", 100]},
+    "currency": 1,
+    "due_date": 1,
+    "status": 1,
+    "notes": {"$ifNull": ["$notes", ""]},
+    "version": {"$ifNull": ["$version", 1]}
+}
+# DEBT_PROJECTION plus the stored integer amounts, for exports
+DEBT_CENTS_PROJECTION = {**DEBT_PROJECTION, "amount_owed_cents": 1, "minimum_payment_cents": 1}
+
+async def ensure_indexes():
+    """Create per-user indexes and assign unowned legacy documents to the default user"""
+    database = get_database()
+    for name in (settings.MONGODB_COLLECTION, "companies"):
+        await database[name].update_many(
+            {"user_id": {"$exists": False}},
+            {"$set": {"user_id": settings.DEFAULT_USER_ID}}
+        )
+
+    # Optimistic concurrency: every write bumps version, conditional updates match on it
+    await database[settings.MONGODB_COLLECTION].update_many(
+        {"version": {"$exists": False}},
+        {"$set": {"version": 1}}
+    )
+    await migrate_amounts_to_cents(database)
+
+    # Every query leads on user_id so each tenant only ever scans its own keys
+    await database[settings.MONGODB_COLLECTION].create_index(
+        [("user_id", ASCENDING), ("status", ASCENDING), ("due_date", ASCENDING)],
+        name="user_status_due_date"
+    )
+    # Company names are unique per user ignoring case, so "Maybank" and
+    # "maybank" are one company. Catalogs written before that index existed
+    # may lack name_lower or repeat names; duplicates merge into the oldest.
+    await database["companies"].update_many(
+        {"name_lower": {"$exists": False}},
+        [{"$set": {"name_lower": {"$toLower": "$name"}}}]
+    )
+    await dedupe_companies(database, "name_lower")
+    company_indexes = await database["companies"].index_information()
+    if "user_name" in company_indexes:
+        await database["companies"].drop_index("user_name")
+    if "user_name_lower" in company_indexes and not company_indexes["user_name_lower"].get("unique"):
+        await database["companies"].drop_index("user_name_lower")
+    # Also serves anchored case-insensitive prefix lookups for type-ahead
+    await database["companies"].create_index(
+        [("user_id", ASCENDING), ("name_lower", ASCENDING)],
+        name="user_name_lower",
+        unique=True
+    )
+
+    # Full-text search over company names and notes; the user_id prefix keeps
+    # each tenant's text index keys together (queries must match user_id)
+    await database[settings.MONGODB_COLLECTION].create_index(
+        [("user_id", ASCENDING), ("company_name", TEXT), ("notes", TEXT)],
+        name="user_text_search",
+        weights={"company_name": 3, "notes": 1}
+    )
+
+    # History log and snapshots, read per user in time/insertion order
+    await database["debt_events"].create_index(
+        [("user_id", ASCENDING), ("ts", ASCENDING)],
+        name="user_ts"
+    )
+    await database["debt_events"].create_index(
+        [("user_id", ASCENDING), ("_id", ASCENDING)],
+        name="user_id_order"
+    )
+    await database["debt_snapshots"].create_index(
+        [("user_id", ASCENDING), ("ts", DESCENDING)],
+        name="user_ts_desc"
+    )
+    # Buckets written before amounts were stored as cents are rebuilt below
+    if await database["debt_rollups"].find_one({"amount_cents": {"$exists": False}}, projection={"_id": 1}):
+        await database["debt_rollups"].delete_many({})
+    if "user_day_bucket" in await database["debt_rollups"].index_information():
+        await database["debt_rollups"].drop_index("user_day_bucket")
+    await database["debt_rollups"].create_index(
+        [("user_id", ASCENDING), ("day", ASCENDING), ("status", ASCENDING),
+         ("company_name", ASCENDING), ("currency", ASCENDING)],
+        name="user_day_currency_bucket",
+        unique=True
+    )
+
+    # Soft deletes expire through TTL indexes; paid-off debts are archived by paid_at
+    await database[settings.MONGODB_COLLECTION].update_many(
+        {"status": PAID_OFF, "paid_at": {"$exists": False}},
+        {"$set": {"paid_at": utc_now()}}
+    )
+    await database[settings.MONGODB_COLLECTION].create_index(
+        [("status", ASCENDING), ("paid_at", ASCENDING)],
+        name="status_paid_at"
+    )
+    await database[ARCHIVE_COLLECTION].create_index(
+        [("user_id", ASCENDING), ("paid_at", DESCENDING), ("_id", DESCENDING)],
+        name="user_paid_at_desc"
+    )
+    retention = settings.DELETED_RETENTION_DAYS * 86400
+    for name in (settings.MONGODB_COLLECTION, ARCHIVE_COLLECTION):
+        await ensure_ttl_index(database, name, "deleted_at", retention)
+
+    # Recurring templates, listed per user and swept by materialized_through;
+    # each (template, due date) occurrence is stored at most once
+    await database[TEMPLATES_COLLECTION].create_index(
+        [("user_id", ASCENDING), ("company_name", ASCENDING)],
+        name="user_company_name"
+    )
+    await database[TEMPLATES_COLLECTION].create_index("materialized_through", name="materialized_through")
+    await database[settings.MONGODB_COLLECTION].create_index(
+        [("user_id", ASCENDING), ("template_id", ASCENDING), ("due_date", ASCENDING)],
+        name="user_template_due_date",
+        unique=True,
+        partialFilterExpression={"template_id": {"$exists": True}}
+    )
+
+    # Background jobs, listed per user and expired once finished
+    await database[JOBS_COLLECTION].create_index(
+        [("user_id", ASCENDING), ("created_at", DESCENDING)],
+        name="user_created_at_desc"
+    )
+    await ensure_ttl_index(database, JOBS_COLLECTION, "finished_at", settings.JOB_RETENTION_DAYS * 86400)
+
+    await seed_history()
+    if not await database["debt_rollups"].find_one({}, projection={"_id": 1}):
+        await rebuild_rollups()
+
+async def dedupe_companies(database, key: str) -> int:
+    """Delete all but the oldest company per user and key field, so the key can be made unique
+
+    Returns how many duplicates were removed; the catalogs they came from are
+    bumped so clients drop their cached copies.
+    """
+    duplicates = await database["companies"].aggregate([
+        {"$group": {"_id": {"user_id": "$user_id", "key": f"${key}"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True).to_list(length=None)
+    removed = 0
+    for group in duplicates:
+        # ObjectIds sort by creation time, so the first was stored first
+        result = await database["companies"].delete_many({"_id": {"$in": sorted(group["ids"])[1:]}})
+        removed += result.deleted_count
+        await bump_company_catalog_version(group["_id"]["user_id"])
+    return removed
+
+async def migrate_amounts_to_cents(database, batch_size: int = 1000):
+    """Convert debts stored with decimal amounts to integer cents in the legacy currency
+
+    Converted documents no longer match, so an interrupted migration simply
+    continues where it stopped.
+    """
+    for name in (settings.MONGODB_COLLECTION, ARCHIVE_COLLECTION):
+        collection = database[name]
+        while True:
+            batch = await collection.find(
+                {"amount_owed_cents": {"$exists": False}},
+                projection={"amount_owed": 1, "minimum_payment": 1, "currency": 1}
+            ).limit(batch_size).to_list(length=None)
+            if not batch:
+                break
+            await collection.bulk_write([
+                UpdateOne({"_id": debt["_id"]}, {
+                    "$set": {
+                        "amount_owed_cents": parse_cents(debt.get("amount_owed")),
+                        "minimum_payment_cents": parse_cents(debt.get("minimum_payment")),
+                        "currency": debt.get("currency") or LEGACY_CURRENCY
+                    },
+                    "$unset": {"amount_owed": "", "minimum_payment": ""}
+                })
+                for debt in batch
+            ], ordered=False)
+
+async def ensure_ttl_index(database, collection_name: str, field: str, seconds: int):
+    """Create a TTL index on field, or update its expiry if the setting changed"""
+    index_name = f"{field}_ttl"
+    try:
+        await database[collection_name].create_index(field, name=index_name, expireAfterSeconds=seconds)
+    except OperationFailure:
+        await database.command("collMod", collection_name, index={"name": index_name, "expireAfterSeconds": seconds})
+
+# ============ HISTORY ============
+
+@asynccontextmanager
+async def write_session():
+    """Yield a session with an open transaction when enabled, otherwise None"""
+    if not settings.MONGODB_TRANSACTIONS:
+        yield None
+        return
+    async with await get_client().start_session() as session:
+        async with session.start_transaction():
+            yield session
+
+# Fields needed from a debt's previous version to roll back its bucket
+TRACKED_PROJECTION = {field: 1 for field in TRACKED_FIELDS}
+
+async def record_events(user_id: str, changes: List[Tuple[str, Any, Optional[dict], Optional[dict]]], session=None):
+    """Log (event type, debt _id, debt before, debt after) changes and update today's rollup buckets"""
+    if not changes:
+        return
+    ts = utc_now()
+    events = [
+        {"user_id": user_id, "debt_id": str(debt_id), "type": event_type, "ts": ts, "state": event_state(after)}
+        for event_type, debt_id, _before, after in changes
+    ]
+    database = get_database()
+    await database["debt_events"].insert_many(events, session=session)
+    await database["debt_event_counters"].update_one(
+        {"_id": user_id}, {"$inc": {"since_snapshot": len(events)}}, upsert=True, session=session
+    )
+
+    day = ts.date().isoformat()
+    bucket_updates = [
+        UpdateOne(
+            {"user_id": user_id, "day": day, "status": status, "company_name": company_name, "currency": currency},
+            {"$inc": {"amount_cents": cents, "count": count}},
+            upsert=True
+        )
+        for (status, company_name, currency), (cents, count) in rollup_deltas(changes).items()
+    ]
+    if bucket_updates:
+        await database["debt_rollups"].bulk_write(bucket_updates, ordered=False, session=session)
+
+async def checkpoint_if_due(user_id: str):
+    """Write a compacted snapshot once enough events have built up since the last one"""
+    counters = get_database()["debt_event_counters"]
+    counter = await counters.find_one({"_id": user_id})
+    if counter and counter.get("since_snapshot", 0) >= settings.HISTORY_SNAPSHOT_INTERVAL:
+        await create_snapshot(user_id)
+
+async def create_snapshot(user_id: str):
+    """Fold every event since the latest snapshot into a new snapshot"""
+    database = get_database()
+    snapshot = await database["debt_snapshots"].find_one({"user_id": user_id}, sort=[("ts", DESCENDING)])
+    state = dict(snapshot["state"]) if snapshot else {}
+
+    query = {"user_id": user_id}
+    if snapshot:
+        query["_id"] = {"$gt": snapshot["last_event_id"]}
+    last_event = None
+    async for event in database["debt_events"].find(query).sort("_id", ASCENDING):
+        apply_event(state, event)
+        last_event = event
+
+    if last_event is None:
+        return
+    await database["debt_snapshots"].insert_one({
+        "user_id": user_id,
+        "ts": last_event["ts"],
+        "last_event_id": last_event["_id"],
+        "state": state
+    })
+    await database["debt_event_counters"].update_one({"_id": user_id}, {"$set": {"since_snapshot": 0}})
+
+async def seed_history():
+    """Log a created event for debts that predate the history log"""
+    database = get_database()
+    if await database["debt_events"].find_one({}, projection={"_id": 1}):
+        return
+    changes_by_user: Dict[str, list] = {}
+    async for debt in get_collection().find(LIVE):
+        changes_by_user.setdefault(debt["user_id"], []).append((EVENT_CREATED, debt["_id"], None, debt))
+    for user_id, changes in changes_by_user.items():
+        await record_events(user_id, changes)
+
+# Attempts at a user's rollup rebuild that conflicts with concurrent writes
+REBUILD_ATTEMPTS = 3
+
+async def rebuild_rollups(user_id: Optional[str] = None):
+    """Recompute daily rollup buckets from the event log (all users by default)
+
+    Each user's rebuild reads the events and replaces the buckets in one
+    transaction (when MONGODB_TRANSACTIONS is enabled, as for the writes), so
+    an event's $inc either lands before the read or conflicts with the rebuild,
+    which is then retried; it is never wiped out by the replacement.
+    """
+    database = get_database()
+    user_ids = [user_id] if user_id else await database["debt_events"].distinct("user_id")
+    for uid in user_ids:
+        for attempt in range(1, REBUILD_ATTEMPTS + 1):
+            try:
+                async with write_session() as session:
+                    await rebuild_user_rollups(database, uid, session)
+                break
+            except OperationFailure as e:
+                if attempt == REBUILD_ATTEMPTS or not e.has_error_label("TransientTransactionError"):
+                    raise
+
+async def rebuild_user_rollups(database, user_id: str, session=None):
+    """Replace one user's rollup buckets with those replayed from their events"""
+    events = database["debt_events"].find({"user_id": user_id}, session=session).sort("_id", ASCENDING)
+    buckets = rollups_from_events(await events.to_list(length=None))
+    await database["debt_rollups"].delete_many({"user_id": user_id}, session=session)
+    documents = [
+        {"user_id": user_id, "day": day, "status": status, "company_name": company_name, "currency": currency,
+         "amount_cents": cents, "count": count}
+        for (day, status, company_name, currency), (cents, count) in buckets.items()
+    ]
+    if documents:
+        await database["debt_rollups"].insert_many(documents, session=session)
+
+async def get_rollup_buckets(user_id: str, start: date, end: date) -> Tuple[List[dict], List[dict]]:
+    """Summed buckets before start, plus daily buckets for [start, end] ordered by day"""
+    rollups = get_analytics_database()["debt_rollups"]
+    baseline = await rollups.aggregate([
+        {"$match": {"user_id": user_id, "day": {"$lt": start.isoformat()}}},
+        {"$group": {
+            "_id": {"status": "$status", "company_name": "$company_name", "currency": "$currency"},
+            "amount_cents": {"$sum": "$amount_cents"}
+        }},
+        {"$project": {
+            "_id": 0, "status": "$_id.status", "company_name": "$_id.company_name",
+            "currency": "$_id.currency", "amount_cents": 1
+        }}
+    ]).to_list(length=None)
+    rows = await rollups.find(
+        {"user_id": user_id, "day": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+        projection={"_id": 0, "day": 1, "status": 1, "company_name": 1, "currency": 1, "amount_cents": 1}
+    ).sort("day", ASCENDING).to_list(length=None)
+    return baseline, rows
+
+async def get_state_as_of(user_id: str, before: datetime) -> Dict[str, dict]:
+    """Tracked debt fields as they stood just before a timestamp"""
+    database = get_analytics_database()
+    snapshot = await database["debt_snapshots"].find_one(
+        {"user_id": user_id, "ts": {"$lt": before}}, sort=[("ts", DESCENDING)]
+    )
+    state = dict(snapshot["state"]) if snapshot else {}
+
+    # Replay only the bounded tail of events written after the snapshot
+    query = {"user_id": user_id, "ts": {"$lt": before}}
+    if snapshot:
+        query["_id"] = {"$gt": snapshot["last_event_id"]}
+    async for event in database["debt_events"].find(query).sort("_id", ASCENDING):
+        apply_event(state, event)
+    return state
+
+async def get_events(user_id: str, start: datetime, end: datetime) -> List[dict]:
+    """History events with start <= ts < end, oldest first"""
+    events = get_analytics_database()["debt_events"].find(
+        {"user_id": user_id, "ts": {"$gte": start, "$lt": end}},
+        projection={"_id": 0, "debt_id": 1, "type": 1, "ts": 1, "state": 1}
+    ).sort([("ts", ASCENDING), ("_id", ASCENDING)])
+    return await events.to_list(length=None)
+
+# ============ DEBT OPERATIONS ============
+
+async def create_debt(user_id: str, debt_data: dict) -> dict:
     """Create a new debt record"""
     collection = get_collection()
-    result = await collection.insert_one(debt_data)
-    new_debt = await collection.find_one({"_id": result.inserted_id})
+    new_debt = {**amounts_to_cents(debt_data), "user_id": user_id, "version": 1}
+    if new_debt["status"] == PAID_OFF:
+        new_debt["paid_at"] = utc_now()
+    async with write_session() as session:
+        result = await collection.insert_one(new_debt, session=session)
+        await record_events(user_id, [(EVENT_CREATED, result.inserted_id, None, new_debt)], session=session)
+    await checkpoint_if_due(user_id)
     return debt_helper(new_debt)
 
-async def get_debt(debt_id: str) -> Optional[dict]:
-    """Retrieve a single debt record by ID"""
-    collection = get_collection()
-    debt = await collection.find_one({"_id": ObjectId(debt_id)})
+async def insert_debts(user_id: str, debts: List[dict], checkpoint: bool = True) -> int:
+    """Insert many validated debts with one insert_many, logging their created events"""
+    if not debts:
+        return 0
+    now = utc_now()
+    documents = [
+        {**amounts_to_cents(debt), "user_id": user_id, "version": 1, **({"paid_at": now} if debt["status"] == PAID_OFF else {})}
+        for debt in debts
+    ]
+    async with write_session() as session:
+        # insert_many fills in each document's _id for the events below
+        await get_collection().insert_many(documents, session=session)
+        await record_events(user_id, [(EVENT_CREATED, doc["_id"], None, doc) for doc in documents], session=session)
+    if checkpoint:
+        await checkpoint_if_due(user_id)
+    return len(documents)
+
+async def get_debt(user_id: str, debt_id: str) -> Optional[dict]:
+    """Retrieve a single debt record by ID, falling back to the archive"""
+    query = {"_id": ObjectId(debt_id), "user_id": user_id, **LIVE}
+    debt = await get_collection().find_one(query)
+    if debt is None:
+        debt = await get_database()[ARCHIVE_COLLECTION].find_one(query)
     if debt:
         return debt_helper(debt)
     return None
 
-async def get_all_debts(status: Optional[str] = None) -> List[dict]:
-    """Retrieve all debt records, optionally filtered by status"""
-    collection = get_collection()
-    query = {}
+async def get_all_debts(user_id: str, status: Optional[str] = None, stale_ok: bool = False,
+                        with_cents: bool = False) -> List[dict]:
+    """Retrieve all debt records, optionally filtered by status (from a secondary if stale_ok)"""
+    collection = get_analytics_collection() if stale_ok else get_collection()
+    query = {"user_id": user_id, **LIVE}
     if status:
         query["status"] = status
     
-    debts = []
-    async for debt in collection.find(query):
-        debts.append(debt_helper(debt))
-    return debts
+    pipeline = [{"$match": query}, {"$project": DEBT_CENTS_PROJECTION if with_cents else DEBT_PROJECTION}]
+    return await collection.aggregate(pipeline).to_list(length=None)
+
+async def search_debts(user_id: str, query: str, skip: int = 0, limit: int = 20) -> Dict[str, Any]:
+    """Full-text search over company names and notes, ranked by relevance"""
+    collection = get_analytics_collection()
+    match = {"user_id": user_id, "$text": {"$search": query}, **LIVE}
+
+    total = await collection.count_documents(match)
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"score": {"$meta": "textScore"}, "_id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": {**DEBT_PROJECTION, "score": {"$meta": "textScore"}}}
+    ]
+    results = await collection.aggregate(pipeline).to_list(length=None)
+    return {"total": total, "results": results}
+
+async def get_debt_composition(user_id: str, today: date) -> List[dict]:
+    """Exact cent totals per display status, company and currency"""
+    pipeline = [
+        {"$match": {"user_id": user_id, "amount_owed_cents": {"$gt": 0}, **LIVE}},
+        # Due dates are ISO strings, so they compare correctly as text
+        {"$group": {
+            "_id": {
+                "status": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$status", PAID_OFF]}, "then": "Paid Off"},
+                        {"case": {"$lt": ["$due_date", today.isoformat()]}, "then": "Overdue"}
+                    ],
+                    "default": "Active"
+                }},
+                "company": "$company_name",
+                "currency": "$currency"
+            },
+            "amount_cents": {"$sum": "$amount_owed_cents"},
+            "debts": {"$sum": 1}
+        }}
+    ]
+    rows = await get_analytics_collection().aggregate(pipeline).to_list(length=None)
+    return [
+        {
+            "display_status": row["_id"]["status"],
+            "company_name": row["_id"]["company"],
+            "currency": row["_id"]["currency"],
+            "amount_cents": row["amount_cents"],
+            "debts": row["debts"]
+        }
+        for row in rows
+    ]
 
-async def update_debt(debt_id: str, debt_data: dict) -> Optional[dict]:
-    """Update an existing debt record"""
+async def get_debts_due_between(user_id: str, start: date, end: date) -> List[dict]:
+    """Live debts due from start to end inclusive, with the template each came from"""
+    pipeline = [
+        {"$match": {"user_id": user_id, "due_date": {"$gte": start.isoformat(), "$lte": end.isoformat()}, **LIVE}},
+        {"$project": {**DEBT_PROJECTION, "template_id": {"$ifNull": ["$template_id", None]}}}
+    ]
+    return await get_collection().aggregate(pipeline).to_list(length=None)
+
+async def update_debt(user_id: str, debt_id: str, debt_data: dict, expected_version: Optional[int] = None) -> Optional[dict]:
+    """Update an existing debt record
+
+    With expected_version the write only applies if the stored version still
+    matches; otherwise VersionConflict is raised. Archived debts are read-only
+    and raise DebtArchived.
+    """
     collection = get_collection()
     
     # Remove None values from update data
-    update_data = {k: v for k, v in debt_data.items() if v is not None}
+    update_data = amounts_to_cents({k: v for k, v in debt_data.items() if v is not None})
     
     if not update_data:
         return None
     
-    updated_debt = await collection.find_one_and_update(
-        {"_id": ObjectId(debt_id)},
-        {"$set": update_data},
-        return_document=ReturnDocument.AFTER
-    )
+    update = {"$set": update_data, "$inc": {"version": 1}}
+    if "status" in update_data:
+        # $min keeps the original paid_at when an already paid-off debt is saved again
+        if update_data["status"] == PAID_OFF:
+            update["$min"] = {"paid_at": utc_now()}
+        else:
+            update["$unset"] = {"paid_at": ""}
+    
+    async with write_session() as session:
+        # The previous version lets the rollup move the old balance out of its bucket
+        query = {"_id": ObjectId(debt_id), "user_id": user_id, **LIVE}
+        if expected_version is not None:
+            query["version"] = expected_version
+        previous_debt = await collection.find_one_and_update(
+            query,
+            update,
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+        if previous_debt:
+            updated_debt = {**previous_debt, **update_data, "version": previous_debt.get("version", 1) + 1}
+            await record_events(
+                user_id, [(EVENT_UPDATED, updated_debt["_id"], previous_debt, updated_debt)], session=session
+            )
     
-    if updated_debt:
+    if previous_debt:
+        await checkpoint_if_due(user_id)
         return debt_helper(updated_debt)
+    if expected_version is not None:
+        current = await collection.find_one(
+            {"_id": ObjectId(debt_id), "user_id": user_id, **LIVE}, projection={"version": 1}
+        )
+        if current:
+            raise VersionConflict(current.get("version", 1))
+    if await get_database()[ARCHIVE_COLLECTION].find_one(
+        {"_id": ObjectId(debt_id), "user_id": user_id, **LIVE}, projection={"_id": 1}
+    ):
+        raise DebtArchived(debt_id)
     return None
 
-async def delete_debt(debt_id: str) -> bool:
-    """Delete a debt record"""
+async def delete_debt(user_id: str, debt_id: str) -> bool:
+    """Soft-delete a debt record (hot or archived); the TTL index purges it later"""
+    query = {"_id": ObjectId(debt_id), "user_id": user_id, **LIVE}
+    async with write_session() as session:
+        deleted = None
+        for collection in (get_collection(), get_database()[ARCHIVE_COLLECTION]):
+            deleted = await collection.find_one_and_update(
+                query, {"$set": {"deleted_at": utc_now()}, "$inc": {"version": 1}},
+                projection=TRACKED_PROJECTION, session=session
+            )
+            if deleted:
+                break
+        if deleted:
+            await record_events(user_id, [(EVENT_DELETED, deleted["_id"], deleted, None)], session=session)
+    if deleted:
+        await checkpoint_if_due(user_id)
+    return deleted is not None
+
+async def bulk_update_status(user_id: str, debt_ids: List[str], status: str) -> int:
+    """Set the status of many debt records in one write"""
+    collection = get_collection()
+    async with write_session() as session:
+        # Only debts whose status actually changes get a history event
+        changing = await collection.find(
+            {"_id": {"$in": [ObjectId(debt_id) for debt_id in debt_ids]}, "user_id": user_id,
+             "status": {"$ne": status}, **LIVE},
+            session=session
+        ).to_list(length=None)
+        if not changing:
+            return 0
+        if status == PAID_OFF:
+            update = {"$set": {"status": status, "paid_at": utc_now()}, "$inc": {"version": 1}}
+        else:
+            update = {"$set": {"status": status}, "$unset": {"paid_at": ""}, "$inc": {"version": 1}}
+        result = await collection.update_many(
+            {"_id": {"$in": [debt["_id"] for debt in changing]}, "user_id": user_id},
+            update,
+            session=session
+        )
+        await record_events(
+            user_id, [(EVENT_UPDATED, debt["_id"], debt, {**debt, "status": status}) for debt in changing], session=session
+        )
+    await checkpoint_if_due(user_id)
+    return result.modified_count
+
+async def bulk_delete_debts(user_id: str, debt_ids: List[str]) -> int:
+    """Soft-delete many debt records in one write"""
+    collection = get_collection()
+    query = {"_id": {"$in": [ObjectId(debt_id) for debt_id in debt_ids]}, "user_id": user_id, **LIVE}
+    async with write_session() as session:
+        existing = await collection.find(query, projection=TRACKED_PROJECTION, session=session).to_list(length=None)
+        if not existing:
+            return 0
+        result = await collection.update_many(
+            {**query, "_id": {"$in": [debt["_id"] for debt in existing]}},
+            {"$set": {"deleted_at": utc_now()}, "$inc": {"version": 1}},
+            session=session
+        )
+        await record_events(user_id, [(EVENT_DELETED, debt["_id"], debt, None) for debt in existing], session=session)
+    await checkpoint_if_due(user_id)
+    return result.modified_count
+
+# ============ ARCHIVE ============
+
+async def archive_paid_debts(paid_before: datetime, batch_size: int = 500) -> int:
+    """Move debts paid off before a cutoff from the hot collection to the archive (all users)
+
+    Balances do not change, so no history event is written. Copies are
+    upserted by _id, so a sweep interrupted part-way can simply run again.
+    """
     collection = get_collection()
-    result = await collection.delete_one({"_id": ObjectId(debt_id)})
+    archive = get_database()[ARCHIVE_COLLECTION]
+    query = {"status": PAID_OFF, "paid_at": {"$lt": paid_before}, **LIVE}
+    moved = 0
+    while True:
+        batch = await collection.find(query).limit(batch_size).to_list(length=None)
+        if not batch:
+            return moved
+        ids = [debt["_id"] for debt in batch]
+        async with write_session() as session:
+            await archive.bulk_write(
+                [ReplaceOne({"_id": debt["_id"]}, debt, upsert=True) for debt in batch], ordered=False, session=session
+            )
+            result = await collection.delete_many({**query, "_id": {"$in": ids}}, session=session)
+            if result.deleted_count < len(ids):
+                # A debt changed between the read and the delete: keep only its hot copy
+                still_hot = await collection.distinct("_id", {"_id": {"$in": ids}}, session=session)
+                await archive.delete_many({"_id": {"$in": still_hot}}, session=session)
+        moved += result.deleted_count
+
+async def purge_deleted_debts(deleted_before: datetime) -> int:
+    """Nothing to do for MongoDB - the deleted_at TTL indexes purge soft-deleted debts"""
+    return 0
+
+async def get_archived_debts(user_id: str, limit: int = 20, after: Optional[Tuple[datetime, str]] = None) -> Dict[str, Any]:
+    """One page of archived debts, most recently paid first
+
+    after is the (paid_at, id) of the last debt on the previous page; totals
+    are only computed for the first page.
+    """
+    archive = get_analytics_database()[ARCHIVE_COLLECTION]
+    query = {"user_id": user_id, **LIVE}
+    page = {"total": None, "amount_cents": None}
+    if after is None:
+        totals = await archive.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$currency", "total": {"$sum": 1}, "amount_cents": {"$sum": "$amount_owed_cents"}}}
+        ]).to_list(length=None)
+        page = {
+            "total": sum(row["total"] for row in totals),
+            "amount_cents": {row["_id"]: row["amount_cents"] for row in totals}
+        }
+    else:
+        # Keyset pagination on the (user_id, paid_at, _id) index - no skipped documents to scan
+        paid_at, last_id = after
+        query["$or"] = [
+            {"paid_at": {"$lt": paid_at}},
+            {"paid_at": paid_at, "_id": {"$lt": ObjectId(last_id)}}
+        ]
+
+    debts = await archive.find(query).sort([("paid_at", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1).to_list(length=None)
+    results = [archived_debt_helper(debt) for debt in debts[:limit]]
+    next_after = None
+    if len(debts) > limit:
+        next_after = (debts[limit - 1]["paid_at"], str(debts[limit - 1]["_id"]))
+    return {**page, "results": results, "next_after": next_after}
+
+# ============ RECURRING TEMPLATES ============
+
+TEMPLATES_COLLECTION = "debt_templates"
+
+def template_helper(template) -> dict:
+    """Convert MongoDB template document to dictionary"""
+    return {
+        "id": str(template["_id"]),
+        "company_name": template["company_name"],
+        "amount_owed": from_cents(template["amount_owed_cents"]),
+        "minimum_payment": from_cents(template["minimum_payment_cents"]),
+        "currency": template["currency"],
+        "notes": template.get("notes", ""),
+        "rule": template["rule"],
+        "start_date": template["start_date"],
+        "materialized_through": template["materialized_through"]
+    }
+
+async def create_template(user_id: str, template_data: dict) -> dict:
+    """Create a recurring debt template"""
+    template = {**amounts_to_cents(template_data), "user_id": user_id}
+    await get_database()[TEMPLATES_COLLECTION].insert_one(template)
+    return template_helper(template)
+
+async def get_templates(user_id: str) -> List[dict]:
+    """All of a user's templates, sorted by company"""
+    templates = get_database()[TEMPLATES_COLLECTION].find({"user_id": user_id}).sort("company_name", ASCENDING)
+    return [template_helper(template) async for template in templates]
+
+async def get_template(user_id: str, template_id: str) -> Optional[dict]:
+    """Retrieve a template by ID"""
+    template = await get_database()[TEMPLATES_COLLECTION].find_one({"_id": ObjectId(template_id), "user_id": user_id})
+    if template:
+        return template_helper(template)
+    return None
+
+async def update_template(user_id: str, template_id: str, template_data: dict) -> Optional[dict]:
+    """Update a template; only occurrences materialized afterwards see the change"""
+    update_data = amounts_to_cents({k: v for k, v in template_data.items() if v is not None})
+    if not update_data:
+        return await get_template(user_id, template_id)
+    template = await get_database()[TEMPLATES_COLLECTION].find_one_and_update(
+        {"_id": ObjectId(template_id), "user_id": user_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
+    )
+    if template:
+        return template_helper(template)
+    return None
+
+async def delete_template(user_id: str, template_id: str) -> bool:
+    """Delete a template, keeping the debts already materialized from it"""
+    result = await get_database()[TEMPLATES_COLLECTION].delete_one({"_id": ObjectId(template_id), "user_id": user_id})
     return result.deleted_count > 0
 
+async def get_templates_to_materialize(through: date, user_id: Optional[str] = None) -> List[dict]:
+    """Templates not yet materialized up to through (ISO days compare correctly as text)"""
+    query = {"materialized_through": {"$lt": through.isoformat()}}
+    if user_id:
+        query["user_id"] = user_id
+    templates = get_database()[TEMPLATES_COLLECTION].find(query)
+    return [{**template_helper(template), "user_id": template["user_id"]} async for template in templates]
+
+async def materialize_occurrences(user_id: str, template_id: str, debts: List[dict], through: date) -> int:
+    """Insert occurrences not stored yet, then move the template's watermark up to through"""
+    collection = get_collection()
+    documents = [
+        {**amounts_to_cents(debt), "user_id": user_id, "template_id": template_id, "version": 1}
+        for debt in debts
+    ]
+    async with write_session() as session:
+        if documents:
+            # Soft-deleted occurrences count as stored, so deleting one does not bring it back
+            stored = set(await collection.distinct(
+                "due_date",
+                {"user_id": user_id, "template_id": template_id, "due_date": {"$in": [doc["due_date"] for doc in documents]}},
+                session=session
+            ))
+            documents = [doc for doc in documents if doc["due_date"] not in stored]
+        if documents:
+            try:
+                await collection.insert_many(documents, ordered=False, session=session)
+            except BulkWriteError as e:
+                # Another process materialized some of them first; the unique index kept one copy
+                errors = e.details["writeErrors"]
+                if session is not None or any(error["code"] != 11000 for error in errors):
+                    raise
+                failed = {error["index"] for error in errors}
+                documents = [doc for index, doc in enumerate(documents) if index not in failed]
+            await record_events(
+                user_id, [(EVENT_CREATED, doc["_id"], None, doc) for doc in documents], session=session
+            )
+        # $max keeps a watermark another run already moved further
+        await get_database()[TEMPLATES_COLLECTION].update_one(
+            {"_id": ObjectId(template_id)}, {"$max": {"materialized_through": through.isoformat()}}, session=session
+        )
+    if documents:
+        await checkpoint_if_due(user_id)
+    return len(documents)
+
+# ============ JOBS ============
+
+JOBS_COLLECTION = "jobs"
+
+def job_helper(job) -> dict:
+    """Convert MongoDB job document to dictionary"""
+    return {
+        "id": str(job["_id"]),
+        "type": job["type"],
+        "params": job.get("params", {}),
+        "status": job["status"],
+        "progress": job.get("progress", 0.0),
+        "message": job.get("message"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "cancel_requested": job.get("cancel_requested", False),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+async def create_job(user_id: str, job_type: str, params: dict) -> dict:
+    """Record a new queued job"""
+    now = utc_now()
+    job = {
+        "user_id": user_id,
+        "type": job_type,
+        "params": params,
+        "status": JOB_QUEUED,
+        "progress": 0.0,
+        "cancel_requested": False,
+        "created_at": now,
+        "updated_at": now
+    }
+    await get_database()[JOBS_COLLECTION].insert_one(job)
+    return job_helper(job)
+
+async def get_job(user_id: str, job_id: str) -> Optional[dict]:
+    """Retrieve a job by ID"""
+    job = await get_database()[JOBS_COLLECTION].find_one({"_id": ObjectId(job_id), "user_id": user_id})
+    if job:
+        return job_helper(job)
+    return None
+
+async def list_jobs(user_id: str, limit: int = 20) -> List[dict]:
+    """Most recent jobs first"""
+    jobs = get_database()[JOBS_COLLECTION].find({"user_id": user_id}).sort("created_at", DESCENDING).limit(limit)
+    return [job_helper(job) async for job in jobs]
+
+async def update_job(job_id: str, fields: dict) -> Optional[dict]:
+    """Set job fields and return the updated job (workers read cancel_requested from it)"""
+    job = await get_database()[JOBS_COLLECTION].find_one_and_update(
+        {"_id": ObjectId(job_id)},
+        {"$set": {**fields, "updated_at": utc_now()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if job:
+        return job_helper(job)
+    return None
+
+async def request_job_cancel(user_id: str, job_id: str) -> Optional[dict]:
+    """Flag a queued or running job for cancellation"""
+    jobs = get_database()[JOBS_COLLECTION]
+    job = await jobs.find_one_and_update(
+        {"_id": ObjectId(job_id), "user_id": user_id, "status": {"$in": list(JOB_ACTIVE_STATES)}},
+        {"$set": {"cancel_requested": True}},
+        return_document=ReturnDocument.AFTER
+    )
+    if job is None:
+        # Already finished (or unknown); report it as it stands
+        return await get_job(user_id, job_id)
+    return job_helper(job)
+
+async def touch_jobs(job_ids: List[str]) -> int:
+    """Refresh updated_at on those of the jobs still queued/running, so they are not taken for stale"""
+    result = await get_database()[JOBS_COLLECTION].update_many(
+        {"_id": {"$in": [ObjectId(job_id) for job_id in job_ids]}, "status": {"$in": list(JOB_ACTIVE_STATES)}},
+        {"$set": {"updated_at": utc_now()}}
+    )
+    return result.modified_count
+
+async def fail_stale_jobs(updated_before: datetime) -> int:
+    """Mark queued/running jobs whose worker stopped reporting as failed"""
+    now = utc_now()
+    result = await get_database()[JOBS_COLLECTION].update_many(
+        {"status": {"$in": list(JOB_ACTIVE_STATES)}, "updated_at": {"$lt": updated_before}},
+        {"$set": {"status": JOB_FAILED, "error": "Interrupted by a server restart", "finished_at": now, "updated_at": now}}
+    )
+    return result.modified_count
+
+async def purge_jobs(finished_before: datetime) -> int:
+    """Nothing to do for MongoDB - the finished_at TTL index expires old jobs"""
+    return 0
+
 # ============ COMPANY OPERATIONS ============
 
 def company_helper(company) -> dict:
@@ -82,42 +889,121 @@ def company_helper(company) -> dict:
 
 async def get_companies_collection():
     """Get the companies collection"""
-    from .connection import get_database
     db = get_database()
     return db["companies"]
 
-async def get_all_companies() -> List[str]:
+async def get_all_companies(user_id: str) -> List[str]:
     """Retrieve all company names"""
     collection = await get_companies_collection()
     companies = []
-    async for company in collection.find().sort("name", 1):
+    async for company in collection.find({"user_id": user_id}).sort("name", 1):
         companies.append(company["name"])
     return companies
 
-async def add_company(company_name: str) -> dict:
-    """Add a new company name"""
+async def get_custom_companies(user_id: str) -> List[dict]:
+    """All companies with their IDs, sorted by name"""
     collection = await get_companies_collection()
+    companies = collection.find({"user_id": user_id}, projection={"name": 1}).sort("name", 1)
+    return [company_helper(company) async for company in companies]
+
+# One {_id: user_id, version} document per user, bumped on every company change
+CATALOG_VERSIONS_COLLECTION = "company_catalog_versions"
+
+async def get_company_catalog_version(user_id: str) -> int:
+    """Current company catalog version (0 before the first change)"""
+    doc = await get_database()[CATALOG_VERSIONS_COLLECTION].find_one({"_id": user_id})
+    return doc["version"] if doc else 0
+
+async def bump_company_catalog_version(user_id: str):
+    """Mark the user's company catalog as changed"""
+    await get_database()[CATALOG_VERSIONS_COLLECTION].update_one(
+        {"_id": user_id}, {"$inc": {"version": 1}}, upsert=True
+    )
+
+async def add_company(user_id: str, company_name: str) -> dict:
+    """Add a new company name (returning the stored company if one differs only in case)"""
+    collection = await get_companies_collection()
+    query = {"user_id": user_id, "name_lower": company_name.lower()}
     
     # Check if company already exists
-    existing = await collection.find_one({"name": company_name})
+    existing = await collection.find_one(query)
     if existing:
         return company_helper(existing)
     
     # Insert new company
-    result = await collection.insert_one({"name": company_name})
+    try:
+        result = await collection.insert_one({**query, "name": company_name})
+    except DuplicateKeyError:
+        # Another request added it first; the unique index kept its copy
+        return company_helper(await collection.find_one(query))
+    await bump_company_catalog_version(user_id)
     new_company = await collection.find_one({"_id": result.inserted_id})
     return company_helper(new_company)
 
-async def delete_company(company_id: str) -> bool:
+async def add_companies(user_id: str, company_names: List[str]) -> Tuple[Dict[str, str], int]:
+    """Add any missing companies with one lookup and one insert
+
+    Returns ({given name: stored name}, number added); names match existing
+    companies case-insensitively, so "cimb" resolves to a stored "CIMB".
+    """
+    collection = await get_companies_collection()
+    by_lower = {}
+    for name in company_names:
+        by_lower.setdefault(name.lower(), name)
+
+    stored = {}
+    async for company in collection.find(
+        {"user_id": user_id, "name_lower": {"$in": list(by_lower)}}, projection={"name": 1, "name_lower": 1}
+    ):
+        stored[company["name_lower"]] = company["name"]
+
+    missing = [
+        {"user_id": user_id, "name": name, "name_lower": lower}
+        for lower, name in by_lower.items() if lower not in stored
+    ]
+    added = len(missing)
+    if missing:
+        try:
+            await collection.insert_many(missing, ordered=False)
+        except BulkWriteError as e:
+            # Another request added some of them first; the unique index kept its copy
+            errors = e.details["writeErrors"]
+            if any(error["code"] != 11000 for error in errors):
+                raise
+            added -= len(errors)
+            lost = [missing[error["index"]]["name_lower"] for error in errors]
+            async for company in collection.find(
+                {"user_id": user_id, "name_lower": {"$in": lost}}, projection={"name": 1, "name_lower": 1}
+            ):
+                stored[company["name_lower"]] = company["name"]
+        if added:
+            await bump_company_catalog_version(user_id)
+        for company in missing:
+            stored.setdefault(company["name_lower"], company["name"])
+    return {name: stored[name.lower()] for name in company_names}, added
+
+async def search_companies(user_id: str, prefix: str, limit: int = 10) -> List[str]:
+    """Company names starting with prefix (case-insensitive), for type-ahead"""
+    collection = await get_companies_collection()
+    query = {"user_id": user_id, "name_lower": {"$regex": f"^{re.escape(prefix.lower())}"}}
+    companies = []
+    async for company in collection.find(query).sort("name_lower", 1).limit(limit):
+        companies.append(company["name"])
+    return companies
+
+async def delete_company(user_id: str, company_id: str) -> bool:
     """Delete a company"""
     collection = await get_companies_collection()
-    result = await collection.delete_one({"_id": ObjectId(company_id)})
-    return result.deleted_count > 0
+    result = await collection.delete_one({"_id": ObjectId(company_id), "user_id": user_id})
+    if result.deleted_count == 0:
+        return False
+    await bump_company_catalog_version(user_id)
+    return True
 
-async def get_company_by_name(company_name: str) -> Optional[dict]:
-    """Get company by name"""
+async def get_company_by_name(user_id: str, company_name: str) -> Optional[dict]:
+    """Get company by name, ignoring case"""
     collection = await get_companies_collection()
-    company = await collection.find_one({"name": company_name})
+    company = await collection.find_one({"user_id": user_id, "name_lower": company_name.lower()})
     if company:
         return company_helper(company)
     return None
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+Debt history helpers shared by every storage backend
+Mutations append events to an append-only log; balances at any point in
+time are rebuilt from the nearest snapshot plus the events after it.
+The same writes maintain daily rollup buckets that trend charts read.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from backend.money import LEGACY_CURRENCY, from_cents, fx_rates, to_cents
+
+# Event types written to the debt_events log
+EVENT_CREATED = "created"
+EVENT_UPDATED = "updated"
+EVENT_DELETED = "deleted"
+
+# Fields copied into every event; enough to rebuild balances by status/company
+TRACKED_FIELDS = ("company_name", "amount_owed_cents", "currency", "status")
+
+def utc_now() -> datetime:
+    """Naive UTC timestamp, matching what pymongo returns for stored datetimes"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def tracked_amount(debt: dict) -> Tuple[int, str]:
+    """(cents, currency) owed on a stored debt, API debt or event state
+
+    States logged before amounts were stored as cents hold a decimal
+    amount_owed and no currency.
+    """
+    if "amount_owed_cents" in debt:
+        return debt["amount_owed_cents"], debt["currency"]
+    return to_cents(debt["amount_owed"]), debt.get("currency", LEGACY_CURRENCY)
+
+def event_state(debt: Optional[dict]) -> Optional[dict]:
+    """Tracked fields of a debt after a mutation (None once deleted)"""
+    if debt is None:
+        return None
+    cents, currency = tracked_amount(debt)
+    return {"company_name": debt["company_name"], "amount_owed_cents": cents, "currency": currency, "status": debt["status"]}
+
+def apply_event(state: Dict[str, dict], event: dict) -> None:
+    """Apply one event to a {debt_id: tracked fields} state in place"""
+    if event["state"] is None:
+        state.pop(event["debt_id"], None)
+    else:
+        state[event["debt_id"]] = event["state"]
+
+def balance_totals(state: Dict[str, dict]) -> dict:
+    """Outstanding and paid-off totals for a state, in the base currency"""
+    outstanding: Dict[str, int] = defaultdict(int)
+    paid_off: Dict[str, int] = defaultdict(int)
+    active_count = 0
+    for debt in state.values():
+        cents, currency = tracked_amount(debt)
+        if debt["status"] == "Active Debt":
+            outstanding[currency] += cents
+            active_count += 1
+        elif debt["status"] == "Paid Off":
+            paid_off[currency] += cents
+    rates = fx_rates()
+    return {
+        "outstanding": from_cents(rates.total(outstanding)),
+        "paid_off": from_cents(rates.total(paid_off)),
+        "active_count": active_count
+    }
+
+def day_start(day: date) -> datetime:
+    """Midnight UTC at the start of day"""
+    return datetime.combine(day, time.min)
+
+def daily_series(start_state: Dict[str, dict], events: Iterable[dict], start: date, end: date) -> List[dict]:
+    """End-of-day totals for each day in [start, end]
+
+    start_state is the state before start; events must be ordered and cover
+    [start, end + 1 day).
+    """
+    state = dict(start_state)
+    pending = iter(events)
+    next_event = next(pending, None)
+    series = []
+
+    day = start
+    while day <= end:
+        day_end = day_start(day + timedelta(days=1))
+        while next_event is not None and next_event["ts"] < day_end:
+            apply_event(state, next_event)
+            next_event = next(pending, None)
+        series.append({"date": day.isoformat(), **balance_totals(state)})
+        day += timedelta(days=1)
+    return series
+
+async def debt_history(storage, user_id: str, start: date, end: date) -> List[dict]:
+    """Daily outstanding/paid-off balances between start and end (inclusive)"""
+    start_state = await storage.get_state_as_of(user_id, day_start(start))
+    events = await storage.get_events(user_id, day_start(start), day_start(end + timedelta(days=1)))
+    return daily_series(start_state, events, start, end)
+
+
+# ============ DAILY ROLLUPS ============
+
+TREND_GRANULARITIES = ("day", "week", "month")
+
+def rollup_deltas(changes: Iterable[tuple]) -> Dict[Tuple[str, str, str], list]:
+    """Net [cents, count] change per (status, company, currency) for (type, id, before, after) changes"""
+    deltas: Dict[Tuple[str, str, str], list] = defaultdict(lambda: [0, 0])
+    for _event_type, _debt_id, before, after in changes:
+        if before is not None:
+            cents, currency = tracked_amount(before)
+            bucket = deltas[(before["status"], before["company_name"], currency)]
+            bucket[0] -= cents
+            bucket[1] -= 1
+        if after is not None:
+            cents, currency = tracked_amount(after)
+            bucket = deltas[(after["status"], after["company_name"], currency)]
+            bucket[0] += cents
+            bucket[1] += 1
+    # Drop buckets that cancelled out (e.g. a notes-only edit)
+    return {key: value for key, value in deltas.items() if value[0] != 0 or value[1] != 0}
+
+def rollups_from_events(events: Iterable[dict]) -> Dict[Tuple[str, str, str, str], list]:
+    """Rebuild {(day, status, company, currency): [cents, count]} buckets from an ordered event log"""
+    state: Dict[str, dict] = {}
+    buckets: Dict[Tuple[str, str, str, str], list] = defaultdict(lambda: [0, 0])
+    for event in events:
+        before = state.get(event["debt_id"])
+        day = event["ts"].date().isoformat()
+        for (status, company, currency), (cents, count) in rollup_deltas([(None, None, before, event["state"])]).items():
+            bucket = buckets[(day, status, company, currency)]
+            bucket[0] += cents
+            bucket[1] += count
+        apply_event(state, event)
+    return buckets
+
+def default_granularity(start: date, end: date) -> str:
+    """Down-sample long ranges so charts stay around a hundred points"""
+    days = (end - start).days
+    if days <= 120:
+        return "day"
+    if days <= 800:
+        return "week"
+    return "month"
+
+def is_period_end(day: date, granularity: str) -> bool:
+    """Whether day closes a day/week/month period"""
+    if granularity == "week":
+        return day.weekday() == 6
+    if granularity == "month":
+        return (day + timedelta(days=1)).month != day.month
+    return True
+
+def trend_series(baseline: Iterable[dict], rows: Iterable[dict], start: date, end: date, granularity: str) -> List[dict]:
+    """Outstanding per status and company at the end of each period in [start, end]
+
+    baseline holds summed bucket cents before start; rows are the daily
+    buckets inside the range, ordered by day. Work is O(days + buckets).
+    Sums stay exact integer cents per currency and are converted to the
+    base currency only when a point is emitted.
+    """
+    rates = fx_rates()
+    totals: Dict[Tuple[str, str, str], int] = defaultdict(int)
+    for bucket in baseline:
+        totals[(bucket["status"], bucket["company_name"], bucket["currency"])] += bucket["amount_cents"]
+
+    rows_by_day: Dict[str, list] = defaultdict(list)
+    for bucket in rows:
+        rows_by_day[bucket["day"]].append(bucket)
+
+    series = []
+    day = start
+    while day <= end:
+        for bucket in rows_by_day.get(day.isoformat(), ()):
+            totals[(bucket["status"], bucket["company_name"], bucket["currency"])] += bucket["amount_cents"]
+        if day == end or is_period_end(day, granularity):
+            by_company: Dict[str, int] = defaultdict(int)
+            paid_off = 0
+            for (status, company, currency), cents in totals.items():
+                if status == "Active Debt":
+                    by_company[company] += rates.to_base_cents(cents, currency)
+                elif status == "Paid Off":
+                    paid_off += rates.to_base_cents(cents, currency)
+            series.append({
+                "date": day.isoformat(),
+                "outstanding": from_cents(sum(by_company.values())),
+                "paid_off": from_cents(paid_off),
+                "by_company": {company: from_cents(cents) for company, cents in by_company.items() if cents != 0}
+            })
+        day += timedelta(days=1)
+    return series
+
+async def debt_trends(storage, user_id: str, start: date, end: date, granularity: Optional[str] = None) -> List[dict]:
+    """Trend points answered from the daily rollup buckets"""
+    baseline, rows = await storage.get_rollup_buckets(user_id, start, end)
+    return trend_series(baseline, rows, start, end, granularity or default_granularity(start, end))
@@ -0,0 +1,1212 @@
+"""
+Embedded SQLite storage backend for single-node deployments
+Queries run on a small thread pool so the event loop never blocks on disk I/O
+"""
+import asyncio
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from core.config import settings
+from backend import profiling
+from backend.request_log import record_db_time
+from backend.money import LEGACY_CURRENCY, amounts_to_cents, from_cents, to_cents
+from .history import (
+    EVENT_CREATED, EVENT_UPDATED, EVENT_DELETED,
+    apply_event, event_state, rollup_deltas, rollups_from_events, utc_now
+)
+from .storage import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, DebtArchived, StorageBackend, VersionConflict
+
+# Columns that may be written through update_debt
+DEBT_COLUMNS = (
+    "company_name", "amount_owed_cents", "minimum_payment_cents", "currency", "due_date", "status", "notes"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS debts (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    amount_owed_cents INTEGER NOT NULL,
+    minimum_payment_cents INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT '',
+    paid_at TEXT,
+    deleted_at TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    template_id TEXT
+);
+CREATE INDEX IF NOT EXISTS debts_user_status_due_date ON debts (user_id, status, due_date);
+
+CREATE TABLE IF NOT EXISTS debts_archive (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    amount_owed_cents INTEGER NOT NULL,
+    minimum_payment_cents INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    due_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT '',
+    paid_at TEXT NOT NULL,
+    deleted_at TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS debts_archive_user_paid_at ON debts_archive (user_id, paid_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS debt_templates (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    amount_owed_cents INTEGER NOT NULL,
+    minimum_payment_cents INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT '',
+    rule TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    materialized_through TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS debt_templates_user_company_name ON debt_templates (user_id, company_name);
+CREATE INDEX IF NOT EXISTS debt_templates_materialized_through ON debt_templates (materialized_through);
+
+CREATE TABLE IF NOT EXISTS companies (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (user_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS company_catalog_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS debt_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    debt_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    state TEXT
+);
+CREATE INDEX IF NOT EXISTS debt_events_user_ts ON debt_events (user_id, ts);
+CREATE INDEX IF NOT EXISTS debt_events_user_seq ON debt_events (user_id, seq);
+
+CREATE TABLE IF NOT EXISTS debt_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    last_seq INTEGER NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS debt_snapshots_user_ts ON debt_snapshots (user_id, ts);
+
+CREATE TABLE IF NOT EXISTS debt_event_counters (
+    user_id TEXT PRIMARY KEY,
+    since_snapshot INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS debt_rollups (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    status TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, status, company_name, currency)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_user_created_at ON jobs (user_id, created_at);
+"""
+
+# Indexes on columns added after the first release; created once older
+# databases have been migrated (see ADDED_COLUMNS)
+ARCHIVE_SCHEMA = """
+CREATE INDEX IF NOT EXISTS debts_status_paid_at ON debts (status, paid_at);
+CREATE INDEX IF NOT EXISTS debts_deleted_at ON debts (deleted_at) WHERE deleted_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS debts_archive_deleted_at ON debts_archive (deleted_at) WHERE deleted_at IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS debts_user_template_due_date ON debts (user_id, template_id, due_date)
+    WHERE template_id IS NOT NULL;
+"""
+# Amounts were stored as REAL before; ensure_indexes converts them to the
+# integer cents columns (in the then only currency) and drops the old ones
+CENTS_COLUMNS = {
+    "amount_owed_cents": "INTEGER NOT NULL DEFAULT 0",
+    "minimum_payment_cents": "INTEGER NOT NULL DEFAULT 0",
+    "currency": f"TEXT NOT NULL DEFAULT '{LEGACY_CURRENCY}'",
+}
+ADDED_COLUMNS = {
+    "debts": {
+        "paid_at": "TEXT", "deleted_at": "TEXT", "version": "INTEGER NOT NULL DEFAULT 1", "template_id": "TEXT",
+        **CENTS_COLUMNS
+    },
+    "debts_archive": {"version": "INTEGER NOT NULL DEFAULT 1", **CENTS_COLUMNS},
+}
+LEGACY_AMOUNT_COLUMNS = {"amount_owed": "amount_owed_cents", "minimum_payment": "minimum_payment_cents"}
+
+# FTS5 index over company names and notes, kept in sync by triggers. Search
+# results join back to debts on id, so they always reflect the live row.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS debts_fts USING fts5(company_name, notes, debt_id UNINDEXED);
+
+CREATE TRIGGER IF NOT EXISTS debts_fts_insert AFTER INSERT ON debts BEGIN
+    INSERT INTO debts_fts (rowid, company_name, notes, debt_id)
+    VALUES (new.rowid, new.company_name, new.notes, new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS debts_fts_delete AFTER DELETE ON debts BEGIN
+    DELETE FROM debts_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS debts_fts_update AFTER UPDATE OF company_name, notes ON debts BEGIN
+    UPDATE debts_fts SET company_name = new.company_name, notes = new.notes WHERE rowid = old.rowid;
+END;
+"""
+POPULATE_SEARCH = (
+    "INSERT INTO debts_fts (rowid, company_name, notes, debt_id) "
+    "SELECT rowid, company_name, notes, id FROM debts"
+)
+
+# Soft-deleted rows (deleted_at set) stay until the archive sweep purges
+# them, so every debt query filters on deleted_at IS NULL
+SELECT_DEBT = (
+    "SELECT id, company_name, amount_owed_cents, minimum_payment_cents, currency, due_date, status, notes, version "
+    "FROM debts WHERE user_id = ? AND id = ? AND deleted_at IS NULL"
+)
+SELECT_ARCHIVED_DEBT = (
+    "SELECT id, company_name, amount_owed_cents, minimum_payment_cents, currency, due_date, status, notes, version "
+    "FROM debts_archive WHERE user_id = ? AND id = ? AND deleted_at IS NULL"
+)
+SELECT_DEBTS = (
+    "SELECT id, company_name, amount_owed_cents, minimum_payment_cents, currency, due_date, status, notes, version "
+    "FROM debts WHERE user_id = ? AND deleted_at IS NULL"
+)
+SELECT_DEBTS_BY_STATUS = SELECT_DEBTS + " AND status = ?"
+INSERT_DEBT = (
+    "INSERT INTO debts (id, user_id, company_name, amount_owed_cents, minimum_payment_cents, currency, "
+    "due_date, status, notes, paid_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SOFT_DELETE_DEBT = (
+    "UPDATE debts SET deleted_at = ?, version = version + 1 WHERE user_id = ? AND id = ? AND deleted_at IS NULL"
+)
+SOFT_DELETE_ARCHIVED_DEBT = (
+    "UPDATE debts_archive SET deleted_at = ?, version = version + 1 "
+    "WHERE user_id = ? AND id = ? AND deleted_at IS NULL"
+)
+SELECT_DEBTS_TO_ARCHIVE = (
+    "SELECT id FROM debts WHERE status = 'Paid Off' AND paid_at < ? AND deleted_at IS NULL LIMIT ?"
+)
+ARCHIVE_COLUMN_LIST = (
+    "id, user_id, company_name, amount_owed_cents, minimum_payment_cents, currency, "
+    "due_date, status, notes, paid_at, version"
+)
+SELECT_ARCHIVE_TOTALS = (
+    "SELECT currency, COUNT(*) AS total, SUM(amount_owed_cents) AS amount_cents "
+    "FROM debts_archive WHERE user_id = ? AND deleted_at IS NULL GROUP BY currency"
+)
+SELECT_ARCHIVE_PAGE = (
+    "SELECT id, company_name, amount_owed_cents, minimum_payment_cents, currency, due_date, status, notes, "
+    "version, paid_at "
+    "FROM debts_archive WHERE user_id = ? AND deleted_at IS NULL "
+    "ORDER BY paid_at DESC, id DESC LIMIT ?"
+)
+# Keyset pagination: continue strictly after the previous page's last (paid_at, id)
+SELECT_ARCHIVE_PAGE_AFTER = (
+    "SELECT id, company_name, amount_owed_cents, minimum_payment_cents, currency, due_date, status, notes, "
+    "version, paid_at "
+    "FROM debts_archive WHERE user_id = ? AND deleted_at IS NULL AND (paid_at, id) < (?, ?) "
+    "ORDER BY paid_at DESC, id DESC LIMIT ?"
+)
+# bm25() is lower-is-better; company_name matches weigh three times notes
+SEARCH_DEBTS = (
+    "SELECT d.id, d.company_name, d.amount_owed_cents, d.minimum_payment_cents, d.currency, d.due_date, "
+    "d.status, d.notes, d.version, "
+    "-bm25(debts_fts, 3.0, 1.0, 0.0) AS score "
+    "FROM debts_fts JOIN debts d ON d.id = debts_fts.debt_id "
+    "WHERE debts_fts MATCH ? AND d.user_id = ? AND d.deleted_at IS NULL "
+    "ORDER BY score DESC, d.id LIMIT ? OFFSET ?"
+)
+COUNT_SEARCH_DEBTS = (
+    "SELECT COUNT(*) FROM debts_fts JOIN debts d ON d.id = debts_fts.debt_id "
+    "WHERE debts_fts MATCH ? AND d.user_id = ? AND d.deleted_at IS NULL"
+)
+# Same grouping as the MongoDB pipeline: display status x company x currency
+SELECT_DEBT_COMPOSITION = """
+SELECT CASE WHEN status = 'Paid Off' THEN 'Paid Off'
+            WHEN due_date < ? THEN 'Overdue'
+            ELSE 'Active' END AS display_status,
+       company_name, currency, SUM(amount_owed_cents) AS amount_cents, COUNT(*) AS debts
+FROM debts
+WHERE user_id = ? AND deleted_at IS NULL AND amount_owed_cents > 0
+GROUP BY 1, 2, 3
+"""
+
+SELECT_DEBTS_DUE_BETWEEN = (
+    "SELECT id, company_name, amount_owed_cents, minimum_payment_cents, currency, due_date, status, notes, version, "
+    "template_id FROM debts WHERE user_id = ? AND due_date >= ? AND due_date <= ? AND deleted_at IS NULL"
+)
+# Occurrences already stored (even soft-deleted) hit the unique index and are skipped
+INSERT_OCCURRENCE = (
+    "INSERT OR IGNORE INTO debts (id, user_id, company_name, amount_owed_cents, minimum_payment_cents, currency, "
+    "due_date, status, notes, template_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Columns that may be written through update_template
+TEMPLATE_COLUMNS = (
+    "company_name", "amount_owed_cents", "minimum_payment_cents", "currency", "notes", "rule", "start_date"
+)
+SELECT_TEMPLATE = "SELECT * FROM debt_templates WHERE user_id = ? AND id = ?"
+SELECT_TEMPLATES = "SELECT * FROM debt_templates WHERE user_id = ? ORDER BY company_name"
+SELECT_TEMPLATES_TO_MATERIALIZE = "SELECT * FROM debt_templates WHERE materialized_through < ?"
+INSERT_TEMPLATE = (
+    "INSERT INTO debt_templates (id, user_id, company_name, amount_owed_cents, minimum_payment_cents, currency, "
+    "notes, rule, start_date, materialized_through) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+DELETE_TEMPLATE = "DELETE FROM debt_templates WHERE user_id = ? AND id = ?"
+ADVANCE_TEMPLATE = (
+    "UPDATE debt_templates SET materialized_through = max(materialized_through, ?) WHERE id = ?"
+)
+
+SELECT_COMPANY_NAMES = "SELECT name FROM companies WHERE user_id = ? ORDER BY name"
+SELECT_COMPANIES = "SELECT id, name FROM companies WHERE user_id = ? ORDER BY name"
+SELECT_CATALOG_VERSION = "SELECT version FROM company_catalog_versions WHERE user_id = ?"
+BUMP_CATALOG_VERSION = (
+    "INSERT INTO company_catalog_versions (user_id, version) VALUES (?, 1) "
+    "ON CONFLICT (user_id) DO UPDATE SET version = version + 1"
+)
+SELECT_COMPANY_BY_NAME = "SELECT id, name FROM companies WHERE user_id = ? AND lower(name) = lower(?)"
+INSERT_COMPANY = "INSERT OR IGNORE INTO companies (id, user_id, name) VALUES (?, ?, ?)"
+DELETE_COMPANY = "DELETE FROM companies WHERE user_id = ? AND id = ?"
+INSERT_EVENT = "INSERT INTO debt_events (user_id, debt_id, type, ts, state) VALUES (?, ?, ?, ?, ?)"
+INCREMENT_EVENT_COUNTER = (
+    "INSERT INTO debt_event_counters (user_id, since_snapshot) VALUES (?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET since_snapshot = since_snapshot + excluded.since_snapshot"
+)
+SELECT_EVENT_COUNTER = "SELECT since_snapshot FROM debt_event_counters WHERE user_id = ?"
+RESET_EVENT_COUNTER = "UPDATE debt_event_counters SET since_snapshot = 0 WHERE user_id = ?"
+SELECT_LATEST_SNAPSHOT = (
+    "SELECT ts, last_seq, state FROM debt_snapshots WHERE user_id = ? ORDER BY ts DESC LIMIT 1"
+)
+SELECT_SNAPSHOT_BEFORE = (
+    "SELECT ts, last_seq, state FROM debt_snapshots WHERE user_id = ? AND ts < ? ORDER BY ts DESC LIMIT 1"
+)
+INSERT_SNAPSHOT = "INSERT INTO debt_snapshots (user_id, ts, last_seq, state) VALUES (?, ?, ?, ?)"
+SELECT_EVENTS_AFTER_SEQ = (
+    "SELECT seq, debt_id, type, ts, state FROM debt_events WHERE user_id = ? AND seq > ? ORDER BY seq"
+)
+SELECT_EVENTS_AFTER_SEQ_BEFORE = (
+    "SELECT seq, debt_id, type, ts, state FROM debt_events "
+    "WHERE user_id = ? AND seq > ? AND ts < ? ORDER BY seq"
+)
+SELECT_EVENTS_BETWEEN = (
+    "SELECT seq, debt_id, type, ts, state FROM debt_events "
+    "WHERE user_id = ? AND ts >= ? AND ts < ? ORDER BY ts, seq"
+)
+UPSERT_ROLLUP = (
+    "INSERT INTO debt_rollups (user_id, day, status, company_name, currency, amount_cents, count) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, day, status, company_name, currency) "
+    "DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents, count = count + excluded.count"
+)
+SELECT_ROLLUP_BASELINE = (
+    "SELECT status, company_name, currency, SUM(amount_cents) AS amount_cents FROM debt_rollups "
+    "WHERE user_id = ? AND day < ? GROUP BY status, company_name, currency"
+)
+SELECT_ROLLUP_RANGE = (
+    "SELECT day, status, company_name, currency, amount_cents FROM debt_rollups "
+    "WHERE user_id = ? AND day >= ? AND day <= ? ORDER BY day"
+)
+
+SELECT_JOB = "SELECT * FROM jobs WHERE user_id = ? AND id = ?"
+SELECT_JOB_BY_ID = "SELECT * FROM jobs WHERE id = ?"
+SELECT_JOBS = "SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?"
+INSERT_JOB = (
+    "INSERT INTO jobs (id, user_id, type, params, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+CANCEL_JOB = (
+    "UPDATE jobs SET cancel_requested = 1 WHERE user_id = ? AND id = ? AND status IN (?, ?)"
+)
+FAIL_STALE_JOBS = (
+    "UPDATE jobs SET status = ?, error = 'Interrupted by a server restart', finished_at = ?, updated_at = ? "
+    "WHERE status IN (?, ?) AND updated_at < ?"
+)
+# Job columns holding JSON, and those holding timestamps
+JOB_JSON_COLUMNS = ("params", "result")
+JOB_TS_COLUMNS = ("created_at", "updated_at", "started_at", "finished_at")
+
+# Company names are unique per user ignoring case, so "Maybank" and "maybank"
+# are one company; the index also serves case-insensitive prefix search
+COMPANIES_UNIQUE_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS companies_user_name_lower ON companies (user_id, lower(name))"
+)
+# Databases created before that index may hold case variants; the oldest is kept
+SELECT_DUPLICATE_COMPANY_USERS = (
+    "SELECT DISTINCT user_id FROM companies GROUP BY user_id, lower(name) HAVING COUNT(*) > 1"
+)
+DELETE_DUPLICATE_COMPANIES = (
+    "DELETE FROM companies WHERE rowid NOT IN (SELECT MIN(rowid) FROM companies GROUP BY user_id, lower(name))"
+)
+
+SEARCH_COMPANIES = (
+    "SELECT name FROM companies WHERE user_id = ? AND lower(name) >= ? AND lower(name) < ? "
+    "ORDER BY lower(name) LIMIT ?"
+)
+
+def new_id() -> str:
+    """Generate a 24-character hex ID, the same shape as a MongoDB ObjectId"""
+    return secrets.token_hex(12)
+
+def fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+def chunked(items: List[str], size: int = 500):
+    """Split ID lists so IN (...) stays under SQLite's bound-parameter limit"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def debt_row_helper(row: sqlite3.Row) -> dict:
+    """Convert a debts row to the same dictionary shape as crud_db.debt_helper"""
+    return {
+        "id": row["id"],
+        "company_name": row["company_name"],
+        "amount_owed": from_cents(row["amount_owed_cents"]),
+        "minimum_payment": from_cents(row["minimum_payment_cents"]),
+        "currency": row["currency"],
+        "due_date": row["due_date"],
+        "status": row["status"],
+        "notes": row["notes"] or "",
+        "version": row["version"]
+    }
+
+def template_row_helper(row: sqlite3.Row) -> dict:
+    """Convert a debt_templates row to the same dictionary shape as crud_db.template_helper"""
+    return {
+        "id": row["id"],
+        "company_name": row["company_name"],
+        "amount_owed": from_cents(row["amount_owed_cents"]),
+        "minimum_payment": from_cents(row["minimum_payment_cents"]),
+        "currency": row["currency"],
+        "notes": row["notes"] or "",
+        "rule": row["rule"],
+        "start_date": row["start_date"],
+        "materialized_through": row["materialized_through"]
+    }
+
+def event_row_helper(row: sqlite3.Row) -> dict:
+    """Convert a debt_events row to the same shape as a MongoDB event"""
+    return {
+        "debt_id": row["debt_id"],
+        "type": row["type"],
+        "ts": datetime.fromisoformat(row["ts"]),
+        "state": json.loads(row["state"]) if row["state"] is not None else None
+    }
+
+def format_ts(ts: datetime) -> str:
+    """Fixed-width ISO timestamp so text comparison matches time order"""
+    return ts.isoformat(timespec="microseconds")
+
+def job_row_helper(row: sqlite3.Row) -> dict:
+    """Convert a jobs row to the same dictionary shape as crud_db.job_helper"""
+    return {
+        "id": row["id"],
+        "type": row["type"],
+        "params": json.loads(row["params"]),
+        "status": row["status"],
+        "progress": row["progress"],
+        "message": row["message"],
+        "result": json.loads(row["result"]) if row["result"] is not None else None,
+        "error": row["error"],
+        "cancel_requested": bool(row["cancel_requested"]),
+        "created_at": datetime.fromisoformat(row["created_at"]),
+        "started_at": datetime.fromisoformat(row["started_at"]) if row["started_at"] else None,
+        "finished_at": datetime.fromisoformat(row["finished_at"]) if row["finished_at"] else None
+    }
+
+def company_row_helper(row: sqlite3.Row) -> dict:
+    """Convert a companies row to the same dictionary shape as crud_db.company_helper"""
+    return {
+        "id": row["id"],
+        "name": row["name"]
+    }
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite backend using WAL mode and one connection per worker thread"""
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # sqlite3 keeps compiled statements per connection, so the constant
+            # parameterised SQL above is only prepared once per thread
+            conn = sqlite3.connect(self.path, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    async def _run(self, func, *args):
+        """Run a blocking database function on the thread pool"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            record_db_time(duration_ms)
+            if profiling.active_profile is not None:
+                name = func.__qualname__.replace(".<locals>", "")
+                profiling.record_db_call(f"sqlite {name}", duration_ms)
+
+    async def ensure_indexes(self) -> None:
+        def _create():
+            conn = self._connect()
+            search_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'debts_fts'"
+            ).fetchone()
+            # Rollups written before amounts were stored as cents are rebuilt below
+            rollup_columns = {row["name"] for row in conn.execute("PRAGMA table_info(debt_rollups)")}
+            if rollup_columns and "currency" not in rollup_columns:
+                conn.execute("DROP TABLE debt_rollups")
+            conn.executescript(SCHEMA + SEARCH_SCHEMA)
+            if not search_exists:
+                # Index rows written before the search table existed
+                conn.execute(POPULATE_SEARCH)
+
+            # Add columns introduced since a database was created
+            for table, added in ADDED_COLUMNS.items():
+                columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, definition in added.items():
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                for legacy, cents in LEGACY_AMOUNT_COLUMNS.items():
+                    if legacy in columns:
+                        conn.execute(f"UPDATE {table} SET {cents} = CAST(ROUND({legacy} * 100) AS INTEGER)")
+                        conn.execute(f"ALTER TABLE {table} DROP COLUMN {legacy}")
+            conn.execute(
+                "UPDATE debts SET paid_at = ? WHERE status = 'Paid Off' AND paid_at IS NULL",
+                (format_ts(utc_now()),)
+            )
+            conn.executescript(ARCHIVE_SCHEMA)
+            company_indexes = {row["name"]: row["unique"] for row in conn.execute("PRAGMA index_list(companies)")}
+            if not company_indexes.get("companies_user_name_lower"):
+                for row in conn.execute(SELECT_DUPLICATE_COMPANY_USERS).fetchall():
+                    conn.execute(BUMP_CATALOG_VERSION, (row["user_id"],))
+                conn.execute(DELETE_DUPLICATE_COMPANIES)
+                conn.execute("DROP INDEX IF EXISTS companies_user_name_lower")
+                conn.execute(COMPANIES_UNIQUE_INDEX)
+            conn.commit()
+            self._seed_history(conn)
+            if not conn.execute("SELECT 1 FROM debt_rollups LIMIT 1").fetchone():
+                self._rebuild_rollups(conn)
+        await self._run(_create)
+
+    async def close(self) -> None:
+        # Each thread's connection is closed as its pool thread exits
+        await asyncio.to_thread(self._executor.shutdown)
+
+    # ============ HISTORY ============
+
+    def _record_events(self, conn: sqlite3.Connection, user_id: str, changes: List[tuple]) -> None:
+        """Log (event type, debt id, debt before, debt after) changes and update today's
+        rollup buckets inside the caller's transaction"""
+        if not changes:
+            return
+        now = utc_now()
+        ts = format_ts(now)
+        conn.executemany(INSERT_EVENT, [
+            (user_id, debt_id, event_type, ts, json.dumps(event_state(after)) if after is not None else None)
+            for event_type, debt_id, _before, after in changes
+        ])
+        conn.execute(INCREMENT_EVENT_COUNTER, (user_id, len(changes)))
+
+        day = now.date().isoformat()
+        conn.executemany(UPSERT_ROLLUP, [
+            (user_id, day, status, company_name, currency, cents, count)
+            for (status, company_name, currency), (cents, count) in rollup_deltas(changes).items()
+        ])
+
+    def _rebuild_rollups(self, conn: sqlite3.Connection, user_id: Optional[str] = None) -> None:
+        """Recompute daily rollup buckets from the event log"""
+        if user_id:
+            user_ids = [user_id]
+        else:
+            user_ids = [row["user_id"] for row in conn.execute("SELECT DISTINCT user_id FROM debt_events")]
+        for uid in user_ids:
+            with conn:
+                # One write transaction from the read to the replacement: events
+                # written meanwhile (and their rollup deltas) wait for it to commit
+                conn.execute("BEGIN IMMEDIATE")
+                events = conn.execute(SELECT_EVENTS_AFTER_SEQ, (uid, 0))
+                buckets = rollups_from_events(event_row_helper(row) for row in events)
+                conn.execute("DELETE FROM debt_rollups WHERE user_id = ?", (uid,))
+                conn.executemany(UPSERT_ROLLUP, [
+                    (uid, day, status, company_name, currency, cents, count)
+                    for (day, status, company_name, currency), (cents, count) in buckets.items()
+                ])
+
+    def _checkpoint_if_due(self, conn: sqlite3.Connection, user_id: str) -> None:
+        """Write a compacted snapshot once enough events have built up since the last one"""
+        row = conn.execute(SELECT_EVENT_COUNTER, (user_id,)).fetchone()
+        if not row or row["since_snapshot"] < settings.HISTORY_SNAPSHOT_INTERVAL:
+            return
+
+        snapshot = conn.execute(SELECT_LATEST_SNAPSHOT, (user_id,)).fetchone()
+        state = json.loads(snapshot["state"]) if snapshot else {}
+        last_seq = snapshot["last_seq"] if snapshot else 0
+        last_event = None
+        for event_row in conn.execute(SELECT_EVENTS_AFTER_SEQ, (user_id, last_seq)):
+            apply_event(state, event_row_helper(event_row))
+            last_event = event_row
+
+        with conn:
+            if last_event is not None:
+                conn.execute(INSERT_SNAPSHOT, (user_id, last_event["ts"], last_event["seq"], json.dumps(state)))
+            conn.execute(RESET_EVENT_COUNTER, (user_id,))
+
+    def _seed_history(self, conn: sqlite3.Connection) -> None:
+        """Log a created event for debts that predate the history log"""
+        if conn.execute("SELECT 1 FROM debt_events LIMIT 1").fetchone():
+            return
+        changes_by_user: Dict[str, list] = {}
+        rows = conn.execute(
+            "SELECT user_id, id, company_name, amount_owed_cents, currency, status FROM debts WHERE deleted_at IS NULL"
+        )
+        for row in rows:
+            changes_by_user.setdefault(row["user_id"], []).append((EVENT_CREATED, row["id"], None, dict(row)))
+        with conn:
+            for user_id, changes in changes_by_user.items():
+                self._record_events(conn, user_id, changes)
+
+    async def get_state_as_of(self, user_id: str, before: datetime) -> Dict[str, dict]:
+        def _state():
+            conn = self._connect()
+            snapshot = conn.execute(SELECT_SNAPSHOT_BEFORE, (user_id, format_ts(before))).fetchone()
+            state = json.loads(snapshot["state"]) if snapshot else {}
+            last_seq = snapshot["last_seq"] if snapshot else 0
+            # Replay only the bounded tail of events written after the snapshot
+            for event_row in conn.execute(SELECT_EVENTS_AFTER_SEQ_BEFORE, (user_id, last_seq, format_ts(before))):
+                apply_event(state, event_row_helper(event_row))
+            return state
+        return await self._run(_state)
+
+    async def get_events(self, user_id: str, start: datetime, end: datetime) -> List[dict]:
+        def _select():
+            rows = self._connect().execute(SELECT_EVENTS_BETWEEN, (user_id, format_ts(start), format_ts(end)))
+            return [event_row_helper(row) for row in rows]
+        return await self._run(_select)
+
+    async def get_rollup_buckets(self, user_id: str, start: date, end: date) -> Tuple[List[dict], List[dict]]:
+        def _select():
+            conn = self._connect()
+            baseline = [dict(row) for row in conn.execute(SELECT_ROLLUP_BASELINE, (user_id, start.isoformat()))]
+            rows = [
+                dict(row) for row in conn.execute(SELECT_ROLLUP_RANGE, (user_id, start.isoformat(), end.isoformat()))
+            ]
+            return baseline, rows
+        return await self._run(_select)
+
+    async def rebuild_rollups(self, user_id: Optional[str] = None) -> None:
+        await self._run(lambda: self._rebuild_rollups(self._connect(), user_id))
+
+    # ============ DEBT OPERATIONS ============
+
+    def _get_debt(self, user_id: str, debt_id: str) -> Optional[dict]:
+        row = self._connect().execute(SELECT_DEBT, (user_id, debt_id)).fetchone()
+        if row:
+            return debt_row_helper(row)
+        return None
+
+    def _not_updated(self, user_id: str, debt_id: str) -> None:
+        """Result of updating a debt that is not in the debts table: archived debts are read-only"""
+        if self._connect().execute(SELECT_ARCHIVED_DEBT, (user_id, debt_id)).fetchone():
+            raise DebtArchived(debt_id)
+        return None
+
+    async def create_debt(self, user_id: str, debt_data: dict) -> dict:
+        def _create():
+            conn = self._connect()
+            debt_id = new_id()
+            with conn:
+                conn.execute(INSERT_DEBT, (
+                    debt_id,
+                    user_id,
+                    debt_data["company_name"],
+                    to_cents(debt_data["amount_owed"]),
+                    to_cents(debt_data["minimum_payment"]),
+                    debt_data["currency"],
+                    debt_data["due_date"],
+                    debt_data["status"],
+                    debt_data.get("notes") or "",
+                    format_ts(utc_now()) if debt_data["status"] == "Paid Off" else None
+                ))
+                self._record_events(conn, user_id, [(EVENT_CREATED, debt_id, None, debt_data)])
+            self._checkpoint_if_due(conn, user_id)
+            return self._get_debt(user_id, debt_id)
+        return await self._run(_create)
+
+    async def checkpoint_history(self, user_id: str) -> None:
+        await self._run(lambda: self._checkpoint_if_due(self._connect(), user_id))
+
+    async def insert_debts(self, user_id: str, debts: List[dict], checkpoint: bool = True) -> int:
+        def _insert():
+            conn = self._connect()
+            paid_at = format_ts(utc_now())
+            rows = [
+                (
+                    new_id(),
+                    user_id,
+                    debt["company_name"],
+                    to_cents(debt["amount_owed"]),
+                    to_cents(debt["minimum_payment"]),
+                    debt["currency"],
+                    debt["due_date"],
+                    debt["status"],
+                    debt.get("notes") or "",
+                    paid_at if debt["status"] == "Paid Off" else None
+                )
+                for debt in debts
+            ]
+            with conn:
+                conn.executemany(INSERT_DEBT, rows)
+                self._record_events(conn, user_id, [
+                    (EVENT_CREATED, row[0], None, debt) for row, debt in zip(rows, debts)
+                ])
+            if checkpoint:
+                self._checkpoint_if_due(conn, user_id)
+            return len(rows)
+        return await self._run(_insert)
+
+    async def get_debt(self, user_id: str, debt_id: str) -> Optional[dict]:
+        def _select():
+            debt = self._get_debt(user_id, debt_id)
+            if debt is None:
+                row = self._connect().execute(SELECT_ARCHIVED_DEBT, (user_id, debt_id)).fetchone()
+                debt = debt_row_helper(row) if row else None
+            return debt
+        return await self._run(_select)
+
+    async def get_all_debts(self, user_id: str, status: Optional[str] = None, stale_ok: bool = False,
+                            with_cents: bool = False) -> List[dict]:
+        # A single file has no replicas, so every read is current
+        def _select():
+            conn = self._connect()
+            if status:
+                rows = conn.execute(SELECT_DEBTS_BY_STATUS, (user_id, status))
+            else:
+                rows = conn.execute(SELECT_DEBTS, (user_id,))
+            if with_cents:
+                return [{
+                    **debt_row_helper(row),
+                    "amount_owed_cents": row["amount_owed_cents"],
+                    "minimum_payment_cents": row["minimum_payment_cents"]
+                } for row in rows]
+            return [debt_row_helper(row) for row in rows]
+        return await self._run(_select)
+
+    async def search_debts(self, user_id: str, query: str, skip: int = 0, limit: int = 20) -> Dict[str, Any]:
+        match = fts_query(query)
+        if not match:
+            return {"total": 0, "results": []}
+
+        def _search():
+            conn = self._connect()
+            total = conn.execute(COUNT_SEARCH_DEBTS, (match, user_id)).fetchone()[0]
+            rows = conn.execute(SEARCH_DEBTS, (match, user_id, limit, skip))
+            results = [{**debt_row_helper(row), "score": row["score"]} for row in rows]
+            return {"total": total, "results": results}
+        return await self._run(_search)
+
+    async def get_debt_composition(self, user_id: str, today: date) -> List[dict]:
+        def _select():
+            rows = self._connect().execute(SELECT_DEBT_COMPOSITION, (today.isoformat(), user_id))
+            return [dict(row) for row in rows]
+        return await self._run(_select)
+
+    async def get_debts_due_between(self, user_id: str, start: date, end: date) -> List[dict]:
+        def _select():
+            rows = self._connect().execute(SELECT_DEBTS_DUE_BETWEEN, (user_id, start.isoformat(), end.isoformat()))
+            return [{**debt_row_helper(row), "template_id": row["template_id"]} for row in rows]
+        return await self._run(_select)
+
+    async def update_debt(self, user_id: str, debt_id: str, debt_data: dict,
+                          expected_version: Optional[int] = None) -> Optional[dict]:
+        # Remove None values and anything that is not a debt column
+        update_data = {
+            k: v for k, v in amounts_to_cents({k: v for k, v in debt_data.items() if v is not None}).items()
+            if k in DEBT_COLUMNS
+        }
+
+        if not update_data:
+            return None
+
+        def _update():
+            conn = self._connect()
+            with conn:
+                # The previous version lets the rollup move the old balance out of its bucket
+                previous_debt = self._get_debt(user_id, debt_id)
+                if previous_debt is None:
+                    return self._not_updated(user_id, debt_id)
+                if expected_version is not None and previous_debt["version"] != expected_version:
+                    raise VersionConflict(previous_debt["version"])
+                values = dict(update_data)
+                if "status" in values:
+                    # Keep the original paid_at when an already paid-off debt is saved again
+                    if values["status"] != "Paid Off":
+                        values["paid_at"] = None
+                    elif previous_debt["status"] != "Paid Off":
+                        values["paid_at"] = format_ts(utc_now())
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                # The read above runs before the write transaction begins, so the
+                # write matches on the version it read; losing a race is a conflict
+                cursor = conn.execute(
+                    f"UPDATE debts SET {assignments}, version = version + 1 "
+                    f"WHERE user_id = ? AND id = ? AND version = ?",
+                    (*values.values(), user_id, debt_id, previous_debt["version"])
+                )
+                if not cursor.rowcount:
+                    current = self._get_debt(user_id, debt_id)
+                    if current is None:
+                        return self._not_updated(user_id, debt_id)
+                    raise VersionConflict(current["version"])
+                updated_debt = self._get_debt(user_id, debt_id)
+                self._record_events(conn, user_id, [(EVENT_UPDATED, debt_id, previous_debt, updated_debt)])
+            self._checkpoint_if_due(conn, user_id)
+            return updated_debt
+        return await self._run(_update)
+
+    async def delete_debt(self, user_id: str, debt_id: str) -> bool:
+        def _delete():
+            conn = self._connect()
+            deleted_at = format_ts(utc_now())
+            with conn:
+                previous_debt = self._get_debt(user_id, debt_id)
+                if previous_debt is not None:
+                    cursor = conn.execute(SOFT_DELETE_DEBT, (deleted_at, user_id, debt_id))
+                else:
+                    row = conn.execute(SELECT_ARCHIVED_DEBT, (user_id, debt_id)).fetchone()
+                    previous_debt = debt_row_helper(row) if row else None
+                    cursor = conn.execute(SOFT_DELETE_ARCHIVED_DEBT, (deleted_at, user_id, debt_id))
+                if cursor.rowcount:
+                    self._record_events(conn, user_id, [(EVENT_DELETED, debt_id, previous_debt, None)])
+            self._checkpoint_if_due(conn, user_id)
+            return cursor.rowcount > 0
+        return await self._run(_delete)
+
+    async def bulk_update_status(self, user_id: str, debt_ids: List[str], status: str) -> int:
+        paid_at = format_ts(utc_now()) if status == "Paid Off" else None
+
+        def _update():
+            conn = self._connect()
+            changed = 0
+            with conn:
+                for chunk in chunked(debt_ids):
+                    placeholders = ", ".join("?" for _ in chunk)
+                    # Only debts whose status actually changes get a history event
+                    changing = conn.execute(
+                        f"SELECT id, company_name, amount_owed_cents, currency, status FROM debts "
+                        f"WHERE user_id = ? AND status != ? AND deleted_at IS NULL AND id IN ({placeholders})",
+                        (user_id, status, *chunk)
+                    ).fetchall()
+                    cursor = conn.execute(
+                        f"UPDATE debts SET status = ?, paid_at = ?, version = version + 1 "
+                        f"WHERE user_id = ? AND status != ? AND deleted_at IS NULL AND id IN ({placeholders})",
+                        (status, paid_at, user_id, status, *chunk)
+                    )
+                    changed += cursor.rowcount
+                    self._record_events(conn, user_id, [
+                        (EVENT_UPDATED, row["id"], dict(row), {**dict(row), "status": status}) for row in changing
+                    ])
+            self._checkpoint_if_due(conn, user_id)
+            return changed
+        return await self._run(_update)
+
+    async def bulk_delete_debts(self, user_id: str, debt_ids: List[str]) -> int:
+        deleted_at = format_ts(utc_now())
+
+        def _delete():
+            conn = self._connect()
+            deleted = 0
+            with conn:
+                for chunk in chunked(debt_ids):
+                    placeholders = ", ".join("?" for _ in chunk)
+                    existing = conn.execute(
+                        f"SELECT id, company_name, amount_owed_cents, currency, status FROM debts "
+                        f"WHERE user_id = ? AND deleted_at IS NULL AND id IN ({placeholders})",
+                        (user_id, *chunk)
+                    ).fetchall()
+                    cursor = conn.execute(
+                        f"UPDATE debts SET deleted_at = ?, version = version + 1 "
+                        f"WHERE user_id = ? AND deleted_at IS NULL AND id IN ({placeholders})",
+                        (deleted_at, user_id, *chunk)
+                    )
+                    deleted += cursor.rowcount
+                    self._record_events(conn, user_id, [(EVENT_DELETED, row["id"], dict(row), None) for row in existing])
+            self._checkpoint_if_due(conn, user_id)
+            return deleted
+        return await self._run(_delete)
+
+    # ============ ARCHIVE ============
+
+    async def archive_paid_debts(self, paid_before: datetime, batch_size: int = 500) -> int:
+        def _archive():
+            conn = self._connect()
+            moved = 0
+            while True:
+                # Balances do not change, so no history event is written
+                with conn:
+                    ids = [row["id"] for row in conn.execute(
+                        SELECT_DEBTS_TO_ARCHIVE, (format_ts(paid_before), batch_size)
+                    )]
+                    if not ids:
+                        return moved
+                    placeholders = ", ".join("?" for _ in ids)
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO debts_archive ({ARCHIVE_COLUMN_LIST}) "
+                        f"SELECT {ARCHIVE_COLUMN_LIST} FROM debts WHERE id IN ({placeholders})",
+                        ids
+                    )
+                    moved += conn.execute(f"DELETE FROM debts WHERE id IN ({placeholders})", ids).rowcount
+        return await self._run(_archive)
+
+    async def purge_deleted_debts(self, deleted_before: datetime) -> int:
+        def _purge():
+            conn = self._connect()
+            cutoff = format_ts(deleted_before)
+            with conn:
+                purged = conn.execute("DELETE FROM debts WHERE deleted_at < ?", (cutoff,)).rowcount
+                purged += conn.execute("DELETE FROM debts_archive WHERE deleted_at < ?", (cutoff,)).rowcount
+            return purged
+        return await self._run(_purge)
+
+    async def get_archived_debts(self, user_id: str, limit: int = 20,
+                                 after: Optional[Tuple[datetime, str]] = None) -> Dict[str, Any]:
+        def _select():
+            conn = self._connect()
+            page = {"total": None, "amount_cents": None}
+            if after is None:
+                totals = conn.execute(SELECT_ARCHIVE_TOTALS, (user_id,)).fetchall()
+                page = {
+                    "total": sum(row["total"] for row in totals),
+                    "amount_cents": {row["currency"]: row["amount_cents"] for row in totals}
+                }
+                rows = conn.execute(SELECT_ARCHIVE_PAGE, (user_id, limit + 1)).fetchall()
+            else:
+                paid_at, last_id = after
+                rows = conn.execute(SELECT_ARCHIVE_PAGE_AFTER, (user_id, format_ts(paid_at), last_id, limit + 1)).fetchall()
+
+            results = [{**debt_row_helper(row), "paid_at": row["paid_at"]} for row in rows[:limit]]
+            next_after = None
+            if len(rows) > limit:
+                next_after = (datetime.fromisoformat(rows[limit - 1]["paid_at"]), rows[limit - 1]["id"])
+            return {**page, "results": results, "next_after": next_after}
+        return await self._run(_select)
+
+    # ============ RECURRING TEMPLATES ============
+
+    def _get_template(self, user_id: str, template_id: str) -> Optional[dict]:
+        row = self._connect().execute(SELECT_TEMPLATE, (user_id, template_id)).fetchone()
+        if row:
+            return template_row_helper(row)
+        return None
+
+    async def create_template(self, user_id: str, template_data: dict) -> dict:
+        def _create():
+            conn = self._connect()
+            template_id = new_id()
+            with conn:
+                conn.execute(INSERT_TEMPLATE, (
+                    template_id,
+                    user_id,
+                    template_data["company_name"],
+                    to_cents(template_data["amount_owed"]),
+                    to_cents(template_data["minimum_payment"]),
+                    template_data["currency"],
+                    template_data.get("notes") or "",
+                    template_data["rule"],
+                    template_data["start_date"],
+                    template_data["materialized_through"]
+                ))
+            return self._get_template(user_id, template_id)
+        return await self._run(_create)
+
+    async def get_templates(self, user_id: str) -> List[dict]:
+        def _select():
+            return [template_row_helper(row) for row in self._connect().execute(SELECT_TEMPLATES, (user_id,))]
+        return await self._run(_select)
+
+    async def get_template(self, user_id: str, template_id: str) -> Optional[dict]:
+        return await self._run(self._get_template, user_id, template_id)
+
+    async def update_template(self, user_id: str, template_id: str, template_data: dict) -> Optional[dict]:
+        # Remove None values and anything that is not a template column
+        update_data = {
+            k: v for k, v in amounts_to_cents({k: v for k, v in template_data.items() if v is not None}).items()
+            if k in TEMPLATE_COLUMNS
+        }
+
+        def _update():
+            conn = self._connect()
+            if update_data:
+                assignments = ", ".join(f"{column} = ?" for column in update_data)
+                with conn:
+                    conn.execute(
+                        f"UPDATE debt_templates SET {assignments} WHERE user_id = ? AND id = ?",
+                        (*update_data.values(), user_id, template_id)
+                    )
+            return self._get_template(user_id, template_id)
+        return await self._run(_update)
+
+    async def delete_template(self, user_id: str, template_id: str) -> bool:
+        def _delete():
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(DELETE_TEMPLATE, (user_id, template_id))
+            return cursor.rowcount > 0
+        return await self._run(_delete)
+
+    async def get_templates_to_materialize(self, through: date, user_id: Optional[str] = None) -> List[dict]:
+        def _select():
+            sql, params = SELECT_TEMPLATES_TO_MATERIALIZE, [through.isoformat()]
+            if user_id:
+                sql, params = sql + " AND user_id = ?", params + [user_id]
+            rows = self._connect().execute(sql, params)
+            return [{**template_row_helper(row), "user_id": row["user_id"]} for row in rows]
+        return await self._run(_select)
+
+    async def materialize_occurrences(self, user_id: str, template_id: str, debts: List[dict], through: date) -> int:
+        def _materialize():
+            conn = self._connect()
+            changes = []
+            # The occurrences and the new watermark commit together
+            with conn:
+                for debt in debts:
+                    debt_id = new_id()
+                    cursor = conn.execute(INSERT_OCCURRENCE, (
+                        debt_id,
+                        user_id,
+                        debt["company_name"],
+                        to_cents(debt["amount_owed"]),
+                        to_cents(debt["minimum_payment"]),
+                        debt["currency"],
+                        debt["due_date"],
+                        debt["status"],
+                        debt.get("notes") or "",
+                        template_id
+                    ))
+                    if cursor.rowcount:
+                        changes.append((EVENT_CREATED, debt_id, None, debt))
+                self._record_events(conn, user_id, changes)
+                conn.execute(ADVANCE_TEMPLATE, (through.isoformat(), template_id))
+            if changes:
+                self._checkpoint_if_due(conn, user_id)
+            return len(changes)
+        return await self._run(_materialize)
+
+    # ============ JOBS ============
+
+    async def create_job(self, user_id: str, job_type: str, params: dict) -> dict:
+        def _create():
+            conn = self._connect()
+            job_id = new_id()
+            now = format_ts(utc_now())
+            with conn:
+                conn.execute(INSERT_JOB, (job_id, user_id, job_type, json.dumps(params), JOB_QUEUED, now, now))
+            return job_row_helper(conn.execute(SELECT_JOB_BY_ID, (job_id,)).fetchone())
+        return await self._run(_create)
+
+    async def get_job(self, user_id: str, job_id: str) -> Optional[dict]:
+        def _select():
+            row = self._connect().execute(SELECT_JOB, (user_id, job_id)).fetchone()
+            return job_row_helper(row) if row else None
+        return await self._run(_select)
+
+    async def list_jobs(self, user_id: str, limit: int = 20) -> List[dict]:
+        def _select():
+            return [job_row_helper(row) for row in self._connect().execute(SELECT_JOBS, (user_id, limit))]
+        return await self._run(_select)
+
+    async def update_job(self, job_id: str, fields: dict) -> Optional[dict]:
+        values = {**fields, "updated_at": utc_now()}
+        for column in JOB_JSON_COLUMNS:
+            if column in values:
+                values[column] = json.dumps(values[column])
+        for column in JOB_TS_COLUMNS:
+            if isinstance(values.get(column), datetime):
+                values[column] = format_ts(values[column])
+
+        def _update():
+            conn = self._connect()
+            assignments = ", ".join(f"{column} = ?" for column in values)
+            with conn:
+                conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+            row = conn.execute(SELECT_JOB_BY_ID, (job_id,)).fetchone()
+            return job_row_helper(row) if row else None
+        return await self._run(_update)
+
+    async def request_job_cancel(self, user_id: str, job_id: str) -> Optional[dict]:
+        def _cancel():
+            conn = self._connect()
+            with conn:
+                conn.execute(CANCEL_JOB, (user_id, job_id, JOB_QUEUED, JOB_RUNNING))
+            row = conn.execute(SELECT_JOB, (user_id, job_id)).fetchone()
+            return job_row_helper(row) if row else None
+        return await self._run(_cancel)
+
+    async def touch_jobs(self, job_ids: List[str]) -> int:
+        def _touch():
+            conn = self._connect()
+            placeholders = ", ".join("?" for _ in job_ids)
+            with conn:
+                cursor = conn.execute(
+                    f"UPDATE jobs SET updated_at = ? WHERE status IN (?, ?) AND id IN ({placeholders})",
+                    (format_ts(utc_now()), JOB_QUEUED, JOB_RUNNING, *job_ids)
+                )
+            return cursor.rowcount
+        if not job_ids:
+            return 0
+        return await self._run(_touch)
+
+    async def fail_stale_jobs(self, updated_before: datetime) -> int:
+        def _fail():
+            conn = self._connect()
+            now = format_ts(utc_now())
+            with conn:
+                cursor = conn.execute(
+                    FAIL_STALE_JOBS, (JOB_FAILED, now, now, JOB_QUEUED, JOB_RUNNING, format_ts(updated_before))
+                )
+            return cursor.rowcount
+        return await self._run(_fail)
+
+    async def purge_jobs(self, finished_before: datetime) -> int:
+        def _purge():
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute("DELETE FROM jobs WHERE finished_at < ?", (format_ts(finished_before),))
+            return cursor.rowcount
+        return await self._run(_purge)
+
+    # ============ COMPANY OPERATIONS ============
+
+    def _get_company_by_name(self, user_id: str, company_name: str) -> Optional[dict]:
+        row = self._connect().execute(SELECT_COMPANY_BY_NAME, (user_id, company_name)).fetchone()
+        if row:
+            return company_row_helper(row)
+        return None
+
+    async def get_all_companies(self, user_id: str) -> List[str]:
+        def _select():
+            rows = self._connect().execute(SELECT_COMPANY_NAMES, (user_id,))
+            return [row["name"] for row in rows]
+        return await self._run(_select)
+
+    async def get_custom_companies(self, user_id: str) -> List[dict]:
+        def _select():
+            rows = self._connect().execute(SELECT_COMPANIES, (user_id,))
+            return [company_row_helper(row) for row in rows]
+        return await self._run(_select)
+
+    async def get_company_catalog_version(self, user_id: str) -> int:
+        def _select():
+            row = self._connect().execute(SELECT_CATALOG_VERSION, (user_id,)).fetchone()
+            return row["version"] if row else 0
+        return await self._run(_select)
+
+    async def add_company(self, user_id: str, company_name: str) -> dict:
+        def _add():
+            conn = self._connect()
+            # The unique (user_id, lower(name)) index makes this idempotent
+            with conn:
+                cursor = conn.execute(INSERT_COMPANY, (new_id(), user_id, company_name))
+                if cursor.rowcount > 0:
+                    conn.execute(BUMP_CATALOG_VERSION, (user_id,))
+            return self._get_company_by_name(user_id, company_name)
+        return await self._run(_add)
+
+    def _stored_company_names(self, conn: sqlite3.Connection, user_id: str, lowers: List[str]) -> Dict[str, str]:
+        """{lowercased name: stored name} for the user's companies among lowers"""
+        stored = {}
+        for chunk in chunked(lowers):
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in conn.execute(
+                f"SELECT name FROM companies WHERE user_id = ? AND lower(name) IN ({placeholders})",
+                (user_id, *chunk)
+            ):
+                stored[row["name"].lower()] = row["name"]
+        return stored
+
+    async def add_companies(self, user_id: str, company_names: List[str]) -> Tuple[Dict[str, str], int]:
+        def _add():
+            conn = self._connect()
+            by_lower = {}
+            for name in company_names:
+                by_lower.setdefault(name.lower(), name)
+
+            stored = self._stored_company_names(conn, user_id, list(by_lower))
+
+            missing = [name for lower, name in by_lower.items() if lower not in stored]
+            added = 0
+            if missing:
+                with conn:
+                    # Names another request added first are ignored by the unique index
+                    added = conn.executemany(INSERT_COMPANY, [(new_id(), user_id, name) for name in missing]).rowcount
+                    if added:
+                        conn.execute(BUMP_CATALOG_VERSION, (user_id,))
+                # Read back what was stored, which for lost races is the other request's spelling
+                stored.update(self._stored_company_names(conn, user_id, [name.lower() for name in missing]))
+            return {name: stored[name.lower()] for name in company_names}, added
+        return await self._run(_add)
+
+    async def search_companies(self, user_id: str, prefix: str, limit: int = 10) -> List[str]:
+        def _search():
+            # Range scan on the (user_id, lower(name)) index instead of LIKE
+            lower = prefix.lower()
+            rows = self._connect().execute(SEARCH_COMPANIES, (user_id, lower, lower + "\uffff", limit))
+            return [row["name"] for row in rows]
+        return await self._run(_search)
+
+    async def delete_company(self, user_id: str, company_id: str) -> bool:
+        def _delete():
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(DELETE_COMPANY, (user_id, company_id))
+                if cursor.rowcount > 0:
+                    conn.execute(BUMP_CATALOG_VERSION, (user_id,))
+            return cursor.rowcount > 0
+        return await self._run(_delete)
+
+    async def get_company_by_name(self, user_id: str, company_name: str) -> Optional[dict]:
+        return await self._run(self._get_company_by_name, user_id, company_name)
@@ -0,0 +1,464 @@
+"""
+Storage backend interface - debt and company operations shared by every engine
+The active backend is chosen with Settings.STORAGE_BACKEND ("mongodb" or "sqlite")
+"""
+import re
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from core.config import settings
+
+# Background job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+class VersionConflict(Exception):
+    """A conditional update found a different version than the caller expected"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Debt has been modified (current version {current_version})")
+        self.current_version = current_version
+
+
+class DebtArchived(Exception):
+    """A write targeted a debt that has been moved to the archive, which is read-only"""
+
+    def __init__(self, debt_id: str):
+        super().__init__(f"Debt {debt_id} is archived and can no longer be changed")
+        self.debt_id = debt_id
+
+
+class StorageBackend(ABC):
+    """Operations every storage engine must provide, all scoped by user_id"""
+
+    @abstractmethod
+    async def ensure_indexes(self) -> None:
+        """Create tables/indexes needed by the queries below"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release connections and worker threads; the backend is not used afterwards"""
+
+    # ============ DEBT OPERATIONS ============
+
+    @abstractmethod
+    async def create_debt(self, user_id: str, debt_data: dict) -> dict:
+        """Create a new debt record"""
+
+    @abstractmethod
+    async def insert_debts(self, user_id: str, debts: List[dict], checkpoint: bool = True) -> int:
+        """Insert a batch of already-validated debt records, returning how many were inserted
+
+        checkpoint=False skips the history snapshot check; callers inserting
+        several batches pass it for every batch and call checkpoint_history
+        once they are done.
+        """
+
+    @abstractmethod
+    async def checkpoint_history(self, user_id: str) -> None:
+        """Write a history snapshot if enough events have built up since the last one"""
+
+    @abstractmethod
+    async def get_debt(self, user_id: str, debt_id: str) -> Optional[dict]:
+        """Retrieve a single debt record by ID"""
+
+    @abstractmethod
+    async def get_all_debts(self, user_id: str, status: Optional[str] = None, stale_ok: bool = False,
+                            with_cents: bool = False) -> List[dict]:
+        """Retrieve all debt records, optionally filtered by status
+
+        stale_ok lets replicated backends answer from a secondary that may
+        lag recent writes (exports and dashboards, not read-after-write).
+        with_cents adds the stored amount_owed_cents and minimum_payment_cents,
+        for exports that need exact amounts rather than the decimal fields.
+        """
+
+    @abstractmethod
+    async def search_debts(self, user_id: str, query: str, skip: int = 0, limit: int = 20) -> Dict[str, Any]:
+        """Ranked search over company names and notes: {"total": int, "results": [debt + score]}"""
+
+    @abstractmethod
+    async def get_debt_composition(self, user_id: str, today: date) -> List[dict]:
+        """Positive amounts summed per display status (Active/Overdue/Paid Off), company and currency
+
+        Each row has display_status, company_name, currency, amount_cents
+        (exact integer total) and debts.
+        """
+
+    @abstractmethod
+    async def get_debts_due_between(self, user_id: str, start: date, end: date) -> List[dict]:
+        """Live debts with start <= due_date <= end, each with its template_id (None if not recurring)"""
+
+    @abstractmethod
+    async def update_debt(self, user_id: str, debt_id: str, debt_data: dict,
+                          expected_version: Optional[int] = None) -> Optional[dict]:
+        """Update an existing debt record, raising VersionConflict if expected_version no longer matches
+
+        Archived debts are read-only: writing one raises DebtArchived.
+        """
+
+    async def patch_debt(self, user_id: str, debt_id: str, changes: dict,
+                         expected_version: Optional[int] = None) -> Optional[Tuple[dict, bool]]:
+        """Write only the fields that differ from the stored debt
+
+        Returns (debt, modified), or None if the debt does not exist. When
+        nothing differs no write (and so no history event) happens at all.
+        """
+        for _attempt in range(3):
+            current = await self.get_debt(user_id, debt_id)
+            if current is None:
+                return None
+            if expected_version is not None and current["version"] != expected_version:
+                raise VersionConflict(current["version"])
+
+            delta = {field: value for field, value in changes.items() if current.get(field) != value}
+            if not delta:
+                return current, False
+            try:
+                # Conditional on the version diffed against, so a concurrent write is never undone
+                updated = await self.update_debt(user_id, debt_id, delta, expected_version=current["version"])
+            except VersionConflict:
+                if expected_version is not None:
+                    raise
+                continue
+            return (updated, True) if updated else None
+        raise VersionConflict(current["version"])
+
+    @abstractmethod
+    async def delete_debt(self, user_id: str, debt_id: str) -> bool:
+        """Delete a debt record"""
+
+    @abstractmethod
+    async def bulk_update_status(self, user_id: str, debt_ids: List[str], status: str) -> int:
+        """Set the status of many debt records, returning how many changed"""
+
+    @abstractmethod
+    async def bulk_delete_debts(self, user_id: str, debt_ids: List[str]) -> int:
+        """Delete many debt records, returning how many were removed"""
+
+    # ============ ARCHIVE ============
+
+    @abstractmethod
+    async def archive_paid_debts(self, paid_before: datetime) -> int:
+        """Move debts paid off before a cutoff into the archive tier, returning how many moved"""
+
+    @abstractmethod
+    async def purge_deleted_debts(self, deleted_before: datetime) -> int:
+        """Permanently remove debts soft-deleted before a cutoff, returning how many were purged"""
+
+    @abstractmethod
+    async def get_archived_debts(self, user_id: str, limit: int = 20,
+                                 after: Optional[Tuple[datetime, str]] = None) -> Dict[str, Any]:
+        """One page of archived debts, most recently paid first
+
+        Returns {"total", "amount_cents", "results", "next_after"}; amount_cents
+        is {currency: exact total}. Totals are None except on the first page
+        and next_after is None on the last.
+        """
+
+    # ============ RECURRING TEMPLATES ============
+
+    @abstractmethod
+    async def create_template(self, user_id: str, template_data: dict) -> dict:
+        """Create a recurring debt template (template_data includes materialized_through)"""
+
+    @abstractmethod
+    async def get_templates(self, user_id: str) -> List[dict]:
+        """All of a user's recurring templates, sorted by company"""
+
+    @abstractmethod
+    async def get_template(self, user_id: str, template_id: str) -> Optional[dict]:
+        """Retrieve a recurring template by ID"""
+
+    @abstractmethod
+    async def update_template(self, user_id: str, template_id: str, template_data: dict) -> Optional[dict]:
+        """Update a template; debts already materialized from it are left as they are"""
+
+    @abstractmethod
+    async def delete_template(self, user_id: str, template_id: str) -> bool:
+        """Delete a template; debts already materialized from it are kept"""
+
+    @abstractmethod
+    async def get_templates_to_materialize(self, through: date, user_id: Optional[str] = None) -> List[dict]:
+        """Templates materialized up to an earlier day than through (all users by default), each with user_id"""
+
+    @abstractmethod
+    async def materialize_occurrences(self, user_id: str, template_id: str, debts: List[dict], through: date) -> int:
+        """Insert a template's occurrences and advance its materialized_through, returning how many were added
+
+        Occurrences whose (template, due date) is already stored are skipped,
+        so the same window can be materialized twice without duplicates.
+        """
+
+    # ============ HISTORY ============
+
+    @abstractmethod
+    async def get_state_as_of(self, user_id: str, before: datetime) -> Dict[str, dict]:
+        """Tracked debt fields ({debt_id: fields}) as they stood just before a timestamp"""
+
+    @abstractmethod
+    async def get_events(self, user_id: str, start: datetime, end: datetime) -> List[dict]:
+        """History events with start <= ts < end, oldest first"""
+
+    @abstractmethod
+    async def get_rollup_buckets(self, user_id: str, start: date, end: date) -> Tuple[List[dict], List[dict]]:
+        """Summed rollup buckets before start, plus daily buckets for [start, end] ordered by day"""
+
+    @abstractmethod
+    async def rebuild_rollups(self, user_id: Optional[str] = None) -> None:
+        """Recompute daily rollup buckets from the event log (all users by default)"""
+
+    # ============ JOBS ============
+
+    @abstractmethod
+    async def create_job(self, user_id: str, job_type: str, params: dict) -> dict:
+        """Record a new queued job"""
+
+    @abstractmethod
+    async def get_job(self, user_id: str, job_id: str) -> Optional[dict]:
+        """Retrieve a job by ID"""
+
+    @abstractmethod
+    async def list_jobs(self, user_id: str, limit: int = 20) -> List[dict]:
+        """Most recent jobs first"""
+
+    @abstractmethod
+    async def update_job(self, job_id: str, fields: dict) -> Optional[dict]:
+        """Set job fields (status, progress, result...) and return the updated job"""
+
+    @abstractmethod
+    async def request_job_cancel(self, user_id: str, job_id: str) -> Optional[dict]:
+        """Flag a queued or running job for cancellation and return it"""
+
+    @abstractmethod
+    async def touch_jobs(self, job_ids: List[str]) -> int:
+        """Refresh updated_at on those of the jobs still queued/running (their worker's heartbeat)"""
+
+    @abstractmethod
+    async def fail_stale_jobs(self, updated_before: datetime) -> int:
+        """Mark queued/running jobs with no update since a cutoff as failed (their worker died)"""
+
+    @abstractmethod
+    async def purge_jobs(self, finished_before: datetime) -> int:
+        """Delete jobs that finished before a cutoff"""
+
+    # ============ COMPANY OPERATIONS ============
+
+    @abstractmethod
+    async def get_all_companies(self, user_id: str) -> List[str]:
+        """Retrieve all company names"""
+
+    @abstractmethod
+    async def get_custom_companies(self, user_id: str) -> List[dict]:
+        """All companies as {"id", "name"}, sorted by name"""
+
+    @abstractmethod
+    async def get_company_catalog_version(self, user_id: str) -> int:
+        """Counter bumped by every company add/delete (0 before the first change)"""
+
+    @abstractmethod
+    async def add_company(self, user_id: str, company_name: str) -> dict:
+        """Add a new company name; names are unique per user ignoring case, so a
+        name differing only in case returns the stored company"""
+
+    @abstractmethod
+    async def add_companies(self, user_id: str, company_names: List[str]) -> Tuple[Dict[str, str], int]:
+        """Add missing companies in one batch: ({given name: stored name}, number actually inserted)"""
+
+    @abstractmethod
+    async def search_companies(self, user_id: str, prefix: str, limit: int = 10) -> List[str]:
+        """Company names starting with prefix (case-insensitive)"""
+
+    @abstractmethod
+    async def delete_company(self, user_id: str, company_id: str) -> bool:
+        """Delete a company"""
+
+    @abstractmethod
+    async def get_company_by_name(self, user_id: str, company_name: str) -> Optional[dict]:
+        """Get company by name, ignoring case"""
+
+
+class MongoStorage(StorageBackend):
+    """MongoDB backend - delegates to the Motor CRUD functions in crud_db"""
+
+    def __init__(self):
+        from backend.database import crud_db
+        self.crud = crud_db
+
+    async def ensure_indexes(self) -> None:
+        await self.crud.ensure_indexes()
+
+    async def close(self) -> None:
+        self.crud.close_client()
+
+    async def create_debt(self, user_id: str, debt_data: dict) -> dict:
+        return await self.crud.create_debt(user_id, debt_data)
+
+    async def insert_debts(self, user_id: str, debts: List[dict], checkpoint: bool = True) -> int:
+        return await self.crud.insert_debts(user_id, debts, checkpoint=checkpoint)
+
+    async def checkpoint_history(self, user_id: str) -> None:
+        await self.crud.checkpoint_if_due(user_id)
+
+    async def get_debt(self, user_id: str, debt_id: str) -> Optional[dict]:
+        return await self.crud.get_debt(user_id, debt_id)
+
+    async def get_all_debts(self, user_id: str, status: Optional[str] = None, stale_ok: bool = False,
+                            with_cents: bool = False) -> List[dict]:
+        return await self.crud.get_all_debts(user_id, status=status, stale_ok=stale_ok, with_cents=with_cents)
+
+    async def search_debts(self, user_id: str, query: str, skip: int = 0, limit: int = 20) -> Dict[str, Any]:
+        return await self.crud.search_debts(user_id, query, skip=skip, limit=limit)
+
+    async def get_debt_composition(self, user_id: str, today: date) -> List[dict]:
+        return await self.crud.get_debt_composition(user_id, today)
+
+    async def get_debts_due_between(self, user_id: str, start: date, end: date) -> List[dict]:
+        return await self.crud.get_debts_due_between(user_id, start, end)
+
+    async def update_debt(self, user_id: str, debt_id: str, debt_data: dict,
+                          expected_version: Optional[int] = None) -> Optional[dict]:
+        return await self.crud.update_debt(user_id, debt_id, debt_data, expected_version=expected_version)
+
+    async def delete_debt(self, user_id: str, debt_id: str) -> bool:
+        return await self.crud.delete_debt(user_id, debt_id)
+
+    async def bulk_update_status(self, user_id: str, debt_ids: List[str], status: str) -> int:
+        return await self.crud.bulk_update_status(user_id, debt_ids, status)
+
+    async def bulk_delete_debts(self, user_id: str, debt_ids: List[str]) -> int:
+        return await self.crud.bulk_delete_debts(user_id, debt_ids)
+
+    async def archive_paid_debts(self, paid_before: datetime) -> int:
+        return await self.crud.archive_paid_debts(paid_before)
+
+    async def purge_deleted_debts(self, deleted_before: datetime) -> int:
+        return await self.crud.purge_deleted_debts(deleted_before)
+
+    async def get_archived_debts(self, user_id: str, limit: int = 20,
+                                 after: Optional[Tuple[datetime, str]] = None) -> Dict[str, Any]:
+        return await self.crud.get_archived_debts(user_id, limit=limit, after=after)
+
+    async def create_template(self, user_id: str, template_data: dict) -> dict:
+        return await self.crud.create_template(user_id, template_data)
+
+    async def get_templates(self, user_id: str) -> List[dict]:
+        return await self.crud.get_templates(user_id)
+
+    async def get_template(self, user_id: str, template_id: str) -> Optional[dict]:
+        return await self.crud.get_template(user_id, template_id)
+
+    async def update_template(self, user_id: str, template_id: str, template_data: dict) -> Optional[dict]:
+        return await self.crud.update_template(user_id, template_id, template_data)
+
+    async def delete_template(self, user_id: str, template_id: str) -> bool:
+        return await self.crud.delete_template(user_id, template_id)
+
+    async def get_templates_to_materialize(self, through: date, user_id: Optional[str] = None) -> List[dict]:
+        return await self.crud.get_templates_to_materialize(through, user_id=user_id)
+
+    async def materialize_occurrences(self, user_id: str, template_id: str, debts: List[dict], through: date) -> int:
+        return await self.crud.materialize_occurrences(user_id, template_id, debts, through)
+
+    async def get_state_as_of(self, user_id: str, before: datetime) -> Dict[str, dict]:
+        return await self.crud.get_state_as_of(user_id, before)
+
+    async def get_events(self, user_id: str, start: datetime, end: datetime) -> List[dict]:
+        return await self.crud.get_events(user_id, start, end)
+
+    async def get_rollup_buckets(self, user_id: str, start: date, end: date) -> Tuple[List[dict], List[dict]]:
+        return await self.crud.get_rollup_buckets(user_id, start, end)
+
+    async def rebuild_rollups(self, user_id: Optional[str] = None) -> None:
+        await self.crud.rebuild_rollups(user_id)
+
+    async def create_job(self, user_id: str, job_type: str, params: dict) -> dict:
+        return await self.crud.create_job(user_id, job_type, params)
+
+    async def get_job(self, user_id: str, job_id: str) -> Optional[dict]:
+        return await self.crud.get_job(user_id, job_id)
+
+    async def list_jobs(self, user_id: str, limit: int = 20) -> List[dict]:
+        return await self.crud.list_jobs(user_id, limit=limit)
+
+    async def update_job(self, job_id: str, fields: dict) -> Optional[dict]:
+        return await self.crud.update_job(job_id, fields)
+
+    async def request_job_cancel(self, user_id: str, job_id: str) -> Optional[dict]:
+        return await self.crud.request_job_cancel(user_id, job_id)
+
+    async def touch_jobs(self, job_ids: List[str]) -> int:
+        return await self.crud.touch_jobs(job_ids)
+
+    async def fail_stale_jobs(self, updated_before: datetime) -> int:
+        return await self.crud.fail_stale_jobs(updated_before)
+
+    async def purge_jobs(self, finished_before: datetime) -> int:
+        return await self.crud.purge_jobs(finished_before)
+
+    async def get_all_companies(self, user_id: str) -> List[str]:
+        return await self.crud.get_all_companies(user_id)
+
+    async def get_custom_companies(self, user_id: str) -> List[dict]:
+        return await self.crud.get_custom_companies(user_id)
+
+    async def get_company_catalog_version(self, user_id: str) -> int:
+        return await self.crud.get_company_catalog_version(user_id)
+
+    async def add_company(self, user_id: str, company_name: str) -> dict:
+        return await self.crud.add_company(user_id, company_name)
+
+    async def add_companies(self, user_id: str, company_names: List[str]) -> Tuple[Dict[str, str], int]:
+        return await self.crud.add_companies(user_id, company_names)
+
+    async def search_companies(self, user_id: str, prefix: str, limit: int = 10) -> List[str]:
+        return await self.crud.search_companies(user_id, prefix, limit=limit)
+
+    async def delete_company(self, user_id: str, company_id: str) -> bool:
+        return await self.crud.delete_company(user_id, company_id)
+
+    async def get_company_by_name(self, user_id: str, company_name: str) -> Optional[dict]:
+        return await self.crud.get_company_by_name(user_id, company_name)
+
+
+def encode_archive_cursor(after: Optional[Tuple[datetime, str]]) -> Optional[str]:
+    """Opaque page cursor for the (paid_at, id) of the last archived debt on a page"""
+    if after is None:
+        return None
+    paid_at, debt_id = after
+    return f"{paid_at.isoformat()}_{debt_id}"
+
+def decode_archive_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_archive_cursor; raises ValueError for malformed cursors"""
+    paid_at, _, debt_id = cursor.rpartition("_")
+    if not re.fullmatch(r"[0-9a-f]{24}", debt_id):
+        raise ValueError("Invalid cursor")
+    return datetime.fromisoformat(paid_at), debt_id
+
+
+_storage: Optional[StorageBackend] = None
+
+def get_storage() -> StorageBackend:
+    """Returns the configured storage backend (created on first use)"""
+    global _storage
+    if _storage is None:
+        backend = settings.STORAGE_BACKEND.lower()
+        if backend == "sqlite":
+            from backend.database.sqlite_db import SQLiteStorage
+            _storage = SQLiteStorage(settings.SQLITE_PATH, pool_size=settings.SQLITE_POOL_SIZE)
+        elif backend == "mongodb":
+            _storage = MongoStorage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND '{settings.STORAGE_BACKEND}'")
+    return _storage
+
+async def close_storage() -> None:
+    """Close the backend created by get_storage, if any (on shutdown)"""
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
@@ -0,0 +1,199 @@
+"""
+Bulk debt import - streams CSV and OFX uploads through validation into batched inserts
+Rows are read lazily from the (disk-spooled) upload, validated and inserted one
+batch at a time, so memory stays flat however large the file is.
+"""
+import codecs
+import csv
+import io
+import re
+from datetime import datetime
+from itertools import islice
+from typing import Awaitable, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+from starlette.concurrency import run_in_threadpool
+from backend.models.debt_schema import DebtCreate
+
+# Rows validated and inserted per batch
+IMPORT_BATCH_SIZE = 1000
+# Row errors echoed back in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+CSV_REQUIRED_COLUMNS = ("company_name", "amount_owed", "minimum_payment", "due_date")
+CSV_OPTIONAL_COLUMNS = ("currency", "status", "notes")
+
+# (line or transaction number, raw field values)
+RawRow = Tuple[int, Dict[str, str]]
+
+# Validating a whole batch as one list keeps the loop inside pydantic-core
+debt_batch_adapter = TypeAdapter(List[DebtCreate])
+
+def clean_amount(value: str) -> str:
+    """Drop currency labels and thousands separators ("RM 1,250.00" -> "1250.00")"""
+    return re.sub(r"[^\d.\-]", "", value or "")
+
+def column_key(header: str) -> str:
+    """Normalise a CSV header ("Amount Owed" -> "amount_owed")"""
+    return re.sub(r"\W+", "_", header.strip().lower()).strip("_")
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[RawRow]:
+    """Lazily yield rows from a UTF-8 CSV upload; raises ValueError for a bad header"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        raise ValueError("CSV file is empty")
+    columns = [column_key(name) for name in header]
+    missing = [name for name in CSV_REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+    wanted = [
+        (index, name) for index, name in enumerate(columns)
+        if name in CSV_REQUIRED_COLUMNS or name in CSV_OPTIONAL_COLUMNS
+    ]
+
+    def rows():
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            row = {name: values[index].strip() if index < len(values) else "" for index, name in wanted}
+            for name in ("amount_owed", "minimum_payment"):
+                row[name] = clean_amount(row[name])
+            if row.get("currency"):
+                row["currency"] = row["currency"].upper()
+            # Blank optional fields take the schema defaults
+            for name in ("currency", "status"):
+                if not row.get(name):
+                    row.pop(name, None)
+            yield reader.line_num, row
+    return rows()
+
+# OFX is SGML-like: <TAG>value with optional closing tags, often all on one line
+OFX_TOKEN = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+def iter_ofx_rows(stream: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[RawRow]:
+    """Lazily yield one debt row per debit transaction (<STMTTRN>) in an OFX/QFX statement
+
+    The payee becomes the company, the posting date the due date and the
+    statement's <CURDEF> the currency; credits (payments and refunds) are skipped.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    transaction = None
+    currency = None
+    number = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += decoder.decode(chunk, final=not chunk)
+        # Keep a possibly incomplete trailing token for the next chunk
+        cut = len(buffer) if not chunk else buffer.rfind("<")
+        for closing, tag, value in OFX_TOKEN.findall(buffer[:max(cut, 0)]):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if not closing:
+                    transaction = {}
+                elif transaction is not None:
+                    number += 1
+                    row = ofx_transaction_row(transaction, currency)
+                    if row is not None:
+                        yield number, row
+                    transaction = None
+            elif tag == "CURDEF" and not closing:
+                currency = value.strip().upper() or None
+            elif transaction is not None and not closing:
+                transaction.setdefault(tag, value.strip())
+        buffer = buffer[max(cut, 0):]
+        if not chunk:
+            return
+
+def ofx_transaction_row(transaction: Dict[str, str], currency: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """Map an OFX transaction to debt fields, or None for credits"""
+    amount = clean_amount(transaction.get("TRNAMT", ""))
+    if amount and not amount.startswith("-"):
+        return None
+    amount = amount.lstrip("-")
+    posted = transaction.get("DTPOSTED", "")[:8]
+    try:
+        due_date = datetime.strptime(posted, "%Y%m%d").date().isoformat()
+    except ValueError:
+        due_date = posted
+    notes = " ".join(part for part in (transaction.get("MEMO", ""), f"FITID {transaction.get('FITID', '')}") if part.strip())
+    row = {
+        "company_name": transaction.get("NAME") or transaction.get("MEMO", ""),
+        "amount_owed": amount,
+        "minimum_payment": amount,
+        "due_date": due_date,
+        "notes": notes
+    }
+    if currency:
+        row["currency"] = currency
+    return row
+
+def validate_batch(rows: Iterator[RawRow]) -> Tuple[int, List[dict], List[dict]]:
+    """Read and validate up to IMPORT_BATCH_SIZE rows: (rows read, valid debts, row errors)"""
+    batch = []
+    errors = []
+    try:
+        batch.extend(islice(rows, IMPORT_BATCH_SIZE))
+    except (csv.Error, UnicodeError) as e:
+        errors.append({"row": None, "error": f"Could not parse the rest of the file: {e}"})
+
+    raws = [raw for _row_number, raw in batch]
+    try:
+        debts = debt_batch_adapter.validate_python(raws)
+    except ValidationError as e:
+        # Report each failing row, then validate the rest again without them
+        messages: Dict[int, List[str]] = {}
+        for error in e.errors():
+            index, *field = error["loc"]
+            messages.setdefault(index, []).append(f"{'.'.join(str(part) for part in field)}: {error['msg']}")
+        errors.extend({"row": batch[index][0], "error": "; ".join(text)} for index, text in messages.items())
+        debts = debt_batch_adapter.validate_python([raw for index, raw in enumerate(raws) if index not in messages])
+
+    valid = []
+    for debt in debts:
+        record = debt.model_dump()
+        record["due_date"] = record["due_date"].isoformat()
+        record["status"] = record["status"].value
+        valid.append(record)
+    return len(batch), valid, errors
+
+async def import_debts(
+    storage,
+    user_id: str,
+    rows: Iterator[RawRow],
+    on_batch: Optional[Callable[[dict], Awaitable[None]]] = None
+) -> dict:
+    """Validate and insert rows batch by batch, returning an import report
+
+    on_batch, if given, is awaited with the running report after each batch
+    but the last.
+    """
+    report = {"imported": 0, "failed": 0, "companies_added": 0, "errors": [], "errors_truncated": False}
+    while True:
+        # Parsing and validation are CPU-bound; keep them off the event loop
+        read, debts, errors = await run_in_threadpool(validate_batch, rows)
+
+        report["failed"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report["errors"])
+        report["errors"].extend(errors[:room])
+        report["errors_truncated"] = report["errors_truncated"] or len(errors) > room
+
+        if debts:
+            # One lookup per batch resolves every company, adding the new ones
+            names, added = await storage.add_companies(user_id, list({debt["company_name"] for debt in debts}))
+            for debt in debts:
+                debt["company_name"] = names[debt["company_name"]]
+            report["companies_added"] += added
+            report["imported"] += await storage.insert_debts(user_id, debts, checkpoint=False)
+
+        if read < IMPORT_BATCH_SIZE:
+            break
+        if on_batch is not None:
+            await on_batch(report)
+
+    # One history snapshot check for the whole import rather than one per batch,
+    # made once the rows run out (which may be on an empty read after a full batch)
+    if report["imported"]:
+        await storage.checkpoint_history(user_id)
+    return report
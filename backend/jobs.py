@@ -0,0 +1,241 @@
+"""
+Background jobs - long-running operations run off the request path
+A job is recorded in storage when it is submitted, so any API process can
+report its status; the process that accepted it runs it on a small pool of
+worker tasks, and keeps the jobs it holds alive with a heartbeat so that only
+the jobs of dead workers are ever failed as stale. Handlers report progress
+through a JobContext, which is also where cancellation requests are noticed.
+"""
+import asyncio
+import os
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from backend.database.history import utc_now
+from backend.database.storage import get_storage, JOB_CANCELLED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+from backend.importer import import_debts, iter_csv_rows, iter_ofx_rows
+from backend.limits import coalesced_reads
+from backend.recurrence import materialize_recurring
+from core.config import settings
+from core.log import get_logger, request_id_var
+
+logger = get_logger("jobs")
+
+# Workers refresh the updated_at of every job they hold this often, so a job
+# left queued/running STALE_JOB_MINUTES without an update belongs to a dead worker
+HEARTBEAT_SECONDS = 30
+STALE_JOB_MINUTES = 2
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation has been requested"""
+
+
+class JobContext:
+    """Progress reporting handle passed to job handlers"""
+    # Progress writes closer together than this are skipped
+    REPORT_INTERVAL = 0.5
+
+    def __init__(self, job_id: str, user_id: str):
+        self.job_id = job_id
+        self.user_id = user_id
+        # Partial result kept if the job is cancelled part way through
+        self.result: Optional[dict] = None
+        self._last_report = 0.0
+
+    async def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """Record progress (0-1); raises JobCancelled if the job should stop"""
+        now = time.monotonic()
+        if now - self._last_report < self.REPORT_INTERVAL:
+            return
+        self._last_report = now
+        fields = {"progress": round(min(max(fraction, 0.0), 1.0), 4)}
+        if message is not None:
+            fields["message"] = message
+        job = await get_storage().update_job(self.job_id, fields)
+        if job is not None and job["cancel_requested"]:
+            raise JobCancelled()
+
+
+JobHandler = Callable[[JobContext, dict], Awaitable[Optional[dict]]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+def job_handler(job_type: str):
+    """Register a coroutine as the handler for a job type"""
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[job_type] = handler
+        return handler
+    return register
+
+
+class JobRunner:
+    """Runs submitted jobs on JOB_WORKERS asyncio tasks"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+        self.tasks = []
+        # IDs of the jobs queued or running in this process
+        self.held = set()
+
+    async def start(self) -> None:
+        """Start this process's workers and heartbeat (cleaning up after dead ones is clean_up_jobs' work)"""
+        self.tasks = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self.heartbeat()))
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs they were running are marked failed"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def submit(self, user_id: str, job_type: str, params: Optional[dict] = None) -> dict:
+        """Record a job and queue it on this process, tagged with the submitting request's ID"""
+        if job_type not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job = await get_storage().create_job(user_id, job_type, params or {})
+        self.held.add(job["id"])
+        self.queue.put_nowait((job["id"], user_id, request_id_var.get()))
+        return job
+
+    async def heartbeat(self) -> None:
+        """Refresh the held jobs every HEARTBEAT_SECONDS, however long they wait or run"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            if not self.held:
+                continue
+            try:
+                await get_storage().touch_jobs(list(self.held))
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+    async def work(self) -> None:
+        """Worker loop: run queued jobs one at a time"""
+        while True:
+            job_id, user_id, request_id = await self.queue.get()
+            # The job's log lines carry the ID of the request that submitted it
+            token = request_id_var.set(request_id)
+            try:
+                await self.run(job_id, user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job could not be recorded", extra={"fields": {"job_id": job_id}})
+            finally:
+                self.held.discard(job_id)
+                request_id_var.reset(token)
+                self.queue.task_done()
+
+    async def run(self, job_id: str, user_id: str) -> None:
+        """Run one job and record how it ended"""
+        storage = get_storage()
+        job = await storage.get_job(user_id, job_id)
+        if job is None:
+            return
+        params = job["params"]
+        try:
+            if job["status"] != JOB_QUEUED:
+                # Failed as stale while it waited (say the heartbeat could not reach the database)
+                return
+            if job["cancel_requested"]:
+                await storage.update_job(job_id, {"status": JOB_CANCELLED, "finished_at": utc_now()})
+                return
+
+            # The job as it stands once marked running, so a cancellation that
+            # came in meanwhile is seen before the handler starts
+            job = await storage.update_job(job_id, {"status": JOB_RUNNING, "started_at": utc_now()})
+            if job is None:
+                return
+            if job["cancel_requested"]:
+                await storage.update_job(job_id, {"status": JOB_CANCELLED, "finished_at": utc_now()})
+                return
+            context = JobContext(job_id, user_id)
+            fields = {"job_id": job_id, "type": job["type"], "user_id": user_id}
+            started = time.perf_counter()
+            try:
+                result = await JOB_HANDLERS[job["type"]](context, params)
+            except JobCancelled:
+                await storage.update_job(job_id, {
+                    "status": JOB_CANCELLED, "result": context.result, "finished_at": utc_now()
+                })
+                logger.info("Job cancelled", extra={"fields": {**fields, "duration_ms": elapsed_ms(started)}})
+            except asyncio.CancelledError:
+                await storage.update_job(job_id, {
+                    "status": JOB_FAILED, "error": "Interrupted by server shutdown",
+                    "result": context.result, "finished_at": utc_now()
+                })
+                logger.warning("Job interrupted by server shutdown", extra={"fields": fields})
+                raise
+            except Exception as e:
+                await storage.update_job(job_id, {
+                    "status": JOB_FAILED, "error": str(e), "result": context.result, "finished_at": utc_now()
+                })
+                logger.exception("Job failed", extra={"fields": {**fields, "duration_ms": elapsed_ms(started)}})
+            else:
+                await storage.update_job(job_id, {
+                    "status": JOB_SUCCEEDED, "progress": 1.0, "message": None, "result": result,
+                    "finished_at": utc_now()
+                })
+                logger.info("Job succeeded", extra={"fields": {**fields, "duration_ms": elapsed_ms(started)}})
+        finally:
+            # Uploaded files are owned by their job, whatever happened to it
+            upload_path = params.get("upload_path")
+            if upload_path and os.path.exists(upload_path):
+                os.remove(upload_path)
+
+
+job_runner = JobRunner(settings.JOB_WORKERS)
+
+async def clean_up_jobs() -> dict:
+    """Fail jobs left queued/running by dead workers and purge old finished ones
+
+    Runs in one process only (see backend.tasks.run_maintenance), never in
+    every worker's startup, where it would fail jobs its siblings are running.
+    """
+    storage = get_storage()
+    now = utc_now()
+    failed = await storage.fail_stale_jobs(now - timedelta(minutes=STALE_JOB_MINUTES))
+    purged = await storage.purge_jobs(now - timedelta(days=settings.JOB_RETENTION_DAYS))
+    return {"failed": failed, "purged": purged}
+
+
+# ============ JOB HANDLERS ============
+
+@job_handler("rollup_rebuild")
+async def run_rollup_rebuild(context: JobContext, params: dict) -> dict:
+    """Rebuild the user's daily trend rollups from the event log"""
+    # One storage call does the whole rebuild; the heartbeat keeps the job alive meanwhile
+    await context.progress(0.0, "Rebuilding trend rollups")
+    await get_storage().rebuild_rollups(context.user_id)
+    coalesced_reads.forget(context.user_id)
+    return {}
+
+@job_handler("recurring_materialize")
+async def run_recurring_materialize(context: JobContext, params: dict) -> dict:
+    """Store the user's recurring debt occurrences up to the horizon now"""
+    return {"materialized": await materialize_recurring(get_storage(), user_id=context.user_id)}
+
+@job_handler("import")
+async def run_import(context: JobContext, params: dict) -> dict:
+    """Import a CSV/OFX upload saved to params["upload_path"]"""
+    path = params["upload_path"]
+    size = os.path.getsize(path)
+    with open(path, "rb") as stream:
+        # The CSV header is read here, so off the event loop like the batches
+        rows = await run_in_threadpool(iter_csv_rows if params.get("format") == "csv" else iter_ofx_rows, stream)
+
+        async def report_batch(report: dict) -> None:
+            context.result = dict(report, errors=list(report["errors"]))
+            await context.progress(stream.tell() / size if size else 1.0, f"{report['imported']} debts imported")
+
+        try:
+            return await import_debts(get_storage(), context.user_id, rows, on_batch=report_batch)
+        finally:
+            # Batches already written stay written, even if the job stops
+            coalesced_reads.forget(context.user_id)
@@ -0,0 +1,102 @@
+"""
+Request limits - coalesced reads and per-client write rate limiting
+When many sessions rerun at once they all ask for the same data; reads
+wrapped in coalesced_reads.do() share one in-flight query per key instead
+of each scanning the database. Writes must call coalesced_reads.forget()
+once committed so later reads start a fresh query that sees them.
+
+Mutation endpoints depend on limit_writes, a token bucket per user:
+WRITE_RATE_BURST writes at once, refilled at WRITE_RATE_PER_SECOND, with
+429 and Retry-After once a user runs dry. Both are per API process.
+"""
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from fastapi import Depends, HTTPException
+from backend.auth import get_current_user
+from core.config import settings
+
+T = TypeVar("T")
+
+# Idle buckets are dropped once this many users have one
+MAX_BUCKETS = 10000
+
+class SingleFlight:
+    """Lets concurrent identical reads share one in-flight call
+
+    Keys are tuples starting with the user ID, so one user's writes only
+    detach that user's reads.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[Hashable, ...], asyncio.Future] = {}
+
+    async def do(self, key: Tuple[Hashable, ...], call: Callable[[], Awaitable[T]]) -> T:
+        """Await call(), or the identical call already in flight for key
+
+        Callers share the result object, so they must not modify it.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        # A caller that disconnects must not cancel the query for the others
+        return await asyncio.shield(future)
+
+    def _finished(self, key: Tuple[Hashable, ...], future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Mark the error as retrieved even if every waiter went away
+            future.exception()
+
+    def forget(self, user_id: Optional[str] = None) -> None:
+        """Stop joining reads already in flight for a user (or everyone)"""
+        for key in [key for key in self._calls if user_id is None or key[0] == user_id]:
+            del self._calls[key]
+
+
+class TokenBucket:
+    """Per-key token buckets refilled continuously"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str) -> float:
+        """Spend one token; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > MAX_BUCKETS:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        """Drop buckets that have refilled completely (same as having none)"""
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[key]
+
+
+coalesced_reads = SingleFlight()
+write_buckets = TokenBucket(settings.WRITE_RATE_PER_SECOND, settings.WRITE_RATE_BURST)
+
+async def limit_writes(user_id: str = Depends(get_current_user)) -> None:
+    """Reject the request with 429 if the user has used up their write budget"""
+    if settings.WRITE_RATE_PER_SECOND <= 0:
+        return
+    wait = write_buckets.take(user_id)
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many changes, please slow down",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
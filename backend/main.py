@@ -1,11 +1,23 @@
 """
 FastAPI main application - HutangKu - Debt Management Backend
 Runs on port 8000
+
+Development: uvicorn backend.main:app --reload
+Production:  python -m backend.server (API_WORKERS processes, no reloader)
 """
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from backend.routers import debt_router, company_router
+from backend.routers import debt_router, company_router, job_router, recurring_router, debug_router
+from backend.database.storage import close_storage, get_storage
+from backend.tasks import run_maintenance
+from backend.jobs import job_runner
+from backend.profiling import ProfilingMiddleware
+from backend.request_log import RequestLogMiddleware, log_http_exception
 from core.config import settings
+from core.log import configure_logging
+
+configure_logging()
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -26,6 +38,55 @@ app.add_middleware(
 # Include routers (no trailing slash in prefix, routes will be /debts, not /debts/)
 app.include_router(debt_router.router, prefix="/debts", tags=["debts"])
 app.include_router(company_router.router)  # prefix already set in router
+app.include_router(job_router.router)  # prefix already set in router
+app.include_router(recurring_router.router)  # prefix already set in router
+
+# Opt-in request profiling; nothing is installed (and nothing is paid) when disabled
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(debug_router.router)
+
+# Added last so it is outermost: request IDs and timings cover the whole stack
+app.add_middleware(RequestLogMiddleware)
+app.add_exception_handler(HTTPException, log_http_exception)
+
+@app.on_event("startup")
+async def create_indexes():
+    """Ensure per-user indexes exist before serving requests (backend.server does this once for its workers)"""
+    if not settings.SERVER_PREPARED:
+        await get_storage().ensure_indexes()
+
+@app.on_event("startup")
+async def start_maintenance():
+    """Archive sweeps, recurring debt top-ups and job cleanup in the background
+
+    Under backend.server these run in a process of their own rather than in
+    every worker, so only a single-process server runs them here.
+    """
+    app.state.maintenance = None
+    if not settings.SERVER_PREPARED:
+        app.state.maintenance = asyncio.create_task(run_maintenance())
+
+@app.on_event("startup")
+async def start_job_runner():
+    """Start the background job workers"""
+    await job_runner.start()
+
+@app.on_event("shutdown")
+async def stop_maintenance():
+    """Cancel the background maintenance tasks"""
+    if app.state.maintenance is not None:
+        app.state.maintenance.cancel()
+
+@app.on_event("shutdown")
+async def stop_job_runner():
+    """Stop the job workers, marking interrupted jobs as failed"""
+    await job_runner.stop()
+
+@app.on_event("shutdown")
+async def close_database():
+    """Close this worker's database connections once nothing else needs them"""
+    await close_storage()
 
 @app.get("/", tags=["root"])
 async def read_root():
@@ -42,10 +103,5 @@ async def health_check():
     return {"status": "healthy"}
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=settings.API_PORT,
-        reload=True
-    )
\ No newline at end of file
+    from backend.server import serve
+    serve()
@@ -1,34 +1,52 @@
 """
 Pydantic schemas for Debt records - defines structure and validation
 """
-from pydantic import BaseModel, Field, field_validator
-from datetime import date
-from typing import Optional
+from pydantic import AfterValidator, BaseModel, Field, field_validator
+from datetime import date, datetime
+from typing import Annotated, Dict, List, Optional
 from enum import Enum
+from backend.money import CURRENCY_PATTERN, base_currency, fx_rates, has_whole_cents
 
 class DebtStatus(str, Enum):
     """Allowed debt status values"""
     ACTIVE = "Active Debt"
     PAID_OFF = "Paid Off"
 
+def whole_cents(amount: float) -> float:
+    """Reject amounts with fractions of a cent (amounts are stored as integer cents)"""
+    if not has_whole_cents(amount):
+        raise ValueError("must have at most 2 decimal places")
+    return amount
+
+def known_currency(currency: str) -> str:
+    """Reject currencies the exchange rate table cannot convert"""
+    if currency not in fx_rates().rates:
+        raise ValueError(f"no exchange rate for {currency}")
+    return currency
+
+CentAmount = Annotated[float, AfterValidator(whole_cents)]
+KnownCurrency = Annotated[str, AfterValidator(known_currency)]
+
 class DebtBase(BaseModel):
     """Base debt schema with common fields"""
     company_name: str = Field(..., min_length=1, description="Name of the creditor/company")
-    amount_owed: float = Field(..., gt=0, description="Current outstanding balance")
-    minimum_payment: float = Field(..., gt=0, description="Minimum payment required")
+    amount_owed: CentAmount = Field(..., gt=0, description="Current outstanding balance")
+    minimum_payment: CentAmount = Field(..., gt=0, description="Minimum payment required")
+    currency: str = Field(default_factory=base_currency, pattern=CURRENCY_PATTERN, description="ISO 4217 code of both amounts")
     due_date: date = Field(..., description="Payment due date")
     status: DebtStatus = Field(default=DebtStatus.ACTIVE, description="Debt status")
     notes: Optional[str] = Field(default="", description="Optional notes or account numbers")
 
 class DebtCreate(DebtBase):
     """Schema for creating a new debt record"""
-    pass
+    currency: KnownCurrency = Field(default_factory=base_currency, pattern=CURRENCY_PATTERN, description="ISO 4217 code of both amounts")
 
 class DebtUpdate(BaseModel):
     """Schema for updating an existing debt record - all fields optional"""
     company_name: Optional[str] = Field(None, min_length=1)
-    amount_owed: Optional[float] = Field(None, gt=0)
-    minimum_payment: Optional[float] = Field(None, gt=0)
+    amount_owed: Optional[CentAmount] = Field(None, gt=0)
+    minimum_payment: Optional[CentAmount] = Field(None, gt=0)
+    currency: Optional[KnownCurrency] = Field(None, pattern=CURRENCY_PATTERN)
     due_date: Optional[date] = None
     status: Optional[DebtStatus] = None
     notes: Optional[str] = None
@@ -36,6 +54,104 @@ class DebtUpdate(BaseModel):
 class DebtResponse(DebtBase):
     """Schema for debt record responses"""
     id: str = Field(..., description="MongoDB document ID as string")
+    version: int = Field(1, description="Incremented on every write; send as If-Match to update conditionally")
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DebtStatusUpdate(BaseModel):
+    """Single status change inside a bulk request"""
+    id: str = Field(..., description="Debt ID")
+    status: DebtStatus = Field(..., description="New debt status")
+
+class DebtBulkRequest(BaseModel):
+    """Schema for applying many status changes and deletions in one request"""
+    updates: List[DebtStatusUpdate] = Field(default_factory=list, max_length=1000)
+    delete: List[str] = Field(default_factory=list, max_length=1000, description="Debt IDs to delete")
+
+class DebtBulkResponse(BaseModel):
+    """Result counts for a bulk request"""
+    updated: int
+    deleted: int
+
+class DebtSearchResult(DebtResponse):
+    """Debt record with its search relevance score"""
+    score: float = Field(..., description="Relevance score, higher is better")
+
+class DebtSearchResponse(BaseModel):
+    """Ranked, paginated search results"""
+    total: int
+    page: int
+    page_size: int
+    results: List[DebtSearchResult]
+
+class DebtHistoryPoint(BaseModel):
+    """End-of-day balances for one date"""
+    date: date
+    outstanding: float = Field(..., description="Total owed on active debts")
+    paid_off: float = Field(..., description="Total of paid-off debts")
+    active_count: int
+
+class DebtTrendPoint(BaseModel):
+    """Balances at the end of one day/week/month period"""
+    date: date
+    outstanding: float = Field(..., description="Total owed on active debts")
+    paid_off: float = Field(..., description="Total of paid-off debts")
+    by_company: Dict[str, float] = Field(default_factory=dict, description="Outstanding per company")
+
+class DebtCalendarEntry(BaseModel):
+    """A debt due on a day, or a recurring occurrence not yet stored as a debt"""
+    due_date: date
+    company_name: str
+    amount_owed: float
+    minimum_payment: float
+    currency: str
+    status: str
+    notes: Optional[str] = ""
+    debt_id: Optional[str] = Field(None, description="Stored debt (None for projected occurrences)")
+    template_id: Optional[str] = Field(None, description="Recurring template the occurrence comes from")
+    projected: bool = Field(False, description="Expanded from the template's rule, not stored yet")
+
+class DebtCompositionRow(BaseModel):
+    """Total owed to one company (or to all small ones) within a display status"""
+    display_status: str = Field(..., description="Active, Overdue or Paid Off")
+    company_name: str
+    amount_owed: float = Field(..., description="Total in the base currency")
+    debt_count: int
+    grouped_companies: int = Field(0, description="Companies merged into this row (0 for a single company)")
+
+class DebtComposition(BaseModel):
+    """Status x company totals for the dashboard charts"""
+    small_debt_threshold: float
+    grouped_count: int = Field(..., description="Companies merged into 'Other Debts' rows")
+    rows: List[DebtCompositionRow]
+
+class CurrencyList(BaseModel):
+    """Currencies the exchange rate table can convert"""
+    base: str = Field(..., description="Currency totals are reported in and new debts default to")
+    currencies: List[str]
+
+
+class ArchivedDebtResponse(DebtResponse):
+    """Paid-off debt served from the archive tier"""
+    paid_at: datetime = Field(..., description="When the debt was marked as paid off (UTC)")
+
+class DebtArchivePage(BaseModel):
+    """One page of archived debts, most recently paid first"""
+    total: Optional[int] = Field(None, description="Archived debt count (first page only)")
+    total_amount: Optional[float] = Field(None, description="Archived debt total in the base currency (first page only)")
+    results: List[ArchivedDebtResponse]
+    next_cursor: Optional[str] = Field(None, description="Pass as 'cursor' to fetch the next page")
+
+class DebtImportError(BaseModel):
+    """A row that could not be imported"""
+    row: Optional[int] = Field(None, description="CSV line or OFX transaction number")
+    error: str
+
+class DebtImportResponse(BaseModel):
+    """Outcome of a bulk import"""
+    imported: int
+    failed: int
+    companies_added: int
+    errors: List[DebtImportError]
+    errors_truncated: bool = Field(False, description="More rows failed than are listed in errors")
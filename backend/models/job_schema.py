@@ -0,0 +1,27 @@
+"""
+Pydantic schemas for background jobs
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+class JobCreate(BaseModel):
+    """Start a maintenance job on the caller's own data (imports are started by uploading to /jobs/import)"""
+    type: str = Field(
+        ..., pattern="^(rollup_rebuild|recurring_materialize)$",
+        description="rollup_rebuild or recurring_materialize"
+    )
+
+class JobResponse(BaseModel):
+    """Job status as polled by clients"""
+    id: str
+    type: str
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    progress: float = Field(..., ge=0, le=1)
+    message: Optional[str] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
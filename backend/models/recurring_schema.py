@@ -0,0 +1,54 @@
+"""
+Pydantic schemas for recurring debt templates
+"""
+from pydantic import AfterValidator, BaseModel, Field, model_validator
+from datetime import date
+from typing import Annotated, Optional
+from backend.models.debt_schema import CentAmount, KnownCurrency
+from backend.money import CURRENCY_PATTERN, base_currency
+from backend.recurrence import falls_due, valid_rule
+
+RecurrenceRule = Annotated[str, AfterValidator(valid_rule)]
+
+RULE_DESCRIPTION = (
+    'RFC 5545 RRULE counted from start_date, e.g. "FREQ=MONTHLY;BYMONTHDAY=15" '
+    'or "FREQ=WEEKLY;INTERVAL=2;COUNT=6" (daily or less often)'
+)
+
+class RecurringTemplateBase(BaseModel):
+    """Fields every occurrence of a recurring debt is created with"""
+    company_name: str = Field(..., min_length=1, description="Name of the creditor/company")
+    amount_owed: CentAmount = Field(..., gt=0, description="Amount owed on each occurrence")
+    minimum_payment: CentAmount = Field(..., gt=0, description="Minimum payment on each occurrence")
+    currency: str = Field(default_factory=base_currency, pattern=CURRENCY_PATTERN, description="ISO 4217 code of both amounts")
+    notes: Optional[str] = Field(default="", description="Optional notes or account numbers")
+    rule: str = Field(..., description=RULE_DESCRIPTION)
+    start_date: date = Field(..., description="First due date of the rule (its DTSTART)")
+
+class RecurringTemplateCreate(RecurringTemplateBase):
+    """Schema for creating a recurring debt template"""
+    currency: KnownCurrency = Field(default_factory=base_currency, pattern=CURRENCY_PATTERN, description="ISO 4217 code of both amounts")
+    rule: RecurrenceRule = Field(..., description=RULE_DESCRIPTION)
+
+    @model_validator(mode="after")
+    def rule_falls_due(self):
+        """A rule may only be able to fall due from some start dates (BYMONTH=2 from the 31st)"""
+        if not falls_due(self.rule, self.start_date):
+            raise ValueError(f"rule never falls due counted from {self.start_date}")
+        return self
+
+class RecurringTemplateUpdate(BaseModel):
+    """Schema for updating a template - applies to occurrences not yet stored as debts"""
+    company_name: Optional[str] = Field(None, min_length=1)
+    amount_owed: Optional[CentAmount] = Field(None, gt=0)
+    minimum_payment: Optional[CentAmount] = Field(None, gt=0)
+    currency: Optional[KnownCurrency] = Field(None, pattern=CURRENCY_PATTERN)
+    notes: Optional[str] = None
+    rule: Optional[RecurrenceRule] = Field(None, description=RULE_DESCRIPTION)
+    start_date: Optional[date] = None
+
+class RecurringTemplateResponse(RecurringTemplateBase):
+    """Schema for recurring debt template responses"""
+    id: str = Field(..., description="Template ID")
+    materialized_through: date = Field(..., description="Occurrences up to this day are stored as debts")
+    next_due_date: Optional[date] = Field(None, description="Next occurrence from today (None once the rule has ended)")
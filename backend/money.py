@@ -0,0 +1,107 @@
+"""
+Money - exact amounts as integer cents, each in its debt's currency
+Amounts are stored as integer minor units ("cents", hundredths of the
+currency unit), so totals are exact integer sums in the database and int64
+sums in pandas. The API keeps decimal amounts; to_cents/from_cents convert
+at the storage boundary.
+
+Totals spanning currencies are summed per currency first and each sum is
+converted once into the base currency of the rate table at FX_RATES_PATH,
+which is re-read whenever the file changes.
+"""
+import json
+import os
+import re
+from decimal import Decimal, ROUND_HALF_EVEN, ROUND_HALF_UP
+from typing import Any, Dict, Optional, Tuple, Union
+from core.config import settings
+
+# Amounts stored before debts carried a currency were all ringgit
+LEGACY_CURRENCY = "MYR"
+CURRENCY_PATTERN = r"^[A-Z]{3}$"
+
+# Decimal API fields and the integer columns that store them
+AMOUNT_FIELDS = ("amount_owed", "minimum_payment")
+
+Amount = Union[int, float, str, Decimal]
+
+def to_cents(amount: Amount) -> int:
+    """Amount in currency units as integer cents (half a cent rounds away from zero)"""
+    # str() of a float is its shortest repr, so 0.29 is exactly 29 cents
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> float:
+    """Integer cents as a float amount (the nearest float to the exact value)"""
+    return cents / 100
+
+def has_whole_cents(amount: Amount) -> bool:
+    """Whether an amount has no fraction of a cent"""
+    value = Decimal(str(amount))
+    return value == value.quantize(Decimal("0.01"))
+
+def parse_cents(value: Any) -> int:
+    """Lenient to_cents for legacy stored values, which may be labelled strings ("RM 1,250.00")"""
+    if isinstance(value, str):
+        value = re.sub(r"[^\d.\-]", "", value)
+    if value in (None, ""):
+        return 0
+    return to_cents(value)
+
+def amounts_to_cents(fields: dict) -> dict:
+    """Debt fields as stored: decimal amounts replaced by their *_cents columns"""
+    stored = {key: value for key, value in fields.items() if key not in AMOUNT_FIELDS}
+    for field in AMOUNT_FIELDS:
+        if fields.get(field) is not None:
+            stored[f"{field}_cents"] = to_cents(fields[field])
+    return stored
+
+
+class UnknownCurrency(ValueError):
+    """A currency with no rate in the rate table"""
+
+
+class RateTable:
+    """Exchange rates into one base currency (base units per unit of each currency)"""
+
+    def __init__(self, base: str, rates: Dict[str, Decimal]):
+        self.base = base
+        self.rates = {**rates, base: Decimal(1)}
+
+    def to_base_cents(self, cents: int, currency: str) -> int:
+        """Convert cents of currency into base-currency cents (banker's rounding)"""
+        if currency == self.base:
+            return cents
+        rate = self.rates.get(currency)
+        if rate is None:
+            raise UnknownCurrency(f"No exchange rate for {currency} in {os.path.basename(settings.FX_RATES_PATH)}")
+        return int((cents * rate).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+    def total(self, totals: Dict[str, int]) -> int:
+        """Base-currency cents for {currency: cents} totals"""
+        return sum(self.to_base_cents(cents, currency) for currency, cents in totals.items())
+
+
+# (file modification time, table) of the last load
+_loaded: Optional[Tuple[int, RateTable]] = None
+
+def fx_rates() -> RateTable:
+    """The rate table at FX_RATES_PATH, parsed again only after the file changes"""
+    global _loaded
+    mtime = os.stat(settings.FX_RATES_PATH).st_mtime_ns
+    loaded = _loaded
+    if loaded is not None and loaded[0] == mtime:
+        return loaded[1]
+    with open(settings.FX_RATES_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    # Rates are read through str so "4.2150" and 4.215 give the same Decimal
+    rates = {code.upper(): Decimal(str(rate)) for code, rate in data["rates"].items()}
+    invalid = [code for code, rate in rates.items() if not re.match(CURRENCY_PATTERN, code) or rate <= 0]
+    if invalid:
+        raise ValueError(f"Invalid exchange rate(s) in {settings.FX_RATES_PATH}: {', '.join(invalid)}")
+    table = RateTable(data["base"].upper(), rates)
+    _loaded = (mtime, table)
+    return table
+
+def base_currency() -> str:
+    """Currency totals are reported in (and new debts default to)"""
+    return fx_rates().base
@@ -0,0 +1,173 @@
+"""
+Request profiling - opt-in cProfile capture for tracking down slow pages
+Only installed when PROFILING_ENABLED is set, so normal deployments pay
+nothing. Requests sent with an "X-Profile: 1" header, plus a
+PROFILE_SAMPLE_RATE fraction of the rest, run under cProfile while database
+calls are timed; the last PROFILE_BUFFER_SIZE profiles are served under
+/debug/profiles. Profiles include every user's requests, so X-Profile is
+only honoured, and /debug only served, with the PROFILING_TOKEN admin token
+in an X-Profile-Token header.
+
+cProfile sees everything on the event loop thread, so one request is profiled
+at a time and anything running concurrently shows up in its profile too.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from typing import Deque, List, Optional
+from pymongo import monitoring
+from backend.auth import valid_profiling_token
+from backend.database.history import utc_now
+from core.config import settings
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+# Function rows kept in a profile's summary
+SUMMARY_FUNCTIONS = 15
+
+
+class RequestProfile:
+    """cProfile data and database timings captured for one request"""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.started_at = utc_now()
+        self.status_code: Optional[int] = None
+        self.duration_ms = 0.0
+        self.db_calls: List[dict] = []
+        self.profiler = cProfile.Profile()
+
+    def add_db_call(self, name: str, duration_ms: float) -> None:
+        """Record one database command or storage call"""
+        self.db_calls.append({"name": name, "duration_ms": round(duration_ms, 3)})
+
+    def stats(self) -> pstats.Stats:
+        """pstats view of the captured profile"""
+        return pstats.Stats(self.profiler)
+
+    def summary(self) -> dict:
+        """Timings plus the functions with the most cumulative time"""
+        stats = self.stats()
+        functions = []
+        for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+            functions.append({
+                "function": f"{name} ({filename}:{line})",
+                "calls": calls,
+                "own_ms": round(own * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3)
+            })
+        functions.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "db_ms": round(sum(call["duration_ms"] for call in self.db_calls), 3),
+            "db_calls": self.db_calls,
+            "top_functions": functions[:SUMMARY_FUNCTIONS]
+        }
+
+    def text_report(self, limit: int = 60) -> str:
+        """pstats listing sorted by cumulative time"""
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return out.getvalue()
+
+    def dump(self) -> bytes:
+        """Raw pstats data, as written by Stats.dump_stats (snakeviz, flameprof, python -m pstats)"""
+        return marshal.dumps(self.stats().stats)
+
+
+# The request currently being profiled, and the most recent finished ones
+active_profile: Optional[RequestProfile] = None
+recent_profiles: Deque[RequestProfile] = deque(maxlen=settings.PROFILE_BUFFER_SIZE)
+
+def record_db_call(name: str, duration_ms: float) -> None:
+    """Attribute a database call to the request being profiled, if any"""
+    profile = active_profile
+    if profile is not None:
+        profile.add_db_call(name, duration_ms)
+
+def get_profile(profile_id: str) -> Optional[RequestProfile]:
+    """Find a recent profile by ID"""
+    for profile in recent_profiles:
+        if profile.id == profile_id:
+            return profile
+    return None
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times MongoDB commands for the request being profiled
+
+    Motor runs commands on its own threads, so they are matched to the
+    active profile rather than through the request's context.
+    """
+
+    def __init__(self):
+        self.pending = {}
+
+    def started(self, event):
+        if active_profile is not None:
+            target = event.command.get(event.command_name)
+            label = f"{event.command_name} {target}" if isinstance(target, str) else event.command_name
+            self.pending[event.request_id] = f"mongo {label}"
+
+    def succeeded(self, event):
+        name = self.pending.pop(event.request_id, None)
+        if name is not None:
+            record_db_call(name, event.duration_micros / 1000)
+
+    def failed(self, event):
+        name = self.pending.pop(event.request_id, None)
+        if name is not None:
+            record_db_call(f"{name} (failed)", event.duration_micros / 1000)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles opted-in and sampled requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def wants_profile(self, scope) -> bool:
+        if scope["type"] != "http" or scope["path"].startswith("/debug/"):
+            return False
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) == b"1" and valid_profiling_token(headers.get(PROFILE_TOKEN_HEADER, b"").decode("latin-1")):
+            return True
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        global active_profile
+        if active_profile is not None or not self.wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        active_profile = profile
+        started = time.perf_counter()
+        profile.profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.profiler.disable()
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            active_profile = None
+            recent_profiles.append(profile)
@@ -0,0 +1,137 @@
+"""
+Recurring debts - templates that repeat on an RFC 5545 recurrence rule
+A template holds the fields of a debt plus the RRULE part of a recurrence
+("FREQ=MONTHLY;BYMONTHDAY=15", "FREQ=WEEKLY;INTERVAL=2;COUNT=6"), counted
+from its start date. Occurrences are only stored as debts up to
+RECURRING_HORIZON_DAYS ahead, by a background job, and each template records
+how far it has been materialized. Calendar queries expand the rule on the fly
+beyond that point, so years of future instalments never become rows.
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+from dateutil.rrule import rrule, rrulestr
+from backend.limits import coalesced_reads
+from core.config import settings
+
+# Due dates are whole days, so rules repeating more often are refused
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+TIME_PARTS = ("BYHOUR", "BYMINUTE", "BYSECOND")
+# Parts that must be whole numbers of at least 1; dateutil never finishes
+# expanding INTERVAL=0
+COUNTING_PARTS = ("INTERVAL", "COUNT")
+# dateutil gives up looking for the next due date only at the end of its
+# calendar, and the Gregorian calendar repeats itself every 400 years
+LAST_YEAR = 9999
+CALENDAR_CYCLE_YEARS = 400
+
+def valid_rule(rule: str) -> str:
+    """Normalized RRULE text ("RRULE:" prefix dropped, upper case); raises ValueError if unusable"""
+    text = rule.strip().upper()
+    if text.startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    if not text or any(line in text for line in ("\n", "DTSTART", "EXDATE", "RDATE")):
+        raise ValueError("must be a single RRULE; the start date is given separately")
+    parts = dict(part.partition("=")[::2] for part in text.split(";") if part)
+    if parts.get("FREQ") not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    if any(part in parts for part in TIME_PARTS):
+        raise ValueError("due dates are days; BYHOUR, BYMINUTE and BYSECOND are not supported")
+    for part in COUNTING_PARTS:
+        if part in parts and not (parts[part].isdigit() and int(parts[part]) >= 1):
+            raise ValueError(f"{part} must be a whole number of at least 1")
+    if parts.get("UNTIL", "").endswith("Z"):
+        # Start dates carry no time zone, and dateutil refuses to mix the two
+        parts["UNTIL"] = parts["UNTIL"][:-1]
+    text = ";".join(f"{key}={value}" for key, value in parts.items())
+    parse_rule(text, date.today())
+    if not falls_due(text, date.today()):
+        raise ValueError("the rule never falls due")
+    return text
+
+def falls_due(rule: str, start: date) -> bool:
+    """Whether a normalized rule counted from start has any due date (UNTIL and COUNT aside)
+
+    dateutil searches an empty rule such as BYMONTH=2;BYMONTHDAY=30 up to the
+    year 9999, which takes seconds for a daily rule. The check moves the start
+    forward by whole 400-year cycles, which keeps every weekday and leap day,
+    to 100-500 years before that end, so an empty rule is given up on quickly.
+    """
+    parts = [part for part in rule.split(";") if not part.startswith(("UNTIL=", "COUNT="))]
+    cycles = (LAST_YEAR - 100 - start.year) // CALENDAR_CYCLE_YEARS
+    moved = datetime.combine(start.replace(year=start.year + cycles * CALENDAR_CYCLE_YEARS), time())
+    return rrulestr(";".join(parts), dtstart=moved).after(moved, inc=True) is not None
+
+@lru_cache(maxsize=1024)
+def parse_rule(rule: str, start: date) -> rrule:
+    """The recurrence of a normalized rule counted from a start date"""
+    return rrulestr(rule, dtstart=datetime.combine(start, time()))
+
+def template_rule(template: dict) -> rrule:
+    """The recurrence of a stored template"""
+    return parse_rule(template["rule"], date.fromisoformat(template["start_date"]))
+
+def occurrences(template: dict, start: date, end: date) -> List[date]:
+    """Due dates of a template from start to end inclusive"""
+    if start > end:
+        return []
+    moments = template_rule(template).between(datetime.combine(start, time()), datetime.combine(end, time()), inc=True)
+    return [moment.date() for moment in moments]
+
+def next_occurrence(template: dict, on_or_after: date) -> Optional[date]:
+    """First due date on or after a day (None once the rule has ended)"""
+    moment = template_rule(template).after(datetime.combine(on_or_after, time()), inc=True)
+    return moment.date() if moment else None
+
+def first_watermark(start_date: date, today: date) -> str:
+    """materialized_through for a new template - occurrences before today are not back-filled"""
+    return (max(start_date, today) - timedelta(days=1)).isoformat()
+
+def occurrence_debt(template: dict, due_date: date) -> dict:
+    """Debt fields for one occurrence of a template"""
+    return {
+        "company_name": template["company_name"],
+        "amount_owed": template["amount_owed"],
+        "minimum_payment": template["minimum_payment"],
+        "currency": template["currency"],
+        "due_date": due_date.isoformat(),
+        "status": "Active Debt",
+        "notes": template["notes"]
+    }
+
+# ============ MATERIALIZATION ============
+
+async def materialize_recurring(storage, user_id: Optional[str] = None, today: Optional[date] = None) -> int:
+    """Store occurrences up to RECURRING_HORIZON_DAYS ahead as debts (all users by default)
+
+    Returns how many debts were added. Storage skips occurrences that already
+    exist, so overlapping runs in several processes add each one once.
+    """
+    through = (today or date.today()) + timedelta(days=settings.RECURRING_HORIZON_DAYS)
+    added = 0
+    for template in await storage.get_templates_to_materialize(through, user_id=user_id):
+        start = date.fromisoformat(template["materialized_through"]) + timedelta(days=1)
+        debts = [occurrence_debt(template, due_date) for due_date in occurrences(template, start, through)]
+        inserted = await storage.materialize_occurrences(template["user_id"], template["id"], debts, through)
+        if inserted:
+            coalesced_reads.forget(template["user_id"])
+        added += inserted
+    return added
+
+# ============ CALENDAR ============
+
+async def debt_calendar(storage, user_id: str, start: date, end: date) -> List[Dict]:
+    """Debts due from start to end, plus template occurrences not yet stored as debts"""
+    entries = [
+        {**debt, "debt_id": debt["id"], "projected": False}
+        for debt in await storage.get_debts_due_between(user_id, start, end)
+    ]
+    for template in await storage.get_templates(user_id):
+        # Stored occurrences end at the watermark; expand the rule after it
+        first = max(start, date.fromisoformat(template["materialized_through"]) + timedelta(days=1))
+        entries.extend(
+            {**occurrence_debt(template, due_date), "template_id": template["id"], "projected": True}
+            for due_date in occurrences(template, first, end)
+        )
+    entries.sort(key=lambda entry: entry["due_date"])
+    return entries
@@ -0,0 +1,139 @@
+"""
+Request logging - one structured line per request, keyed by a correlation ID
+The frontend sends an X-Request-ID per Streamlit rerun; requests without a
+usable one get a fresh ID. The ID is echoed on the response and stamped on
+every log record written while the request runs (including background jobs it
+starts). Each request's line records its total time next to the time spent in
+the database - Motor commands timed by MongoCommandLog, SQLite calls by the
+storage backend - so slow requests can be split into API and database time.
+"""
+import logging
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import HTTPException, Request
+from fastapi.exception_handlers import http_exception_handler
+from pymongo import monitoring
+from core.config import settings
+from core.log import REQUEST_ID_HEADER, get_logger, request_id_var
+
+logger = get_logger("requests")
+
+# IDs from clients are logged, so anything unexpected is replaced
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+
+class DbTime:
+    """Database time spent on behalf of one request"""
+
+    def __init__(self):
+        self.ms = 0.0
+        self.calls = 0
+
+    def add(self, duration_ms: float) -> None:
+        self.ms += duration_ms
+        self.calls += 1
+
+
+# Database time of the request being served; Motor copies the context into its
+# executor threads, so command listeners see the request that issued them
+db_time_var: ContextVar[Optional[DbTime]] = ContextVar("db_time", default=None)
+
+def record_db_time(duration_ms: float) -> None:
+    """Add a database call to the current request's totals, if any"""
+    db_time = db_time_var.get()
+    if db_time is not None:
+        db_time.add(duration_ms)
+
+
+class MongoCommandLog(monitoring.CommandListener):
+    """Adds each MongoDB command's server round trip to its request's database time"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record_db_time(event.duration_micros / 1000)
+
+    def failed(self, event):
+        record_db_time(event.duration_micros / 1000)
+        logger.warning("MongoDB command failed", extra={"fields": {
+            "command": event.command_name, "duration_ms": round(event.duration_micros / 1000, 3),
+            "error": str(event.failure.get("errmsg", ""))
+        }})
+
+
+def incoming_request_id(scope) -> str:
+    """The client's X-Request-ID if it is usable, otherwise a new one"""
+    header = REQUEST_ID_HEADER.lower().encode()
+    for name, value in scope["headers"]:
+        if name == header:
+            request_id = value.decode("latin-1")
+            if REQUEST_ID_PATTERN.fullmatch(request_id):
+                return request_id
+            break
+    return uuid.uuid4().hex
+
+
+class RequestLogMiddleware:
+    """ASGI middleware that tags each request with its ID and logs how long it took"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = incoming_request_id(scope)
+        db_time = DbTime()
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.lower().encode(), request_id.encode())
+                ]
+            await send(message)
+
+        request_token = request_id_var.set(request_id)
+        db_token = db_time_var.set(db_time)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        except Exception:
+            logger.exception("Unhandled error")
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            slow = duration_ms >= settings.SLOW_REQUEST_MS
+            logger.log(
+                logging.WARNING if slow or status_code >= 500 else logging.INFO,
+                "Slow request" if slow else "Request",
+                extra={"fields": {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 3),
+                    "db_ms": round(db_time.ms, 3),
+                    "db_calls": db_time.calls,
+                }}
+            )
+            db_time_var.reset(db_token)
+            request_id_var.reset(request_token)
+
+
+async def log_http_exception(request: Request, exc: HTTPException):
+    """Log the error a router turned into a generic 400/500, then answer as usual"""
+    cause = exc.__context__
+    if exc.status_code in (400, 500) and cause is not None and not isinstance(cause, HTTPException):
+        logger.log(
+            logging.ERROR if exc.status_code >= 500 else logging.WARNING, exc.detail,
+            exc_info=(type(cause), cause, cause.__traceback__)
+        )
+    return await http_exception_handler(request, exc)
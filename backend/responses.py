@@ -0,0 +1,81 @@
+"""
+Custom response classes for hot endpoints
+"""
+from typing import Any, List
+import orjson
+import pyarrow as pa
+from fastapi.responses import JSONResponse, Response
+from backend.money import fx_rates
+
+# Typed columnar layout for debt lists; company, currency and status repeat
+# heavily, so they are dictionary-encoded. Amounts also travel as exact int64
+# cents, plus amount_owed converted to the base currency for totals.
+DEBT_ARROW_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("company_name", pa.dictionary(pa.int32(), pa.string())),
+    ("amount_owed", pa.float64()),
+    ("minimum_payment", pa.float64()),
+    ("currency", pa.dictionary(pa.int32(), pa.string())),
+    ("amount_owed_cents", pa.int64()),
+    ("minimum_payment_cents", pa.int64()),
+    ("base_amount_owed_cents", pa.int64()),
+    ("due_date", pa.date32()),
+    ("status", pa.dictionary(pa.int32(), pa.string())),
+    ("notes", pa.string()),
+    ("version", pa.int64()),
+])
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson
+
+    Endpoints returning this skip FastAPI's response_model validation and
+    jsonable_encoder pass, so the content must already match the schema.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ArrowResponse(Response):
+    """Apache Arrow IPC stream response"""
+    media_type = "application/vnd.apache.arrow.stream"
+
+
+def debts_to_arrow(debts: List[dict]) -> bytes:
+    """Encode debt dictionaries as an Arrow IPC stream using DEBT_ARROW_SCHEMA
+
+    The debts must include the stored amount_owed_cents and
+    minimum_payment_cents (get_all_debts(with_cents=True)); the cent columns
+    are built from those integers, never from the float amounts.
+    """
+    names = (
+        "id", "company_name", "amount_owed", "minimum_payment", "amount_owed_cents", "minimum_payment_cents",
+        "currency", "due_date", "status", "notes", "version"
+    )
+    columns = {name: [debt.get(name) for debt in debts] for name in names}
+    rates = fx_rates()
+    base_amount_owed_cents = [
+        rates.to_base_cents(cents, currency)
+        for cents, currency in zip(columns["amount_owed_cents"], columns["currency"])
+    ]
+    table = pa.table({
+        "id": pa.array(columns["id"], pa.string()),
+        "company_name": pa.array(columns["company_name"], pa.string()).dictionary_encode(),
+        "amount_owed": pa.array(columns["amount_owed"], pa.float64()),
+        "minimum_payment": pa.array(columns["minimum_payment"], pa.float64()),
+        "currency": pa.array(columns["currency"], pa.string()).dictionary_encode(),
+        "amount_owed_cents": pa.array(columns["amount_owed_cents"], pa.int64()),
+        "minimum_payment_cents": pa.array(columns["minimum_payment_cents"], pa.int64()),
+        "base_amount_owed_cents": pa.array(base_amount_owed_cents, pa.int64()),
+        # Dates are stored as ISO strings, so let Arrow parse them in one pass
+        "due_date": pa.array(columns["due_date"], pa.string()).cast(pa.date32()),
+        "status": pa.array(columns["status"], pa.string()).dictionary_encode(),
+        "notes": pa.array([notes or "" for notes in columns["notes"]], pa.string()),
+        "version": pa.array(columns["version"], pa.int64()),
+    }, schema=DEBT_ARROW_SCHEMA)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -1,15 +1,13 @@
 """
 Company Router - API endpoints for managing custom companies
 """
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import List, Optional
 from pydantic import BaseModel
-from backend.database.crud_db import (
-    get_all_companies,
-    add_company,
-    delete_company,
-    get_company_by_name
-)
+from backend.database.storage import get_storage
+from backend.catalog import catalog_version, get_company_catalog
+from backend.auth import get_current_user
+from backend.limits import limit_writes
 
 router = APIRouter(prefix="/companies", tags=["companies"])
 
@@ -20,29 +18,66 @@ class CompanyResponse(BaseModel):
     id: str
     name: str
 
+class CompanyCatalog(BaseModel):
+    version: str
+    companies: List[str]
+    custom: List[CompanyResponse]
+
 @router.get("/", response_model=List[str])
-async def list_companies():
+async def list_companies(user_id: str = Depends(get_current_user)):
     """Get all custom company names"""
     try:
-        companies = await get_all_companies()
+        companies = await get_storage().get_all_companies(user_id)
         return companies
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/", response_model=CompanyResponse)
-async def create_company(company: CompanyCreate):
+@router.get("/catalog", response_model=CompanyCatalog, responses={304: {"description": "Catalog unchanged"}})
+async def company_catalog(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_id: str = Depends(get_current_user)
+):
+    """Built-in and custom companies merged and sorted, stamped with a version (ETag)"""
+    try:
+        storage = get_storage()
+        if if_none_match:
+            # Revalidation only needs the version counter, not the company list
+            etag = f'"{catalog_version(await storage.get_company_catalog_version(user_id))}"'
+            if if_none_match.strip() == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+        catalog = await get_company_catalog(storage, user_id)
+        response.headers["ETag"] = f'"{catalog["version"]}"'
+        return catalog
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/search", response_model=List[str])
+async def search_companies(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    user_id: str = Depends(get_current_user)
+):
+    """Custom company names starting with prefix (type-ahead)"""
+    try:
+        return await get_storage().search_companies(user_id, prefix, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/", response_model=CompanyResponse, dependencies=[Depends(limit_writes)])
+async def create_company(company: CompanyCreate, user_id: str = Depends(get_current_user)):
     """Add a new custom company"""
     try:
-        result = await add_company(company.name)
+        result = await get_storage().add_company(user_id, company.name)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/{company_id}")
-async def remove_company(company_id: str):
+@router.delete("/{company_id}", dependencies=[Depends(limit_writes)])
+async def remove_company(company_id: str, user_id: str = Depends(get_current_user)):
     """Delete a custom company"""
     try:
-        success = await delete_company(company_id)
+        success = await get_storage().delete_company(user_id, company_id)
         if not success:
             raise HTTPException(status_code=404, detail="Company not found")
         return {"message": "Company deleted successfully"}
@@ -50,10 +85,10 @@ async def remove_company(company_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/by-name/{company_name}", response_model=CompanyResponse)
-async def get_company(company_name: str):
+async def get_company(company_name: str, user_id: str = Depends(get_current_user)):
     """Get company details by name"""
     try:
-        company = await get_company_by_name(company_name)
+        company = await get_storage().get_company_by_name(user_id, company_name)
         if not company:
             raise HTTPException(status_code=404, detail="Company not found")
         return company
@@ -2,16 +2,51 @@
 API Router for debt management endpoints
 Implements POST, GET, PUT, DELETE operations for /debts
 """
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
-from backend.models.debt_schema import DebtCreate, DebtUpdate, DebtResponse
+from fastapi import APIRouter, Body, Depends, File, Header, HTTPException, Query, Response, UploadFile
+from starlette.concurrency import run_in_threadpool
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from backend.models.debt_schema import (
+    DebtCreate, DebtUpdate, DebtResponse, DebtBulkRequest, DebtBulkResponse, DebtSearchResponse,
+    DebtHistoryPoint, DebtTrendPoint, DebtComposition, DebtArchivePage, DebtImportResponse, CurrencyList,
+    DebtCalendarEntry
+)
 from backend.models.response_schema import SuccessResponse, DeleteResponse
-from backend.database import crud_db
+from backend.database.storage import get_storage, encode_archive_cursor, decode_archive_cursor, DebtArchived, VersionConflict
+from backend.database.history import debt_history, debt_trends
+from backend.responses import ORJSONResponse, ArrowResponse, debts_to_arrow
+from backend.importer import import_debts, iter_csv_rows, iter_ofx_rows
+from backend.recurrence import debt_calendar
+from backend.auth import get_current_user
+from backend.limits import coalesced_reads, limit_writes
+from backend.money import from_cents, fx_rates, to_cents
+from core.config import settings
 
 router = APIRouter()
 
-@router.post("", response_model=DebtResponse, status_code=201)
-async def create_debt(debt: DebtCreate):
+def version_etag(version: int) -> str:
+    """ETag for a debt version"""
+    return f'"{version}"'
+
+def archived_conflict(e: DebtArchived) -> HTTPException:
+    """409 for a write to an archived (read-only) debt"""
+    return HTTPException(status_code=409, detail=str(e), headers={"X-Debt-Archived": "true"})
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Expected debt version from an If-Match header (None for absent or '*')"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a debt version ETag")
+
+@router.post("", response_model=DebtResponse, status_code=201, dependencies=[Depends(limit_writes)])
+async def create_debt(debt: DebtCreate, user_id: str = Depends(get_current_user)):
     """Create a new debt record"""
     try:
         debt_dict = debt.model_dump()
@@ -19,36 +54,269 @@ async def create_debt(debt: DebtCreate):
         debt_dict["due_date"] = debt_dict["due_date"].isoformat()
         debt_dict["status"] = debt_dict["status"].value  # Convert enum to string
         
-        new_debt = await crud_db.create_debt(debt_dict)
+        new_debt = await get_storage().create_debt(user_id, debt_dict)
+        coalesced_reads.forget(user_id)
         return new_debt
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error creating debt: {str(e)}")
 
-@router.get("", response_model=List[DebtResponse])
-async def get_all_debts(status: Optional[str] = Query(None, description="Filter by status")):
+@router.get("", response_model=List[DebtResponse], response_class=ORJSONResponse)
+async def get_all_debts(
+    status: Optional[str] = Query(None, description="Filter by status"),
+    format: str = Query("json", pattern="^(json|arrow)$", description="json, or arrow for an Apache Arrow IPC stream"),
+    user_id: str = Depends(get_current_user)
+):
     """Retrieve all debt records, optionally filtered by status"""
     try:
-        debts = await crud_db.get_all_debts(status=status)
-        return debts
+        # Sessions rerunning together share one query; Arrow exports feed the
+        # dashboard, may be served by a secondary and carry the exact cents
+        export = format == "arrow"
+        debts = await coalesced_reads.do(
+            (user_id, "debts", status, export),
+            lambda: get_storage().get_all_debts(user_id, status=status, stale_ok=export, with_cents=export)
+        )
+        if format == "arrow":
+            return ArrowResponse(debts_to_arrow(debts))
+        # Returning a Response skips per-item response_model validation
+        return ORJSONResponse(debts)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving debts: {str(e)}")
 
+@router.get("/search", response_model=DebtSearchResponse)
+async def search_debts(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in company names and notes"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_current_user)
+):
+    """Full-text search over company names and notes, ranked by relevance"""
+    try:
+        found = await get_storage().search_debts(
+            user_id, q, skip=(page - 1) * page_size, limit=page_size
+        )
+        return DebtSearchResponse(page=page, page_size=page_size, **found)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching debts: {str(e)}")
+
+@router.get("/archive", response_model=DebtArchivePage)
+async def get_archived_debts(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_current_user)
+):
+    """Page through archived paid-off debts, most recently paid first"""
+    after = None
+    if cursor:
+        try:
+            after = decode_archive_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        page = await get_storage().get_archived_debts(user_id, limit=limit, after=after)
+        next_cursor = encode_archive_cursor(page.pop("next_after"))
+        amount_cents = page.pop("amount_cents")
+        total_amount = from_cents(fx_rates().total(amount_cents)) if amount_cents is not None else None
+        return DebtArchivePage(**page, total_amount=total_amount, next_cursor=next_cursor)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving archived debts: {str(e)}")
+
+@router.get("/history", response_model=List[DebtHistoryPoint])
+async def get_debt_history(
+    start: Optional[date] = Query(None, alias="from", description="First day (default: 89 days before 'to')"),
+    end: Optional[date] = Query(None, alias="to", description="Last day (default: today)"),
+    user_id: str = Depends(get_current_user)
+):
+    """Daily outstanding and paid-off balances rebuilt from the history log"""
+    end = end or date.today()
+    start = start or end - timedelta(days=89)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days > 730:
+        raise HTTPException(status_code=400, detail="History range is limited to two years")
+    try:
+        return await debt_history(get_storage(), user_id, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving debt history: {str(e)}")
+
+@router.get("/trends", response_model=List[DebtTrendPoint])
+async def get_debt_trends(
+    start: Optional[date] = Query(None, alias="from", description="First day (default: 89 days before 'to')"),
+    end: Optional[date] = Query(None, alias="to", description="Last day (default: today)"),
+    granularity: Optional[str] = Query(None, pattern="^(day|week|month)$", description="Default depends on range length"),
+    user_id: str = Depends(get_current_user)
+):
+    """Outstanding debt over time per status and company, read from daily rollups"""
+    end = end or date.today()
+    start = start or end - timedelta(days=89)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days > 3660:
+        raise HTTPException(status_code=400, detail="Trend range is limited to ten years")
+    try:
+        return await coalesced_reads.do(
+            (user_id, "trends", start, end, granularity),
+            lambda: debt_trends(get_storage(), user_id, start, end, granularity)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving debt trends: {str(e)}")
+
+@router.get("/calendar", response_model=List[DebtCalendarEntry])
+async def get_debt_calendar(
+    start: Optional[date] = Query(None, alias="from", description="First day (default: today)"),
+    end: Optional[date] = Query(None, alias="to", description="Last day (default: 89 days after 'from')"),
+    user_id: str = Depends(get_current_user)
+):
+    """Debts due in a date range, including recurring occurrences not stored yet"""
+    start = start or date.today()
+    end = end or start + timedelta(days=89)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days > 730:
+        raise HTTPException(status_code=400, detail="Calendar range is limited to two years")
+    try:
+        return await debt_calendar(get_storage(), user_id, start, end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving debt calendar: {str(e)}")
+
+# Row order for the composition: status, then largest amount first
+DISPLAY_STATUS_ORDER = {"Active": 0, "Overdue": 1, "Paid Off": 2}
+
+@router.get("/composition", response_model=DebtComposition)
+async def get_debt_composition(
+    small_threshold: float = Query(settings.SMALL_DEBT_THRESHOLD, ge=0, description="Companies owing less (in the base currency) are merged per status"),
+    today: Optional[date] = Query(None, description="Debts due before this are overdue (default: server date)"),
+    user_id: str = Depends(get_current_user)
+):
+    """Totals per display status and company in the base currency
+
+    The database sums exact cents per status, company and currency; each of
+    those sums is converted once, then companies under the threshold are
+    merged per status.
+    """
+    today = today or date.today()
+    try:
+        # The row list is shared with coalesced requests, so it is only read here
+        rows = await coalesced_reads.do(
+            (user_id, "composition", today),
+            lambda: get_storage().get_debt_composition(user_id, today)
+        )
+        rates = fx_rates()
+        # (display status, company) -> [base cents, debts]
+        per_company: Dict[Tuple[str, str], list] = defaultdict(lambda: [0, 0])
+        for row in rows:
+            total = per_company[(row["display_status"], row["company_name"])]
+            total[0] += rates.to_base_cents(row["amount_cents"], row["currency"])
+            total[1] += row["debts"]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving debt composition: {str(e)}")
+
+    # (display status, company or None for the merged row) -> [base cents, companies, debts]
+    threshold_cents = to_cents(small_threshold)
+    merged: Dict[Tuple[str, Optional[str]], list] = defaultdict(lambda: [0, 0, 0])
+    for (display_status, company_name), (cents, debts) in per_company.items():
+        total = merged[(display_status, company_name if cents >= threshold_cents else None)]
+        total[0] += cents
+        total[1] += 1
+        total[2] += debts
+
+    grouped_count = 0
+    composition = []
+    ordered = sorted(merged.items(), key=lambda item: (DISPLAY_STATUS_ORDER.get(item[0][0], 3), -item[1][0]))
+    for (display_status, company_name), (cents, companies, debts) in ordered:
+        grouped = company_name is None
+        if grouped:
+            grouped_count += companies
+        composition.append({
+            "display_status": display_status,
+            "company_name": f"Other Debts (< {rates.base} {small_threshold:.2f}) - {companies} items" if grouped else company_name,
+            "amount_owed": from_cents(cents),
+            "debt_count": debts,
+            "grouped_companies": companies if grouped else 0
+        })
+    return {"small_debt_threshold": small_threshold, "grouped_count": grouped_count, "rows": composition}
+
+@router.get("/currencies", response_model=CurrencyList)
+async def get_currencies():
+    """Currencies debts may be recorded in, from the exchange rate table"""
+    try:
+        rates = fx_rates()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading exchange rates: {str(e)}")
+    return {"base": rates.base, "currencies": sorted(rates.rates)}
+
+@router.post("/bulk", response_model=DebtBulkResponse, dependencies=[Depends(limit_writes)])
+async def bulk_update_debts(bulk: DebtBulkRequest, user_id: str = Depends(get_current_user)):
+    """Apply many status changes and deletions in a single request"""
+    try:
+        storage = get_storage()
+
+        # Group status changes so each distinct status is one write
+        ids_by_status = {}
+        for update in bulk.updates:
+            ids_by_status.setdefault(update.status.value, []).append(update.id)
+
+        updated = 0
+        for status, debt_ids in ids_by_status.items():
+            updated += await storage.bulk_update_status(user_id, debt_ids, status)
+
+        deleted = 0
+        if bulk.delete:
+            deleted = await storage.bulk_delete_debts(user_id, bulk.delete)
+
+        coalesced_reads.forget(user_id)
+        return DebtBulkResponse(updated=updated, deleted=deleted)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error applying bulk changes: {str(e)}")
+
+@router.post("/import", response_model=DebtImportResponse, dependencies=[Depends(limit_writes)])
+async def import_debt_file(
+    file: UploadFile = File(..., description="CSV (company_name, amount_owed, minimum_payment, due_date[, currency, status, notes]) or OFX/QFX"),
+    format: Optional[str] = Query(None, pattern="^(csv|ofx)$", description="Defaults from the file extension"),
+    user_id: str = Depends(get_current_user)
+):
+    """Import many debts from a CSV or bank statement upload"""
+    file_format = format
+    if file_format is None:
+        extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+        file_format = "ofx" if extension in ("ofx", "qfx") else "csv"
+
+    try:
+        # Reading the CSV header may hit the spooled upload on disk; keep it off the event loop
+        rows = await run_in_threadpool(iter_csv_rows if file_format == "csv" else iter_ofx_rows, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        report = await import_debts(get_storage(), user_id, rows)
+        coalesced_reads.forget(user_id)
+        return DebtImportResponse(**report)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error importing debts: {str(e)}")
+
 @router.get("/{debt_id}", response_model=DebtResponse)
-async def get_debt(debt_id: str):
+async def get_debt(debt_id: str, response: Response, user_id: str = Depends(get_current_user)):
     """Retrieve a single debt record by ID"""
     try:
-        debt = await crud_db.get_debt(debt_id)
+        debt = await get_storage().get_debt(user_id, debt_id)
         if not debt:
             raise HTTPException(status_code=404, detail=f"Debt with id {debt_id} not found")
+        response.headers["ETag"] = version_etag(debt["version"])
         return debt
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving debt: {str(e)}")
 
-@router.put("/{debt_id}", response_model=DebtResponse)
-async def update_debt(debt_id: str, debt: DebtUpdate):
-    """Update an existing debt record"""
+@router.put("/{debt_id}", response_model=DebtResponse, dependencies=[Depends(limit_writes)])
+async def update_debt(
+    debt_id: str,
+    debt: DebtUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag from GET /debts/{id}; rejects the write with 409 if stale"),
+    user_id: str = Depends(get_current_user)
+):
+    """Update an existing debt record; only the fields sent are changed"""
+    expected_version = parse_if_match(if_match)
     try:
         debt_dict = debt.model_dump(exclude_none=True)
         
@@ -60,20 +328,81 @@ async def update_debt(debt_id: str, debt: DebtUpdate):
         if "status" in debt_dict and debt_dict["status"]:
             debt_dict["status"] = debt_dict["status"].value
         
-        updated_debt = await crud_db.update_debt(debt_id, debt_dict)
+        updated_debt = await get_storage().update_debt(
+            user_id, debt_id, debt_dict, expected_version=expected_version
+        )
+        coalesced_reads.forget(user_id)
         if not updated_debt:
             raise HTTPException(status_code=404, detail=f"Debt with id {debt_id} not found")
+        response.headers["ETag"] = version_etag(updated_debt["version"])
         return updated_debt
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=409, detail=str(e), headers={"ETag": version_etag(e.current_version)}
+        )
+    except DebtArchived as e:
+        raise archived_conflict(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error updating debt: {str(e)}")
+
+@router.patch("/{debt_id}", response_model=DebtResponse, dependencies=[Depends(limit_writes)])
+async def patch_debt(
+    debt_id: str,
+    response: Response,
+    patch: DebtUpdate = Body(..., media_type="application/merge-patch+json"),
+    if_match: Optional[str] = Header(None, description="ETag from GET /debts/{id}; rejects the write with 409 if stale"),
+    user_id: str = Depends(get_current_user)
+):
+    """Apply a JSON Merge Patch (RFC 7396); unchanged fields are not written
+
+    The X-Debt-Modified response header is "false" when the patch matched
+    the stored debt and nothing was written.
+    """
+    expected_version = parse_if_match(if_match)
+
+    changes = {}
+    for field in patch.model_fields_set:
+        value = getattr(patch, field)
+        if value is None:
+            # null removes a member in merge patch; only notes is optional
+            if field != "notes":
+                raise HTTPException(status_code=400, detail=f"'{field}' cannot be removed")
+            value = ""
+        elif field == "due_date":
+            value = value.isoformat()
+        elif field == "status":
+            value = value.value
+        changes[field] = value
+
+    try:
+        patched = await get_storage().patch_debt(user_id, debt_id, changes, expected_version=expected_version)
+        if not patched:
+            raise HTTPException(status_code=404, detail=f"Debt with id {debt_id} not found")
+        debt, modified = patched
+        if modified:
+            coalesced_reads.forget(user_id)
+        response.headers["ETag"] = version_etag(debt["version"])
+        response.headers["X-Debt-Modified"] = "true" if modified else "false"
+        return debt
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=409, detail=str(e), headers={"ETag": version_etag(e.current_version)}
+        )
+    except DebtArchived as e:
+        raise archived_conflict(e)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error updating debt: {str(e)}")
 
-@router.delete("/{debt_id}", response_model=DeleteResponse)
-async def delete_debt(debt_id: str):
-    """Delete a debt record"""
+@router.delete("/{debt_id}", response_model=DeleteResponse, dependencies=[Depends(limit_writes)])
+async def delete_debt(debt_id: str, user_id: str = Depends(get_current_user)):
+    """Delete a debt record (soft delete; purged after DELETED_RETENTION_DAYS)"""
     try:
-        success = await crud_db.delete_debt(debt_id)
+        success = await get_storage().delete_debt(user_id, debt_id)
+        coalesced_reads.forget(user_id)
         if not success:
             raise HTTPException(status_code=404, detail=f"Debt with id {debt_id} not found")
         return DeleteResponse(message="Debt deleted successfully", deleted_id=debt_id)
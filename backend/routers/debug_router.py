@@ -0,0 +1,36 @@
+"""
+Debug Router - download request profiles captured by backend/profiling.py
+Only mounted when PROFILING_ENABLED is set, and only served to requests with
+the PROFILING_TOKEN admin token: profiles include every user's requests.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from typing import List
+from backend.auth import require_profiling_token
+from backend.profiling import get_profile, recent_profiles
+
+router = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(require_profiling_token)])
+
+@router.get("/profiles", response_model=List[dict])
+async def list_profiles():
+    """Recent request profiles, newest first, with timings and hottest functions"""
+    return [profile.summary() for profile in reversed(recent_profiles)]
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = Query("text", pattern="^(text|json|pstats)$", description="text listing, json summary, or raw pstats file")
+):
+    """One request profile; pstats files open in snakeviz or flameprof for a flame graph"""
+    profile = get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found (only the most recent are kept)")
+    if format == "json":
+        return profile.summary()
+    if format == "pstats":
+        return Response(
+            profile.dump(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+        )
+    return PlainTextResponse(profile.text_report())
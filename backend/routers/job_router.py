@@ -0,0 +1,82 @@
+"""
+Job Router - start, poll and cancel background jobs
+Long-running work (bulk imports, rollup rebuilds) returns
+202 with a job right away; clients poll GET /jobs/{id} for progress.
+"""
+import os
+import shutil
+import tempfile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from backend.models.job_schema import JobCreate, JobResponse
+from backend.database.storage import get_storage
+from backend.jobs import job_runner
+from backend.auth import get_current_user
+from backend.limits import limit_writes
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.post("", response_model=JobResponse, status_code=202, dependencies=[Depends(limit_writes)])
+async def start_job(job: JobCreate, user_id: str = Depends(get_current_user)):
+    """Queue a maintenance job"""
+    try:
+        return await job_runner.submit(user_id, job.type)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error starting job: {str(e)}")
+
+@router.post("/import", response_model=JobResponse, status_code=202, dependencies=[Depends(limit_writes)])
+async def start_import_job(
+    file: UploadFile = File(..., description="CSV (company_name, amount_owed, minimum_payment, due_date[, currency, status, notes]) or OFX/QFX"),
+    format: Optional[str] = Query(None, pattern="^(csv|ofx)$", description="Defaults from the file extension"),
+    user_id: str = Depends(get_current_user)
+):
+    """Import a CSV or bank statement upload in the background"""
+    extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+    file_format = format or ("ofx" if extension in ("ofx", "qfx") else "csv")
+
+    # The upload is gone once this request ends, so the job gets its own copy
+    handle, path = tempfile.mkstemp(prefix="hutangku-import-", suffix=f".{file_format}")
+    try:
+        with os.fdopen(handle, "wb") as target:
+            await run_in_threadpool(shutil.copyfileobj, file.file, target)
+        return await job_runner.submit(user_id, "import", {
+            "upload_path": path, "format": file_format, "file_name": file.filename
+        })
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        raise HTTPException(status_code=400, detail=f"Error starting import: {str(e)}")
+
+@router.get("", response_model=List[JobResponse])
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_current_user)
+):
+    """Most recent jobs first"""
+    try:
+        return await get_storage().list_jobs(user_id, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving jobs: {str(e)}")
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Job status and progress"""
+    try:
+        job = await get_storage().get_job(user_id, job_id)
+    except Exception:
+        job = None
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job with id {job_id} not found")
+    return job
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str, user_id: str = Depends(get_current_user)):
+    """Ask a queued or running job to stop; it is cancelled at its next progress report"""
+    try:
+        job = await get_storage().request_job_cancel(user_id, job_id)
+    except Exception:
+        job = None
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job with id {job_id} not found")
+    return job
@@ -0,0 +1,94 @@
+"""
+Recurring Router - templates for debts that repeat on a schedule
+Occurrences are stored as ordinary debts up to RECURRING_HORIZON_DAYS ahead
+by a background job; GET /debts/calendar projects the ones further out.
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import List
+from backend.models.recurring_schema import (
+    RecurringTemplateCreate, RecurringTemplateUpdate, RecurringTemplateResponse
+)
+from backend.models.response_schema import DeleteResponse
+from backend.database.storage import get_storage
+from backend.recurrence import falls_due, first_watermark, next_occurrence
+from backend.jobs import job_runner
+from backend.auth import get_current_user
+from backend.limits import limit_writes
+
+router = APIRouter(prefix="/recurring", tags=["recurring"])
+
+def with_next_due(template: dict) -> dict:
+    """Template with its next occurrence from today"""
+    return {**template, "next_due_date": next_occurrence(template, date.today())}
+
+@router.get("", response_model=List[RecurringTemplateResponse])
+async def list_templates(user_id: str = Depends(get_current_user)):
+    """All recurring debt templates, sorted by company"""
+    try:
+        return [with_next_due(template) for template in await get_storage().get_templates(user_id)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving recurring debts: {str(e)}")
+
+@router.post("", response_model=RecurringTemplateResponse, status_code=201, dependencies=[Depends(limit_writes)])
+async def create_template(template: RecurringTemplateCreate, user_id: str = Depends(get_current_user)):
+    """Create a recurring debt; occurrences from today on are added in the background"""
+    try:
+        template_dict = template.model_dump()
+        template_dict["materialized_through"] = first_watermark(template_dict["start_date"], date.today())
+        template_dict["start_date"] = template_dict["start_date"].isoformat()
+
+        new_template = await get_storage().create_template(user_id, template_dict)
+        await job_runner.submit(user_id, "recurring_materialize")
+        return with_next_due(new_template)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error creating recurring debt: {str(e)}")
+
+@router.get("/{template_id}", response_model=RecurringTemplateResponse)
+async def get_template(template_id: str, user_id: str = Depends(get_current_user)):
+    """Retrieve a recurring debt template by ID"""
+    try:
+        template = await get_storage().get_template(user_id, template_id)
+    except Exception:
+        template = None
+    if not template:
+        raise HTTPException(status_code=404, detail=f"Recurring debt with id {template_id} not found")
+    return with_next_due(template)
+
+@router.put("/{template_id}", response_model=RecurringTemplateResponse, dependencies=[Depends(limit_writes)])
+async def update_template(template_id: str, template: RecurringTemplateUpdate, user_id: str = Depends(get_current_user)):
+    """Update a template; debts already added from it keep their values"""
+    try:
+        template_dict = template.model_dump(exclude_none=True)
+        if "start_date" in template_dict:
+            template_dict["start_date"] = template_dict["start_date"].isoformat()
+        if "rule" in template_dict or "start_date" in template_dict:
+            # The new rule or start date must still fall due with the other one
+            current = await get_storage().get_template(user_id, template_id)
+            if not current:
+                raise HTTPException(status_code=404, detail=f"Recurring debt with id {template_id} not found")
+            merged = {**current, **template_dict}
+            if not falls_due(merged["rule"], date.fromisoformat(merged["start_date"])):
+                raise HTTPException(status_code=400, detail=f"Rule never falls due counted from {merged['start_date']}")
+
+        updated = await get_storage().update_template(user_id, template_id, template_dict)
+        if not updated:
+            raise HTTPException(status_code=404, detail=f"Recurring debt with id {template_id} not found")
+        return with_next_due(updated)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error updating recurring debt: {str(e)}")
+
+@router.delete("/{template_id}", response_model=DeleteResponse, dependencies=[Depends(limit_writes)])
+async def delete_template(template_id: str, user_id: str = Depends(get_current_user)):
+    """Stop a recurring debt; debts already added from it are kept"""
+    try:
+        success = await get_storage().delete_template(user_id, template_id)
+        if not success:
+            raise HTTPException(status_code=404, detail=f"Recurring debt with id {template_id} not found")
+        return DeleteResponse(message="Recurring debt deleted successfully", deleted_id=template_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting recurring debt: {str(e)}")
@@ -0,0 +1,82 @@
+"""
+Production server - python -m backend.server
+Runs API_WORKERS uvicorn worker processes without the reloader. The database
+is prepared once before the workers start, and the periodic maintenance tasks
+(archive sweep, recurring debts, job cleanup) run in one process of their own;
+workers only serve requests and run jobs. Each process opens its own database
+connections and closes them on shutdown; SIGTERM/Ctrl+C gives in-flight
+requests API_GRACEFUL_TIMEOUT seconds to finish.
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import uvicorn
+from uvicorn.protocols.http.auto import AutoHTTPProtocol
+from backend.database.storage import close_storage, get_storage
+from backend.tasks import run_maintenance
+from core.config import settings
+from core.log import configure_logging
+
+class NoDelayHTTPProtocol(AutoHTTPProtocol):
+    """uvicorn's HTTP protocol with Nagle's algorithm disabled on every connection
+
+    asyncio only sets TCP_NODELAY on sockets it creates itself; with workers
+    uvicorn binds the listening socket, so without this each response body
+    waits for the client's delayed ACK of its headers (~40 ms per request).
+    """
+
+    def connection_made(self, transport):
+        sock = transport.get_extra_info("socket")
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().connection_made(transport)
+
+async def prepare_database():
+    """Create indexes and run migrations once, before any worker starts"""
+    await get_storage().ensure_indexes()
+    await close_storage()
+
+async def maintain():
+    """Run the maintenance tasks until cancelled, then close this process's connections"""
+    try:
+        await run_maintenance()
+    finally:
+        await close_storage()
+
+def maintenance_process():
+    """Entry point of the maintenance process"""
+    configure_logging()
+    try:
+        asyncio.run(maintain())
+    except KeyboardInterrupt:
+        pass
+
+def serve():
+    """Start the production server"""
+    asyncio.run(prepare_database())
+    maintenance = multiprocessing.get_context("spawn").Process(
+        target=maintenance_process, name="maintenance", daemon=True
+    )
+    maintenance.start()
+    # Workers (and this process, when API_WORKERS is 1) then skip the
+    # migrations and maintenance tasks at startup
+    os.environ["HUTANGKU_PREPARED"] = "1"
+    settings.SERVER_PREPARED = True
+    try:
+        uvicorn.run(
+            "backend.main:app",
+            host="0.0.0.0",
+            port=settings.API_PORT,
+            workers=settings.API_WORKERS,
+            http=NoDelayHTTPProtocol,
+            # Requests are logged by RequestLogMiddleware, with their IDs and database time
+            access_log=False,
+            timeout_graceful_shutdown=settings.API_GRACEFUL_TIMEOUT
+        )
+    finally:
+        maintenance.terminate()
+        maintenance.join(settings.API_GRACEFUL_TIMEOUT)
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,63 @@
+"""
+Background maintenance tasks - run once per deployment (see run_maintenance)
+"""
+import asyncio
+from datetime import timedelta
+from backend.database.history import utc_now
+from backend.database.storage import get_storage
+from backend.limits import coalesced_reads
+from backend.recurrence import materialize_recurring
+from core.config import settings
+from core.log import get_logger
+
+logger = get_logger("tasks")
+
+async def archive_sweep() -> dict:
+    """Archive old paid-off debts and purge expired soft-deleted ones"""
+    storage = get_storage()
+    now = utc_now()
+    archived = await storage.archive_paid_debts(now - timedelta(days=settings.ARCHIVE_AFTER_DAYS))
+    purged = await storage.purge_deleted_debts(now - timedelta(days=settings.DELETED_RETENTION_DAYS))
+    if archived:
+        coalesced_reads.forget()
+    return {"archived": archived, "purged": purged}
+
+async def run_archive_sweeper():
+    """Run archive_sweep every ARCHIVE_SWEEP_MINUTES until cancelled"""
+    while True:
+        try:
+            result = await archive_sweep()
+            logger.debug("Archive sweep", extra={"fields": result})
+        except Exception:
+            logger.exception("Archive sweep failed")
+        await asyncio.sleep(settings.ARCHIVE_SWEEP_MINUTES * 60)
+
+async def run_job_cleaner():
+    """Run clean_up_jobs every STALE_JOB_MINUTES until cancelled"""
+    from backend.jobs import STALE_JOB_MINUTES, clean_up_jobs
+    while True:
+        try:
+            result = await clean_up_jobs()
+            logger.debug("Job cleanup", extra={"fields": result})
+        except Exception:
+            logger.exception("Job cleanup failed")
+        await asyncio.sleep(STALE_JOB_MINUTES * 60)
+
+async def run_recurring_materializer():
+    """Top up recurring debt occurrences every RECURRING_SWEEP_MINUTES until cancelled"""
+    while True:
+        try:
+            added = await materialize_recurring(get_storage())
+            logger.debug("Recurring debts materialized", extra={"fields": {"added": added}})
+        except Exception:
+            logger.exception("Recurring debt materialization failed")
+        await asyncio.sleep(settings.RECURRING_SWEEP_MINUTES * 60)
+
+async def run_maintenance():
+    """Run every periodic task until cancelled, in the one process that runs them"""
+    loops = [run_job_cleaner()]
+    if settings.ARCHIVE_SWEEP_MINUTES > 0:
+        loops.append(run_archive_sweeper())
+    if settings.RECURRING_SWEEP_MINUTES > 0:
+        loops.append(run_recurring_materializer())
+    await asyncio.gather(*loops)
@@ -18,17 +18,125 @@ class Settings:
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     API_BASE_URL: str = f"http://{API_HOST}:{API_PORT}"
     
+    # Production Server Configuration (python -m backend.server / ./run_app.sh --prod)
+    # API_WORKERS processes serve requests (default: one per CPU core); on shutdown
+    # in-flight requests get API_GRACEFUL_TIMEOUT seconds to finish
+    API_WORKERS: int = int(os.getenv("API_WORKERS", str(os.cpu_count() or 1)))
+    API_GRACEFUL_TIMEOUT: int = int(os.getenv("API_GRACEFUL_TIMEOUT", "30"))
+    # Set by backend.server for its workers: the server has already created the
+    # indexes and run the migrations, and runs the background sweeps in a
+    # process of its own, so workers only serve requests and run jobs
+    SERVER_PREPARED: bool = os.getenv("HUTANGKU_PREPARED", "") == "1"
+    
     # MongoDB Configuration
     MONGODB_URI: str = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
     MONGODB_DB_NAME: str = os.getenv("MONGODB_DB_NAME", "debt_management")
     MONGODB_COLLECTION: str = "debts"
     
+    # Run each mutation and its history event in one transaction (needs a replica set);
+    # also keeps a rollup rebuild from losing trend deltas written while it runs
+    MONGODB_TRANSACTIONS: bool = os.getenv("MONGODB_TRANSACTIONS", "False").lower() == "true"
+    
+    # Read Routing
+    # Writes and reads that must see them use the primary with MONGODB_READ_CONCERN;
+    # trends, history, search, composition, archive and Arrow exports use
+    # MONGODB_ANALYTICS_READ_PREFERENCE, at most MONGODB_ANALYTICS_MAX_STALENESS_SECONDS
+    # behind (-1 for no bound, otherwise at least 90). Read concerns: "" (server
+    # default), "local", "majority", "available"
+    MONGODB_READ_CONCERN: str = os.getenv("MONGODB_READ_CONCERN", "")
+    MONGODB_ANALYTICS_READ_PREFERENCE: str = os.getenv("MONGODB_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+    MONGODB_ANALYTICS_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGODB_ANALYTICS_MAX_STALENESS_SECONDS", "90"))
+    MONGODB_ANALYTICS_READ_CONCERN: str = os.getenv("MONGODB_ANALYTICS_READ_CONCERN", "local")
+    
+    # Debt History Configuration - events between compacted snapshots
+    HISTORY_SNAPSHOT_INTERVAL: int = int(os.getenv("HISTORY_SNAPSHOT_INTERVAL", "200"))
+    
+    # Archive Configuration
+    # Paid-off debts move to the archive tier ARCHIVE_AFTER_DAYS after being paid;
+    # deleted debts are kept for DELETED_RETENTION_DAYS before being purged
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+    ARCHIVE_SWEEP_MINUTES: int = int(os.getenv("ARCHIVE_SWEEP_MINUTES", "60"))
+    DELETED_RETENTION_DAYS: int = int(os.getenv("DELETED_RETENTION_DAYS", "30"))
+    
+    # Recurring Debt Configuration (see backend/recurrence.py)
+    # Template occurrences are stored as debts up to RECURRING_HORIZON_DAYS ahead,
+    # topped up every RECURRING_SWEEP_MINUTES (0 disables the periodic run)
+    RECURRING_HORIZON_DAYS: int = int(os.getenv("RECURRING_HORIZON_DAYS", "60"))
+    RECURRING_SWEEP_MINUTES: int = int(os.getenv("RECURRING_SWEEP_MINUTES", "60"))
+    
+    # Background Job Configuration
+    # JOB_WORKERS jobs run at once per API process; finished jobs are kept for JOB_RETENTION_DAYS
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_RETENTION_DAYS: int = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+    
+    # Storage Backend Configuration ("mongodb" or "sqlite")
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "mongodb")
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", str(Path(__file__).parent.parent / "data" / "hutangku.db"))
+    SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+    
+    # Write Rate Limiting (see backend/limits.py)
+    # Each user may make WRITE_RATE_BURST changes at once, refilled at
+    # WRITE_RATE_PER_SECOND per API process; 0 disables the limit
+    WRITE_RATE_PER_SECOND: float = float(os.getenv("WRITE_RATE_PER_SECOND", "5"))
+    WRITE_RATE_BURST: int = int(os.getenv("WRITE_RATE_BURST", "30"))
+    
+    # Authentication Configuration (see backend/auth.py)
+    # Requests must carry a bearer token signed with AUTH_SECRET; the API
+    # refuses every request while it is unset. API_TOKEN is the token the
+    # frontend sends (python -m backend.auth issue <user_id>)
+    AUTH_SECRET: str = os.getenv("AUTH_SECRET", "")
+    API_TOKEN: str = os.getenv("API_TOKEN", "")
+    # Owner given to documents stored before data was scoped per user
+    DEFAULT_USER_ID: str = os.getenv("DEFAULT_USER_ID", "default")
+    
     # Application Configuration
     APP_NAME: str = "HutangKu"
     APP_VERSION: str = "1.0.0"
     DEBUG_MODE: bool = os.getenv("DEBUG_MODE", "False").lower() == "true"
     
+    # Logging Configuration (see core/log.py)
+    # LOG_FORMAT "json" (one object per line, for log shippers) or "text"; requests
+    # slower than SLOW_REQUEST_MS are logged as warnings by the API and the frontend
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG_MODE else "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json").lower()
+    SLOW_REQUEST_MS: float = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+    
+    # Request Profiling Configuration (see backend/profiling.py)
+    # Requests with an "X-Profile: 1" header, plus PROFILE_SAMPLE_RATE of the rest,
+    # are profiled; the last PROFILE_BUFFER_SIZE profiles are kept in memory.
+    # Profiles cover every user's requests, so /debug and X-Profile need an
+    # "X-Profile-Token: <PROFILING_TOKEN>" header (and are refused while it is unset)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", str(DEBUG_MODE)).lower() == "true"
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_BUFFER_SIZE: int = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+    
+    # Frontend Timing Panel (see frontend/utils/perf.py)
+    # PERF_LOG_PATH, if set, appends every timed rerun as a JSON line
+    PERF_PANEL_ENABLED: bool = os.getenv("PERF_PANEL_ENABLED", str(DEBUG_MODE)).lower() == "true"
+    PERF_LOG_PATH: str = os.getenv("PERF_LOG_PATH", "")
+    
+    # Frontend API Resilience (see frontend/utils/resilience.py)
+    # Reads time out after API_TIMEOUT_SECONDS at most, sooner (down to
+    # API_MIN_TIMEOUT_SECONDS) on routes that usually answer fast; after
+    # API_BREAKER_FAILURES failures in a row a route is not called for
+    # API_BREAKER_COOLDOWN_SECONDS. Meanwhile pages show the last good response,
+    # if it is at most API_STALE_MAX_AGE_SECONDS old, marked as stale
+    API_TIMEOUT_SECONDS: float = float(os.getenv("API_TIMEOUT_SECONDS", "5"))
+    API_MIN_TIMEOUT_SECONDS: float = float(os.getenv("API_MIN_TIMEOUT_SECONDS", "1"))
+    API_BREAKER_FAILURES: int = int(os.getenv("API_BREAKER_FAILURES", "3"))
+    API_BREAKER_COOLDOWN_SECONDS: float = float(os.getenv("API_BREAKER_COOLDOWN_SECONDS", "15"))
+    API_STALE_MAX_AGE_SECONDS: float = float(os.getenv("API_STALE_MAX_AGE_SECONDS", "3600"))
+    
     # Notification Settings
     DUE_DATE_WARNING_DAYS: int = int(os.getenv("DUE_DATE_WARNING_DAYS", "7"))
+    
+    # Currency Configuration (see backend/money.py)
+    # Exchange rate table used to total debts held in different currencies; its
+    # base currency is what totals are reported in and new debts default to
+    FX_RATES_PATH: str = os.getenv("FX_RATES_PATH", str(Path(__file__).parent / "fx_rates.json"))
+
+    # Dashboard charts merge companies owing less than this (base currency) into one "Other Debts" row
+    SMALL_DEBT_THRESHOLD: float = float(os.getenv("SMALL_DEBT_THRESHOLD", "1.00"))
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Structured logging shared by the API and the Streamlit frontend
+configure_logging() sends the "hutangku" loggers to stderr as one JSON object
+per line (LOG_FORMAT=json) or as plain text. Fields passed as
+extra={"fields": {...}} become top-level keys, and every record carries the
+request_id of the Streamlit rerun that caused it, when known, so one rerun can
+be followed from the frontend through the API to the database.
+"""
+import json
+import logging
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+from core.config import settings
+
+LOGGER_NAME = "hutangku"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Correlation ID of the request being served (set by the API middleware)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+def get_logger(name: str) -> logging.Logger:
+    """Child of the "hutangku" logger, e.g. get_logger("jobs") -> "hutangku.jobs\""""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request ID unless one was passed in extra"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "request_id", None):
+            record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, request_id and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.request_id != "-":
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text for reading logs in a terminal; extra fields follow as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+def configure_logging() -> None:
+    """Send "hutangku" logs to stderr in LOG_FORMAT at LOG_LEVEL (once per process)"""
+    logger = logging.getLogger(LOGGER_NAME)
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    # Handled here only, not again by whatever the server configured on the root logger
+    logger.propagate = False
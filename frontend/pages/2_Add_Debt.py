@@ -9,6 +9,9 @@ from datetime import date
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from frontend.utils.api_client import APIClient
+from frontend.utils.api_status import api_status_notice
+from frontend.utils.catalog import company_catalog, invalidate_company_catalog
+from frontend.utils.money import currency_options, format_money
 
 # Page configuration
 st.set_page_config(
@@ -20,29 +23,6 @@ st.set_page_config(
 # Initialize API client
 api_client = APIClient()
 
-# Predefined list of common BNPL and financial companies in Malaysia
-COMMON_COMPANIES = [
-    "Atome",
-    "Grab PayLater",
-    "Shopee PayLater",
-    "Lazada PayLater",
-    "Pace",
-    "Rely",
-    "Hoolah",
-    "Maybank",
-    "CIMB",
-    "Public Bank",
-    "RHB Bank",
-    "Hong Leong Bank",
-    "AmBank",
-    "OCBC",
-    "UOB",
-    "Standard Chartered",
-    "HSBC",
-    "Citibank",
-    "Others (Type manually)"
-]
-
 # Initialize session state
 if 'show_success' not in st.session_state:
     st.session_state.show_success = False
@@ -51,28 +31,82 @@ if 'success_message' not in st.session_state:
 
 
 def get_company_list():
-    """Get the combined list of predefined and custom companies from database"""
-    # Get custom companies from database
-    custom_companies = api_client.get_all_companies()
-    
-    # Combine predefined companies with custom ones (excluding "Others")
-    base_companies = [c for c in COMMON_COMPANIES if c != "Others (Type manually)"]
-    all_companies = base_companies + custom_companies
-    
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_companies = []
-    for company in all_companies:
-        if company not in seen:
-            seen.add(company)
-            unique_companies.append(company)
-    
-    # Sort the list alphabetically
-    unique_companies.sort()
+    """Built-in and custom companies from the session's catalog, with "Others" last"""
+    return company_catalog(api_client)["companies"] + ["Others (Type manually)"]
+
+
+# Repeat choices and the RRULE each becomes (counted from the due date)
+REPEAT_RULES = {
+    "Does not repeat": None,
+    "Weekly": "FREQ=WEEKLY",
+    "Every 2 weeks": "FREQ=WEEKLY;INTERVAL=2",
+    "Monthly": "FREQ=MONTHLY",
+    "Yearly": "FREQ=YEARLY",
+}
+
+
+def recurrence_rule(repeats, due_date, payments):
+    """RRULE for the chosen repeat, or None for a one-off debt"""
+    rule = REPEAT_RULES[repeats]
+    if rule is None:
+        return None
+    if rule == "FREQ=MONTHLY" and due_date.day > 28:
+        # Due on the 29th-31st: fall back to the month's last day in shorter months
+        days = ",".join(str(day) for day in range(28, due_date.day + 1))
+        rule += f";BYMONTHDAY={days};BYSETPOS=-1"
+    if payments:
+        rule += f";COUNT={payments}"
+    return rule
+
+
+# Job states in which an import is still in progress
+IMPORT_ACTIVE = ("queued", "running")
+
+
+@st.fragment(run_every=1)
+def show_import_progress():
+    """Poll the background import once a second without rerunning the whole page"""
+    job = api_client.get_job(st.session_state.import_job["id"])
+    if job is None:
+        st.warning("Lost track of the import. Please check the backend is running.")
+        return
+    st.session_state.import_job = job
+    if job["status"] not in IMPORT_ACTIVE:
+        # Finished: rerun the full page to show the report and stop polling
+        if (job.get("result") or {}).get("companies_added"):
+            invalidate_company_catalog()
+        st.rerun()
     
-    # Add "Others" at the end
-    unique_companies.append("Others (Type manually)")
-    return unique_companies
+    text = job.get("message") or ("Waiting to start..." if job["status"] == "queued" else "Importing...")
+    st.progress(job["progress"], text=text)
+    if st.button("✖ Cancel import", disabled=job["cancel_requested"]):
+        api_client.cancel_job(job["id"])
+
+
+def render_import_result(job):
+    """Show how a finished background import went"""
+    report = job.get("result")
+    if job["status"] == "failed":
+        st.error(f"Import failed: {job.get('error')}")
+    elif job["status"] == "cancelled":
+        st.warning("Import cancelled.")
+    if not report:
+        return
+    st.success(
+        f"✅ Imported {report['imported']} debt(s), added {report['companies_added']} new company(ies)."
+    )
+    if report['failed']:
+        st.warning(f"⚠️ {report['failed']} row(s) could not be imported:")
+        st.dataframe(report['errors'], use_container_width=True, hide_index=True)
+        if report['errors_truncated']:
+            st.caption("Only the first errors are listed.")
+
+
+def search_company_list(prefix):
+    """Catalog companies starting with prefix (already sorted by the backend)"""
+    lower = prefix.lower()
+    matches = [c for c in company_catalog(api_client)["companies"] if c.lower().startswith(lower)]
+    return matches + ["Others (Type manually)"]
 
 
 def main():
@@ -85,10 +119,14 @@ def main():
         st.success(st.session_state.success_message)
         st.session_state.show_success = False
     
+    # Type-ahead narrows the cached catalog
+    company_search = st.text_input("🔍 Find company", placeholder="Start typing a company name", key="company_search")
+    company_options = search_company_list(company_search.strip()) if company_search.strip() else get_company_list()
+
     # Company selection outside form to allow dynamic input
     selected_company = st.selectbox(
         "Company *", 
-        options=get_company_list(),
+        options=company_options,
         help="Select a company or choose 'Others' to type manually",
         key="company_select"
     )
@@ -108,14 +146,28 @@ def main():
             # Use the company name from above
             company_name = company_name_input
             
-            amount_owed = st.number_input("Amount Owed (RM) *", min_value=0.01, step=0.01, format="%.2f")
-            minimum_payment = st.number_input("Minimum Payment (RM) *", min_value=0.01, step=0.01, format="%.2f")
+            currencies = currency_options(api_client)
+            currency = st.selectbox(
+                "Currency *", currencies["currencies"],
+                index=currencies["currencies"].index(currencies["base"]) if currencies["base"] in currencies["currencies"] else 0
+            )
+            amount_owed = st.number_input("Amount Owed *", min_value=0.01, step=0.01, format="%.2f")
+            minimum_payment = st.number_input("Minimum Payment *", min_value=0.01, step=0.01, format="%.2f")
         
         with col2:
             due_date = st.date_input("Due Date *", min_value=date.today())
             status = st.selectbox("Status *", ["Active Debt", "Paid Off"], index=0)
             notes = st.text_area("Notes (Optional)", placeholder="Account number, installment plan, etc.")
         
+        col3, col4 = st.columns(2)
+        with col3:
+            repeats = st.selectbox("Repeats", list(REPEAT_RULES), help="Bills and instalments are added again on each due date")
+        with col4:
+            payments = st.number_input(
+                "Number of payments", min_value=0, step=1, value=0,
+                help="For instalment plans; 0 repeats until you stop it"
+            )
+        
         submit_button = st.form_submit_button("➕ Add Debt", use_container_width=True)
         
         if submit_button:
@@ -125,28 +177,44 @@ def main():
                 st.error("Amount owed must be greater than 0!")
             elif minimum_payment <= 0:
                 st.error("Minimum payment must be greater than 0!")
+            elif REPEAT_RULES[repeats] and status != "Active Debt":
+                st.error("Recurring debts start as Active Debt!")
             else:
                 # If it's a custom company, add it to the database
                 if selected_company == "Others (Type manually)" and company_name:
-                    # Check if not in predefined list
-                    if company_name not in COMMON_COMPANIES:
+                    # Check if not already in the catalog
+                    if company_name not in company_catalog(api_client)["companies"]:
                         result = api_client.create_company(company_name)
                         if result:
+                            invalidate_company_catalog()
                             st.session_state.success_message = f"✅ Company '{company_name}' added to your company list!"
                 
                 # Resolve potential tuple from st.date_input to satisfy linter
                 final_due_date = due_date[0] if isinstance(due_date, tuple) else due_date
 
-                result = api_client.create_debt({
+                debt_data = {
                     "company_name": company_name,
-                    "amount_owed": amount_owed,
-                    "minimum_payment": minimum_payment,
-                    "due_date": final_due_date.isoformat() if final_due_date else None,
-                    "status": status,
+                    # Amounts are stored as whole cents; drop float noise from the widget
+                    "amount_owed": round(amount_owed, 2),
+                    "minimum_payment": round(minimum_payment, 2),
+                    "currency": currency,
                     "notes": notes
-                })
+                }
+                rule = recurrence_rule(repeats, final_due_date, int(payments))
+                if rule:
+                    result = api_client.create_recurring_debt({
+                        **debt_data, "rule": rule, "start_date": final_due_date.isoformat()
+                    })
+                    message = f"✅ Recurring debt '{company_name}' added ({repeats.lower()})!"
+                else:
+                    result = api_client.create_debt({
+                        **debt_data,
+                        "due_date": final_due_date.isoformat() if final_due_date else None,
+                        "status": status
+                    })
+                    message = f"✅ Debt '{company_name}' added successfully!"
                 if result:
-                    st.session_state.success_message = f"✅ Debt '{company_name}' added successfully!"
+                    st.session_state.success_message = message
                     st.session_state.show_success = True
                     st.rerun()
                 else:
@@ -155,11 +223,62 @@ def main():
     st.markdown("---")
     st.info("💡 After adding a debt, go to 'Active Debts' page to view and manage it.")
     
+    # Bulk import from a spreadsheet export or bank statement
+    st.markdown("---")
+    st.subheader("📥 Import Debts from File")
+    st.caption(
+        "CSV with columns company_name, amount_owed, minimum_payment, due_date "
+        "(optional: currency, status, notes), or an OFX/QFX bank statement - each debit becomes an active debt."
+    )
+    uploaded_file = st.file_uploader("Choose a file", type=["csv", "ofx", "qfx"], key="import_file")
+    import_job = st.session_state.get("import_job")
+    importing = import_job is not None and import_job["status"] in IMPORT_ACTIVE
+    if uploaded_file is not None and st.button("📥 Import", use_container_width=True, disabled=importing):
+        job = api_client.start_import_job(uploaded_file.name, uploaded_file)
+        if job is None:
+            st.error("Import failed. Please check the backend is running.")
+        elif "error" in job:
+            st.error(f"Import failed: {job['error']}")
+        else:
+            st.session_state.import_job = job
+            st.rerun()
+    
+    if import_job is not None:
+        if import_job["status"] in IMPORT_ACTIVE:
+            show_import_progress()
+        else:
+            render_import_result(import_job)
+    
+    # Recurring debts: occurrences are added by the backend ahead of each due date
+    st.markdown("---")
+    st.subheader("🔁 Recurring Debts")
+    
+    recurring_debts = api_client.get_recurring_debts()
+    unavailable = api_status_notice(api_client)
+    if recurring_debts:
+        for template in recurring_debts:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                next_due = template["next_due_date"] or "finished"
+                st.write(
+                    f"• **{template['company_name']}** - {format_money(template['amount_owed'], template['currency'])} "
+                    f"(`{template['rule']}`), next due: {next_due}"
+                )
+            with col2:
+                if st.button("⏹️", key=f"stop_recurring_{template['id']}", help="Stop repeating (debts already added are kept)"):
+                    if api_client.delete_recurring_debt(template['id']):
+                        st.success(f"Stopped recurring debt '{template['company_name']}'")
+                        st.rerun()
+                    else:
+                        st.error(f"Failed to stop '{template['company_name']}'")
+    elif not unavailable:
+        st.info("No recurring debts yet. Choose a 'Repeats' option when adding a debt.")
+    
     # Show custom companies management
     st.markdown("---")
     st.subheader("📝 Manage Custom Companies")
     
-    custom_companies = api_client.get_all_companies()
+    custom_companies = company_catalog(api_client)["custom"]
     
     if custom_companies:
         st.write("**Your Custom Companies:**")
@@ -168,21 +287,21 @@ def main():
         for company in custom_companies:
             col1, col2 = st.columns([4, 1])
             with col1:
-                st.write(f"• {company}")
+                st.write(f"• {company['name']}")
             with col2:
-                # Get company details to get its ID
-                company_details = api_client.get_company_by_name(company)
-                if company_details and st.button("🗑️", key=f"delete_company_{company}", help=f"Delete {company}"):
-                    if api_client.delete_company(company_details['id']):
-                        st.success(f"Deleted '{company}' from your company list!")
+                if st.button("🗑️", key=f"delete_company_{company['name']}", help=f"Delete {company['name']}"):
+                    if api_client.delete_company(company['id']):
+                        invalidate_company_catalog()
+                        st.success(f"Deleted '{company['name']}' from your company list!")
                         st.rerun()
                     else:
-                        st.error(f"Failed to delete '{company}'")
+                        st.error(f"Failed to delete '{company['name']}'")
     else:
         st.info("No custom companies yet. Add one by selecting 'Others (Type manually)' when creating a debt.")
     
     # Refresh button in sidebar
     if st.sidebar.button("🔄 Refresh Data", use_container_width=True):
+        invalidate_company_catalog()
         st.rerun()
 
 
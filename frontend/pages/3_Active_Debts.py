@@ -8,7 +8,9 @@ from datetime import datetime, date
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from frontend.utils.api_client import APIClient
+from frontend.utils.api_client import APIClient, ConflictError, DebtArchivedError
+from frontend.utils.api_status import api_status_notice
+from frontend.utils.money import cents_by_currency, currency_options, format_money, format_totals
 
 # Page configuration
 st.set_page_config(
@@ -20,6 +22,8 @@ st.set_page_config(
 # Initialize API client
 api_client = APIClient()
 
+SEARCH_PAGE_SIZE = 10
+
 # Initialize session state for edit mode
 if 'edit_debt_id' not in st.session_state:
     st.session_state.edit_debt_id = None
@@ -29,6 +33,64 @@ if 'success_message' not in st.session_state:
     st.session_state.success_message = ""
 if 'show_edit_dialog' not in st.session_state:
     st.session_state.show_edit_dialog = False
+# The debt as it was when the edit dialog opened (including its version)
+if 'edit_debt_original' not in st.session_state:
+    st.session_state.edit_debt_original = None
+# Queued row actions (debt_id -> "paid" or "delete"), flushed as one bulk request
+if 'pending_actions' not in st.session_state:
+    st.session_state.pending_actions = {}
+if 'active_debts' not in st.session_state:
+    st.session_state.active_debts = None
+
+
+def load_active_debts():
+    """Fetch active debts, reusing the last list while actions are queued"""
+    if st.session_state.pending_actions and st.session_state.active_debts is not None:
+        return st.session_state.active_debts
+    debts = api_client.get_all_debts(status="Active Debt")
+    # Queued actions need the real list, not the empty one an outage leaves
+    st.session_state.active_debts = None if api_client.unavailable else debts
+    return debts
+
+
+def close_edit_dialog():
+    """Close the edit dialog and forget the debt it was editing"""
+    st.session_state.edit_debt_id = None
+    st.session_state.show_edit_dialog = False
+    st.session_state.edit_debt_original = None
+
+
+def queue_action(debt_id, action):
+    """Queue an action for a debt, or un-queue it when clicked again"""
+    pending = st.session_state.pending_actions
+    if pending.get(debt_id) == action:
+        del pending[debt_id]
+    else:
+        pending[debt_id] = action
+
+
+def queue_selected(action):
+    """Queue an action for every debt picked in the multi-select"""
+    for debt_id in st.session_state.selected_debts:
+        st.session_state.pending_actions[debt_id] = action
+    st.session_state.selected_debts = []
+
+
+def flush_pending_actions():
+    """Send all queued actions in one bulk request"""
+    pending = st.session_state.pending_actions
+    mark_paid = [debt_id for debt_id, action in pending.items() if action == "paid"]
+    delete = [debt_id for debt_id, action in pending.items() if action == "delete"]
+
+    result = api_client.bulk_update_debts(mark_paid, delete)
+    if result:
+        st.session_state.success_message = (
+            f"✅ {result['updated']} debt(s) marked as paid, 🗑️ {result['deleted']} deleted!"
+        )
+        st.session_state.show_success = True
+        st.session_state.pending_actions = {}
+        return True
+    return False
 
 
 @st.dialog("✏️ Edit Debt", width="large")
@@ -40,14 +102,14 @@ def edit_debt_dialog(debt_to_edit):
         with col1:
             edit_company = st.text_input("Company Name", value=debt_to_edit['company_name'])
             edit_amount = st.number_input(
-                "Amount Owed (RM)",
+                "Amount Owed",
                 value=debt_to_edit['amount_owed'],
                 min_value=0.01,
                 step=0.01,
                 format="%.2f"
             )
             edit_min_payment = st.number_input(
-                "Minimum Payment (RM)",
+                "Minimum Payment",
                 value=debt_to_edit['minimum_payment'],
                 min_value=0.01,
                 step=0.01,
@@ -55,6 +117,11 @@ def edit_debt_dialog(debt_to_edit):
             )
 
         with col2:
+            currencies = currency_options(api_client)["currencies"]
+            current_currency = debt_to_edit.get('currency', 'MYR')
+            if current_currency not in currencies:
+                currencies = [current_currency, *currencies]
+            edit_currency = st.selectbox("Currency", currencies, index=currencies.index(current_currency))
             edit_due_date = st.date_input(
                 "Due Date",
                 value=datetime.fromisoformat(debt_to_edit['due_date']).date()
@@ -78,31 +145,83 @@ def edit_debt_dialog(debt_to_edit):
             # Resolve potential tuple from st.date_input to satisfy linter
             final_due_date = edit_due_date if isinstance(edit_due_date, date) else edit_due_date
 
-            update_data = {
+            form_data = {
                 "company_name": edit_company,
-                "amount_owed": edit_amount,
-                "minimum_payment": edit_min_payment,
+                # Amounts are stored as whole cents; drop float noise from the widget
+                "amount_owed": round(edit_amount, 2),
+                "minimum_payment": round(edit_min_payment, 2),
+                "currency": edit_currency,
                 "due_date": final_due_date.isoformat() if final_due_date else None,
                 "status": edit_status,
                 "notes": edit_notes
             }
+            # Send only what changed as a merge patch, conditional on the
+            # version the form was opened with
+            changes = {
+                field: value for field, value in form_data.items()
+                if value != debt_to_edit.get(field)
+            }
 
-            result = api_client.update_debt(st.session_state.edit_debt_id, update_data)
-            if result:
-                st.session_state.success_message = f"✅ Debt '{edit_company}' updated successfully!"
-                st.session_state.show_success = True
-                st.session_state.edit_debt_id = None
-                st.session_state.show_edit_dialog = False
+            if not changes:
+                close_edit_dialog()
                 st.rerun()
+
+            try:
+                result, modified = api_client.patch_debt(
+                    st.session_state.edit_debt_id, changes, version=debt_to_edit.get('version')
+                )
+            except DebtArchivedError:
+                st.error("⚠️ This debt has been paid off and archived, so it can no longer be edited.")
+                st.session_state.active_debts = None
+            except ConflictError:
+                st.error("⚠️ This debt was changed somewhere else since you opened it. "
+                         "Cancel and reopen it to see the latest values.")
             else:
-                st.error("Failed to update debt.")
+                if result:
+                    if modified:
+                        st.session_state.success_message = f"✅ Debt '{edit_company}' updated successfully!"
+                        # Only a real change invalidates the cached list
+                        st.session_state.active_debts = None
+                    else:
+                        st.session_state.success_message = f"ℹ️ Debt '{edit_company}' already had these values."
+                    st.session_state.show_success = True
+                    close_edit_dialog()
+                    st.rerun()
+                else:
+                    st.error("Failed to update debt.")
 
         if cancel_button:
-            st.session_state.edit_debt_id = None
-            st.session_state.show_edit_dialog = False
+            close_edit_dialog()
             st.rerun()
 
 
+def show_search_results(query):
+    """Show one page of ranked search results"""
+    page = st.session_state.get("search_page", 1)
+    found = api_client.search_debts(query, page=page, page_size=SEARCH_PAGE_SIZE)
+    if not found["results"] and page > 1:
+        # The query changed and the remembered page no longer exists
+        st.session_state.search_page = page = 1
+        found = api_client.search_debts(query, page=page, page_size=SEARCH_PAGE_SIZE)
+
+    if not found["results"]:
+        st.info(f"No debts match '{query}'.")
+        return
+
+    st.caption(f"{found['total']} match(es) for '{query}'")
+    for debt in found["results"]:
+        due_date_display = datetime.fromisoformat(debt['due_date']).strftime("%d %b %Y")
+        notes = f" - 📝 {debt['notes']}" if debt.get('notes') else ""
+        st.write(
+            f"**🏢 {debt['company_name']}** - {format_money(debt['amount_owed'], debt['currency'])} - "
+            f"due {due_date_display} - {debt['status']}{notes}"
+        )
+
+    total_pages = max(1, -(-found["total"] // SEARCH_PAGE_SIZE))
+    if total_pages > 1:
+        st.number_input("Results page", min_value=1, max_value=total_pages, step=1, key="search_page")
+
+
 def main():
     st.title("📋 Active Debts")
     st.markdown("View and manage your active debts")
@@ -113,31 +232,83 @@ def main():
         st.success(st.session_state.success_message)
         st.session_state.show_success = False
 
-    # Fetch active debts
-    debts = api_client.get_all_debts(status="Active Debt")
+    # Search across all debts (company names and notes)
+    search_query = st.text_input("🔍 Search debts", placeholder="Company name or account number in notes")
+    if search_query.strip():
+        show_search_results(search_query.strip())
+        st.markdown("---")
+
+    # Fetch active debts (skipped while actions are queued)
+    debts = load_active_debts()
+    unavailable = api_status_notice(api_client)
 
     if not debts:
-        st.info("No active debts found. Add your first debt from the Manage Debts page.")
+        if not unavailable:
+            st.info("No active debts found. Add your first debt from the Manage Debts page.")
     else:
-        # Show summary metrics
-        total_owed = sum(debt['amount_owed'] for debt in debts)
-        total_min_payment = sum(debt['minimum_payment'] for debt in debts)
+        # Show summary metrics, totalled exactly per currency
+        base = currency_options(api_client)["base"]
+        total_owed = format_totals(cents_by_currency(debts), base)
+        total_min_payment = format_totals(cents_by_currency(debts, "minimum_payment"), base)
 
         col1, col2, col3 = st.columns(3)
         with col1:
             st.metric("Total Active Debts", len(debts))
         with col2:
-            st.metric("Total Amount Owed", f"RM {total_owed:,.2f}")
+            st.metric("Total Amount Owed", total_owed)
         with col3:
-            st.metric("Total Min Payment", f"RM {total_min_payment:,.2f}")
+            st.metric("Total Min Payment", total_min_payment)
 
         st.markdown("---")
 
-        # Display debts sorted by due date
-        st.subheader("📅 Debts Sorted by Due Date")
-        
         # Sort all debts by due date (nearest first)
         sorted_debts = sorted(debts, key=lambda d: datetime.fromisoformat(d['due_date']))
+        debts_by_id = {debt['id']: debt for debt in sorted_debts}
+
+        # Multi-select actions are queued with the per-row buttons below
+        st.session_state.selected_debts = [
+            debt_id for debt_id in st.session_state.get('selected_debts', []) if debt_id in debts_by_id
+        ]
+        st.multiselect(
+            "Select debts",
+            options=list(debts_by_id),
+            format_func=lambda debt_id: (
+                f"{debts_by_id[debt_id]['company_name']} - "
+                f"{format_money(debts_by_id[debt_id]['amount_owed'], debts_by_id[debt_id]['currency'])}"
+                f" (due {debts_by_id[debt_id]['due_date']})"
+            ),
+            key="selected_debts"
+        )
+        sel_col1, sel_col2, _ = st.columns([1, 1, 2])
+        with sel_col1:
+            st.button("✅ Queue Selected as Paid", on_click=queue_selected, args=("paid",),
+                      disabled=not st.session_state.selected_debts, use_container_width=True)
+        with sel_col2:
+            st.button("🗑️ Queue Selected for Delete", on_click=queue_selected, args=("delete",),
+                      disabled=not st.session_state.selected_debts, use_container_width=True)
+
+        # Pending changes are applied together: one request, one refresh
+        pending = st.session_state.pending_actions
+        if pending:
+            paid_count = sum(1 for action in pending.values() if action == "paid")
+            delete_count = len(pending) - paid_count
+            st.warning(f"⏳ Pending changes: {paid_count} to mark paid, {delete_count} to delete")
+            apply_col, clear_col, _ = st.columns([1, 1, 2])
+            with apply_col:
+                if st.button(f"💾 Apply {len(pending)} Change(s)", type="primary", use_container_width=True):
+                    if flush_pending_actions():
+                        st.rerun()
+                    else:
+                        st.error("Failed to apply changes. Please check the backend is running.")
+            with clear_col:
+                if st.button("↩️ Clear Pending", use_container_width=True):
+                    st.session_state.pending_actions = {}
+                    st.rerun()
+
+        st.markdown("---")
+
+        # Display debts sorted by due date
+        st.subheader("📅 Debts Sorted by Due Date")
         
         # Display each debt
         for debt in sorted_debts:
@@ -162,11 +333,16 @@ def main():
                 st.write(f"**🏢 {debt['company_name']}**")
                 if debt.get('notes'):
                     st.caption(f"📝 {debt['notes']}")
+                queued = pending.get(debt['id'])
+                if queued == "paid":
+                    st.caption("⏳ Queued: mark as paid")
+                elif queued == "delete":
+                    st.caption("⏳ Queued: delete")
             
             with col2:
                 st.write("**Amount Owed:**")
-                st.write(f"RM {debt['amount_owed']:,.2f}")
-                st.caption(f"Min: RM {debt['minimum_payment']:,.2f}")
+                st.write(format_money(debt['amount_owed'], debt['currency']))
+                st.caption(f"Min: {format_money(debt['minimum_payment'], debt['currency'])}")
             
             with col3:
                 st.write("**Due Date:**")
@@ -178,38 +354,36 @@ def main():
                 with btn_col1:
                     if st.button("✏️", key=f"edit_{debt['id']}", help="Edit"):
                         st.session_state.edit_debt_id = debt['id']
+                        st.session_state.edit_debt_original = None
                         st.session_state.show_edit_dialog = True
                         st.rerun()
                 
                 with btn_col2:
-                    if st.button("✅", key=f"paid_{debt['id']}", help="Mark Paid"):
-                        result = api_client.mark_debt_paid(debt['id'])
-                        if result:
-                            st.session_state.success_message = f"✅ Debt '{debt['company_name']}' marked as paid!"
-                            st.session_state.show_success = True
-                            st.rerun()
+                    st.button("✅", key=f"paid_{debt['id']}", help="Queue Mark Paid",
+                              on_click=queue_action, args=(debt['id'], "paid"))
                 
                 with btn_col3:
-                    if st.button("🗑️", key=f"delete_{debt['id']}", help="Delete"):
-                        if api_client.delete_debt(debt['id']):
-                            st.session_state.success_message = f"🗑️ Debt '{debt['company_name']}' deleted!"
-                            st.session_state.show_success = True
-                            st.rerun()
+                    st.button("🗑️", key=f"delete_{debt['id']}", help="Queue Delete",
+                              on_click=queue_action, args=(debt['id'], "delete"))
             
             st.divider()
 
-    # Show edit dialog if triggered
+    # Show edit dialog if triggered; the debt is read once when the dialog opens
+    # so a save is checked against the version the user actually edited
     if st.session_state.show_edit_dialog and st.session_state.edit_debt_id:
-        debt_to_edit = api_client.get_debt(st.session_state.edit_debt_id)
+        debt_to_edit = st.session_state.edit_debt_original
+        if debt_to_edit is None or debt_to_edit['id'] != st.session_state.edit_debt_id:
+            debt_to_edit = api_client.get_debt(st.session_state.edit_debt_id)
+            st.session_state.edit_debt_original = debt_to_edit
         if debt_to_edit:
             edit_debt_dialog(debt_to_edit)
         else:
             st.error("Debt not found.")
-            st.session_state.edit_debt_id = None
-            st.session_state.show_edit_dialog = False
+            close_edit_dialog()
 
     # Refresh button in sidebar
     if st.sidebar.button("🔄 Refresh Data", use_container_width=True):
+        st.session_state.active_debts = None
         st.rerun()
 
 
@@ -1,5 +1,6 @@
 """
 Paid Off Debts Page - View and manage paid off debts
+Recently paid debts come from the main list; older ones are paged in from the archive
 """
 import streamlit as st
 import sys
@@ -9,6 +10,9 @@ from datetime import datetime
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from frontend.utils.api_client import APIClient
+from frontend.utils.api_status import api_status_notice
+from frontend.utils.money import cents_by_currency, currency_options, format_money, format_totals
+from frontend.utils.perf import timed, start_rerun, perf_panel, FETCH
 
 # Page configuration
 st.set_page_config(
@@ -20,12 +24,70 @@ st.set_page_config(
 # Initialize API client
 api_client = APIClient()
 
+# Archived debts fetched per "Load more" click
+ARCHIVE_PAGE_SIZE = 20
+
 # Initialize session state for messages
 if 'show_success' not in st.session_state:
     st.session_state.show_success = False
 if 'success_message' not in st.session_state:
     st.session_state.success_message = ""
 
+def reset_archive():
+    """Forget loaded archive pages so the next run starts from the first page"""
+    st.session_state.archive = {"loaded": False, "debts": [], "next_cursor": None, "total": 0, "total_amount": 0.0}
+
+if 'archive' not in st.session_state:
+    reset_archive()
+
+@timed("archive page", FETCH)
+def load_archive_page():
+    """Fetch the next archive page and append it to the loaded debts"""
+    archive = st.session_state.archive
+    page = api_client.get_archived_debts(cursor=archive["next_cursor"], limit=ARCHIVE_PAGE_SIZE)
+    if "/debts/archive" in api_client.unavailable:
+        # Try again next rerun rather than remember an empty archive
+        return
+    if not archive["loaded"]:
+        archive["total"] = page.get("total") or 0
+        archive["total_amount"] = page.get("total_amount") or 0.0
+    archive["debts"].extend(page["results"])
+    archive["next_cursor"] = page["next_cursor"]
+    archive["loaded"] = True
+
+def render_paid_debt(debt, key_prefix):
+    """Show one paid off debt with its delete button"""
+    with st.container():
+        col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+        
+        with col1:
+            st.write(f"**{debt['company_name']}**")
+            if debt.get('notes'):
+                st.caption(f"📝 {debt['notes']}")
+        
+        with col2:
+            st.write(f"**Amount:** {format_money(debt['amount_owed'], debt['currency'])}")
+            st.caption(f"Min Payment: {format_money(debt['minimum_payment'], debt['currency'])}")
+        
+        with col3:
+            due_date_obj = datetime.fromisoformat(debt['due_date']).date()
+            st.write(f"**Due Date:** {due_date_obj.strftime('%d %b %Y')}")
+            if debt.get('paid_at'):
+                paid_at = datetime.fromisoformat(debt['paid_at']).date()
+                st.caption(f"✅ Paid on {paid_at.strftime('%d %b %Y')}")
+            else:
+                st.caption(f"✅ Status: {debt['status']}")
+        
+        with col4:
+            if st.button("🗑️ Delete", key=f"{key_prefix}_{debt['id']}", help="Delete this record", use_container_width=True):
+                if api_client.delete_debt(debt['id']):
+                    st.session_state.success_message = f"🗑️ Debt record '{debt['company_name']}' deleted!"
+                    st.session_state.show_success = True
+                    reset_archive()
+                    st.rerun()
+        
+        st.divider()
+
 def main():
     st.title("✅ Paid Off Debts")
     st.markdown("View all your successfully paid off debts")
@@ -36,51 +98,48 @@ def main():
         st.success(st.session_state.success_message)
         st.session_state.show_success = False
     
-    # Fetch paid off debts
+    # Recently paid debts still live in the main list; the first archive page
+    # brings the archive totals with it
     paid_debts = api_client.get_all_debts(status="Paid Off")
+    archive = st.session_state.archive
+    if not archive["loaded"]:
+        load_archive_page()
+    
+    unavailable = api_status_notice(api_client)
     
-    if not paid_debts:
-        st.info("🎉 No paid off debts yet. Once you mark debts as paid, they will appear here.")
+    if not paid_debts and not archive["total"]:
+        if not unavailable:
+            st.info("🎉 No paid off debts yet. Once you mark debts as paid, they will appear here.")
     else:
-        st.success(f"**Total Paid Off Debts:** {len(paid_debts)}")
+        st.success(f"**Total Paid Off Debts:** {len(paid_debts) + archive['total']}")
         
-        # Calculate total paid amount
-        total_paid = sum(debt['amount_owed'] for debt in paid_debts)
-        st.metric("Total Amount Paid Off", f"RM {total_paid:,.2f}")
+        # Recent debts are totalled per currency; the archive total is already in the base currency
+        base = currency_options(api_client)["base"]
+        total_paid = cents_by_currency(paid_debts)
+        total_paid[base] += round(archive["total_amount"] * 100)
+        st.metric("Total Amount Paid Off", format_totals(total_paid, base))
         
         st.markdown("---")
         
-        # Display each paid off debt
+        # Display each recently paid off debt
         for debt in paid_debts:
-            with st.container():
-                col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
-                
-                with col1:
-                    st.write(f"**{debt['company_name']}**")
-                    if debt.get('notes'):
-                        st.caption(f"📝 {debt['notes']}")
-                
-                with col2:
-                    st.write(f"**Amount:** RM {debt['amount_owed']:,.2f}")
-                    st.caption(f"Min Payment: RM {debt['minimum_payment']:,.2f}")
-                
-                with col3:
-                    due_date_obj = datetime.fromisoformat(debt['due_date']).date()
-                    st.write(f"**Due Date:** {due_date_obj.strftime('%d %b %Y')}")
-                    st.caption(f"✅ Status: {debt['status']}")
-                
-                with col4:
-                    if st.button("🗑️ Delete", key=f"delete_paid_{debt['id']}", help="Permanently delete this record", use_container_width=True):
-                        if api_client.delete_debt(debt['id']):
-                            st.session_state.success_message = f"🗑️ Debt record '{debt['company_name']}' deleted!"
-                            st.session_state.show_success = True
-                            st.rerun()
-                
-                st.divider()
+            render_paid_debt(debt, "delete_paid")
+        
+        if archive["total"]:
+            st.subheader(f"🗄️ Archived ({archive['total']})")
+            st.caption("Debts paid off a while ago are moved to the archive and loaded a page at a time. "
+                       "Archived debts are read-only; they can only be deleted.")
+            for debt in archive["debts"]:
+                render_paid_debt(debt, "delete_archived")
+            if archive["next_cursor"]:
+                st.button("⬇️ Load more", on_click=load_archive_page, use_container_width=True)
     
     # Refresh button in sidebar
     if st.sidebar.button("🔄 Refresh Data", use_container_width=True):
+        reset_archive()
         st.rerun()
 
 if __name__ == "__main__":
+    start_rerun("Paid Off Debts", api_client.request_id)
     main()
+    perf_panel()
@@ -1,130 +1,573 @@
 """
 API Client - Helper functions to make HTTP calls to FastAPI backend
+Each client tags its requests with one X-Request-ID; pages create a client per
+Streamlit rerun, so the API's log lines for a rerun share that ID.
+
+Calls go through per-route circuit breakers with adaptive read timeouts (see
+utils/resilience.py). Page-load reads fall back to their last good response
+while a route is failing; after a rerun, self.stale and self.unavailable say
+which routes were answered from that fallback or not answered at all.
 """
+import json
+import logging
+import uuid
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Hashable, Optional, Set, Tuple
 import sys
 import os
+import pandas as pd
+import pyarrow as pa
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from core.config import settings
+from core.log import REQUEST_ID_HEADER, configure_logging, get_logger
+from frontend.utils.resilience import CircuitOpenError, endpoint_health, refresher, stale_responses
+
+configure_logging()
+logger = get_logger("frontend")
+
+class ConflictError(Exception):
+    """The debt changed on the server since it was read (HTTP 409)"""
+
+
+class DebtArchivedError(ConflictError):
+    """The debt has been archived and can no longer be changed (HTTP 409)"""
+
+
+def conflict_error(response: requests.Response) -> ConflictError:
+    """The exception for a 409 answer to a debt write"""
+    detail = response.json().get("detail", "Debt was modified elsewhere")
+    if response.headers.get("X-Debt-Archived") == "true":
+        return DebtArchivedError(detail)
+    return ConflictError(detail)
+
 
 class APIClient:
     """Client for interacting with the Debt Management API"""
     
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, token: str = None):
         self.base_url = base_url or settings.API_BASE_URL
+        # Correlates this client's requests with the API's logs
+        self.request_id = uuid.uuid4().hex
+        # The backend scopes every request to the user this token was issued for
+        self.token = token or settings.API_TOKEN
+        self.session = self._new_session()
         self.debts_endpoint = f"{self.base_url}/debts"
         self.companies_endpoint = f"{self.base_url}/companies"
+        self.jobs_endpoint = f"{self.base_url}/jobs"
+        self.recurring_endpoint = f"{self.base_url}/recurring"
+        # Routes answered with a stale response (route -> its age in seconds),
+        # and routes that failed with nothing to fall back on
+        self.stale: Dict[str, float] = {}
+        self.unavailable: Set[str] = set()
+        # Routes api_status_notice has already warned about
+        self.reported: Set[str] = set()
+
+    def _new_session(self) -> requests.Session:
+        """HTTP session sending this client's token and request ID"""
+        session = requests.Session()
+        session.headers.update({"Authorization": f"Bearer {self.token}", REQUEST_ID_HEADER: self.request_id})
+        session.hooks["response"].append(self._log_response)
+        return session
+
+    def _log_response(self, response: requests.Response, *args, **kwargs) -> None:
+        """Log each API call's status and round trip time (slow ones as warnings)"""
+        elapsed_ms = response.elapsed.total_seconds() * 1000
+        slow = elapsed_ms >= settings.SLOW_REQUEST_MS
+        logger.log(
+            logging.WARNING if slow else logging.DEBUG,
+            "Slow API call" if slow else "API call",
+            extra={"request_id": self.request_id, "fields": {
+                "method": response.request.method,
+                "path": requests.utils.urlparse(response.url).path,
+                "status": response.status_code,
+                "duration_ms": round(elapsed_ms, 3),
+            }}
+        )
+
+    def _log_failure(self, message: str, error: requests.exceptions.RequestException) -> None:
+        """Log an API call that failed, with the request ID the API logged it under"""
+        fields = {"error": str(error)}
+        if error.response is not None:
+            fields["status"] = error.response.status_code
+        logger.warning(message, extra={"request_id": self.request_id, "fields": fields})
+
+    def _call(self, method: str, route: str, url: str, timeout: Optional[float] = None,
+              session: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+        """Send a request through route's circuit breaker ("/debts/{id}", not the URL)
+
+        Raises CircuitOpenError without calling the API while the breaker is
+        open. Without a timeout the route's adaptive read timeout is used.
+        Requests go through self.session unless another session is given.
+        """
+        health = endpoint_health(f"{method} {route}")
+        if not health.allow():
+            raise CircuitOpenError(f"{method} {route} is failing; not calling it for now")
+        try:
+            response = (session or self.session).request(method, url, timeout=timeout or health.timeout(), **kwargs)
+        except requests.exceptions.Timeout:
+            health.record_failure(timed_out=True)
+            raise
+        except requests.exceptions.RequestException:
+            health.record_failure()
+            raise
+        if response.status_code >= 500:
+            health.record_failure()
+        else:
+            health.record_success(response.elapsed.total_seconds())
+        return response
+
+    def _read(self, route: str, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """GET that falls back to the last good response while route is failing
+
+        A fallback is listed in self.stale and refreshed in the background. With
+        nothing to fall back on the error is raised and route is added to
+        self.unavailable, so pages can tell "nothing there" from "no answer".
+        """
+        key = (self.token, url, tuple(sorted((params or {}).items())))
+        cached = stale_responses.get(key)
+        # No point waiting on a route that is known to be failing
+        if cached is not None and endpoint_health(f"GET {route}").is_open:
+            return self._serve_stale(route, key, cached, url, params, "circuit open")
+        try:
+            response = self._call("GET", route, url, params=params)
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if cached is None:
+                self.unavailable.add(route)
+                raise
+            return self._serve_stale(route, key, cached, url, params, str(e))
+        if response.ok:
+            stale_responses.put(key, response)
+        return response
+
+    def _serve_stale(self, route: str, key: Hashable, cached: Tuple[requests.Response, float],
+                     url: str, params: Optional[Dict], reason: str) -> requests.Response:
+        """Answer with a stored response and refresh it in the background"""
+        response, age = cached
+        self.stale[route] = age
+        logger.warning("Serving stale response", extra={"request_id": self.request_id, "fields": {
+            "route": route, "age_s": round(age, 1), "reason": reason
+        }})
+        refresher.submit(key, lambda: self._refresh(route, key, url, params))
+        return response
+
+    def _refresh(self, route: str, key: Hashable, url: str, params: Optional[Dict]) -> None:
+        """Replace a stale response, allowing the full timeout (skipped while the breaker is closed to calls)
+
+        Runs on the refresher's thread, so it uses a session of its own:
+        requests.Session is not safe to share with the page's thread.
+        """
+        try:
+            with self._new_session() as session:
+                response = self._call("GET", route, url, params=params, timeout=settings.API_TIMEOUT_SECONDS,
+                                      session=session)
+        except requests.exceptions.RequestException as e:
+            logger.debug("Background refresh failed", extra={"request_id": self.request_id, "fields": {
+                "route": route, "error": str(e)
+            }})
+            return
+        if response.ok:
+            stale_responses.put(key, response)
     
     def get_all_debts(self, status: Optional[str] = None) -> List[Dict]:
         """Retrieve all debts, optionally filtered by status"""
         try:
             params = {"status": status} if status else {}
-            response = requests.get(self.debts_endpoint, params=params, timeout=5)
+            response = self._read("/debts", self.debts_endpoint, params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching debts: {e}")
+            self._log_failure("Error fetching debts", e)
             return []
     
+    def get_debts_frame(self, status: Optional[str] = None) -> pd.DataFrame:
+        """Retrieve debts as a typed DataFrame using the Arrow transfer format"""
+        try:
+            params = {"format": "arrow"}
+            if status:
+                params["status"] = status
+            response = self._read("/debts", self.debts_endpoint, params)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching debts", e)
+            return pd.DataFrame()
+
+        if response.headers.get("content-type", "").startswith("application/vnd.apache.arrow.stream"):
+            # Amounts arrive as float64 plus exact int64 cents, due dates as date32
+            # and company/currency/status as dictionaries, so no coercion is needed here
+            table = pa.ipc.open_stream(response.content).read_all()
+            return table.to_pandas(date_as_object=False)
+        return self._debts_json_to_frame(response.json())
+
+    @staticmethod
+    def _debts_json_to_frame(debts: List[Dict]) -> pd.DataFrame:
+        """Build a typed DataFrame from a JSON debt list (older backends)"""
+        df = pd.DataFrame(debts)
+        if df.empty:
+            return df
+        df['company_name'] = df['company_name'].astype(str)
+        df['status'] = df['status'].astype(str)
+        df['notes'] = df['notes'].fillna('').astype(str)
+        df['due_date'] = pd.to_datetime(df['due_date'])
+        for col in ['amount_owed', 'minimum_payment']:
+            if df[col].dtype == 'object':  # If string type
+                df[col] = df[col].astype(str).str.replace(r'[^\d.]', '', regex=True)
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df[f'{col}_cents'] = (df[col] * 100).round().astype('int64')
+        # Backends without per-debt currencies only held ringgit
+        if 'currency' not in df:
+            df['currency'] = 'MYR'
+            df['base_amount_owed_cents'] = df['amount_owed_cents']
+        return df
+
+    def search_debts(self, query: str, page: int = 1, page_size: int = 20) -> Dict:
+        """Full-text search over company names and notes"""
+        try:
+            response = self._read(
+                "/debts/search", f"{self.debts_endpoint}/search",
+                {"q": query, "page": page, "page_size": page_size}
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error searching debts", e)
+            return {"total": 0, "page": page, "page_size": page_size, "results": []}
+
+    def get_archived_debts(self, cursor: Optional[str] = None, limit: int = 20) -> Dict:
+        """Retrieve one page of archived paid-off debts (pass the previous page's next_cursor)"""
+        try:
+            params = {"limit": limit}
+            if cursor:
+                params["cursor"] = cursor
+            response = self._read("/debts/archive", f"{self.debts_endpoint}/archive", params)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching archived debts", e)
+            return {"total": None, "total_amount": None, "results": [], "next_cursor": None}
+
+    def get_debt_history(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """Retrieve daily outstanding/paid-off balances (ISO date bounds)"""
+        try:
+            params = {}
+            if start:
+                params["from"] = start
+            if end:
+                params["to"] = end
+            response = self._read("/debts/history", f"{self.debts_endpoint}/history", params)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching debt history", e)
+            return []
+
+    def get_debt_trends(self, start: Optional[str] = None, end: Optional[str] = None,
+                        granularity: Optional[str] = None) -> List[Dict]:
+        """Retrieve outstanding-over-time points from the backend's daily rollups"""
+        try:
+            params = {}
+            if start:
+                params["from"] = start
+            if end:
+                params["to"] = end
+            if granularity:
+                params["granularity"] = granularity
+            response = self._read("/debts/trends", f"{self.debts_endpoint}/trends", params)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching debt trends", e)
+            return []
+
+    def get_debt_composition(self, small_threshold: float, today: Optional[str] = None) -> Optional[Dict]:
+        """Retrieve status x company totals with small companies merged, for the dashboard charts"""
+        try:
+            params = {"small_threshold": small_threshold}
+            if today:
+                params["today"] = today
+            response = self._read("/debts/composition", f"{self.debts_endpoint}/composition", params)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching debt composition", e)
+            return None
+
+    def get_currencies(self) -> Optional[Dict]:
+        """Base currency and the currencies debts may be recorded in"""
+        try:
+            response = self._read("/debts/currencies", f"{self.debts_endpoint}/currencies")
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching currencies", e)
+            return None
+
     def get_debt(self, debt_id: str) -> Optional[Dict]:
         """Retrieve a single debt by ID"""
         try:
-            response = requests.get(f"{self.debts_endpoint}/{debt_id}", timeout=5)
+            response = self._call("GET", "/debts/{id}", f"{self.debts_endpoint}/{debt_id}")
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching debt {debt_id}: {e}")
+            self._log_failure(f"Error fetching debt {debt_id}", e)
             return None
     
     def create_debt(self, debt_data: Dict) -> Optional[Dict]:
         """Create a new debt record"""
         try:
-            response = requests.post(self.debts_endpoint, json=debt_data, timeout=5)
+            response = self._call("POST", "/debts", self.debts_endpoint, json=debt_data, timeout=5)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error creating debt", e)
+            return None
+    
+    def import_debts(self, file_name: str, file_obj) -> Optional[Dict]:
+        """Upload a CSV or OFX/QFX file to the bulk importer and return its report"""
+        try:
+            response = self._call(
+                "POST", "/debts/import", f"{self.debts_endpoint}/import",
+                files={"file": (file_name, file_obj)},
+                # Large statements take a while to validate and insert
+                timeout=120
+            )
+            if response.status_code == 400:
+                return {"error": response.json().get("detail", "Import failed")}
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error importing debts", e)
+            return None
+    
+    def start_import_job(self, file_name: str, file_obj) -> Optional[Dict]:
+        """Upload a CSV or OFX/QFX file for a background import and return the queued job"""
+        try:
+            response = self._call(
+                "POST", "/jobs/import", f"{self.jobs_endpoint}/import",
+                files={"file": (file_name, file_obj)},
+                timeout=60
+            )
+            if response.status_code == 400:
+                return {"error": response.json().get("detail", "Import failed")}
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error starting import", e)
+            return None
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Poll a background job's status and progress"""
+        try:
+            response = self._call("GET", "/jobs/{id}", f"{self.jobs_endpoint}/{job_id}", timeout=10)
+            if response.status_code == 404:
+                return None
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error creating debt: {e}")
+            self._log_failure("Error fetching job", e)
             return None
     
-    def update_debt(self, debt_id: str, debt_data: Dict) -> Optional[Dict]:
-        """Update an existing debt record"""
+    def cancel_job(self, job_id: str) -> Optional[Dict]:
+        """Ask a background job to stop"""
         try:
-            response = requests.put(
-                f"{self.debts_endpoint}/{debt_id}",
+            response = self._call("POST", "/jobs/{id}/cancel", f"{self.jobs_endpoint}/{job_id}/cancel", timeout=10)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error cancelling job", e)
+            return None
+    
+    def update_debt(self, debt_id: str, debt_data: Dict, version: Optional[int] = None) -> Optional[Dict]:
+        """Update an existing debt record
+
+        Only the fields in debt_data are changed. With version, the update is
+        rejected with ConflictError if the debt was modified since it was read;
+        archived debts always raise DebtArchivedError.
+        """
+        headers = {}
+        if version is not None:
+            headers["If-Match"] = f'"{version}"'
+        try:
+            response = self._call(
+                "PUT", "/debts/{id}", f"{self.debts_endpoint}/{debt_id}",
                 json=debt_data,
+                headers=headers,
                 timeout=5
             )
+            if response.status_code == 409:
+                raise conflict_error(response)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error updating debt {debt_id}: {e}")
+            self._log_failure(f"Error updating debt {debt_id}", e)
             return None
     
+    def patch_debt(self, debt_id: str, changes: Dict, version: Optional[int] = None) -> Tuple[Optional[Dict], bool]:
+        """Send only changed fields as a JSON Merge Patch
+
+        Returns (debt, modified); modified is False when the backend found
+        nothing to change. Raises ConflictError like update_debt.
+        """
+        headers = {"Content-Type": "application/merge-patch+json"}
+        if version is not None:
+            headers["If-Match"] = f'"{version}"'
+        try:
+            response = self._call(
+                "PATCH", "/debts/{id}", f"{self.debts_endpoint}/{debt_id}",
+                data=json.dumps(changes),
+                headers=headers,
+                timeout=5
+            )
+            if response.status_code == 409:
+                raise conflict_error(response)
+            response.raise_for_status()
+            return response.json(), response.headers.get("X-Debt-Modified") != "false"
+        except requests.exceptions.RequestException as e:
+            self._log_failure(f"Error patching debt {debt_id}", e)
+            return None, False
+    
     def delete_debt(self, debt_id: str) -> bool:
         """Delete a debt record"""
         try:
-            response = requests.delete(f"{self.debts_endpoint}/{debt_id}", timeout=5)
+            response = self._call("DELETE", "/debts/{id}", f"{self.debts_endpoint}/{debt_id}", timeout=5)
             response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
-            print(f"Error deleting debt {debt_id}: {e}")
+            self._log_failure(f"Error deleting debt {debt_id}", e)
             return False
     
     def mark_debt_paid(self, debt_id: str) -> Optional[Dict]:
         """Quick action to mark a debt as paid off"""
         return self.update_debt(debt_id, {"status": "Paid Off"})
+
+    def bulk_update_debts(self, mark_paid: List[str], delete: List[str]) -> Optional[Dict]:
+        """Mark many debts paid and delete many debts in a single request"""
+        try:
+            response = self._call(
+                "POST", "/debts/bulk", f"{self.debts_endpoint}/bulk",
+                json={
+                    "updates": [{"id": debt_id, "status": "Paid Off"} for debt_id in mark_paid],
+                    "delete": delete
+                },
+                timeout=5
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error applying bulk changes", e)
+            return None
+    
+    # ============ RECURRING DEBTS ============
+    
+    def get_recurring_debts(self) -> List[Dict]:
+        """Retrieve all recurring debt templates"""
+        try:
+            response = self._read("/recurring", self.recurring_endpoint)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching recurring debts", e)
+            return []
+    
+    def create_recurring_debt(self, template_data: Dict) -> Optional[Dict]:
+        """Create a recurring debt template; its occurrences are added by the backend"""
+        try:
+            response = self._call("POST", "/recurring", self.recurring_endpoint, json=template_data, timeout=5)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error creating recurring debt", e)
+            return None
+    
+    def delete_recurring_debt(self, template_id: str) -> bool:
+        """Stop a recurring debt (debts already added are kept)"""
+        try:
+            response = self._call("DELETE", "/recurring/{id}", f"{self.recurring_endpoint}/{template_id}", timeout=5)
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException as e:
+            self._log_failure(f"Error deleting recurring debt {template_id}", e)
+            return False
     
     # ============ COMPANY OPERATIONS ============
     
     def get_all_companies(self) -> List[str]:
         """Retrieve all custom company names"""
         try:
-            response = requests.get(self.companies_endpoint, timeout=5)
+            response = self._read("/companies", self.companies_endpoint)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching companies: {e}")
+            self._log_failure("Error fetching companies", e)
             return []
     
+    def get_company_catalog(self, cached: Optional[Dict] = None) -> Optional[Dict]:
+        """Fetch the merged company catalog, revalidating a cached copy by its version
+
+        Returns cached itself when the server says it is unchanged (or cannot
+        be reached), so callers can always use the result.
+        """
+        headers = {}
+        if cached:
+            headers["If-None-Match"] = f'"{cached["version"]}"'
+        try:
+            response = self._call("GET", "/companies/catalog", f"{self.companies_endpoint}/catalog", headers=headers)
+            if response.status_code == 304:
+                return cached
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error fetching company catalog", e)
+            return cached
+    
+    def search_companies(self, prefix: str, limit: int = 10) -> List[str]:
+        """Custom company names starting with prefix"""
+        try:
+            response = self._read(
+                "/companies/search", f"{self.companies_endpoint}/search", {"prefix": prefix, "limit": limit}
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            self._log_failure("Error searching companies", e)
+            return []
+
     def create_company(self, company_name: str) -> Optional[Dict]:
         """Add a new custom company"""
         try:
-            response = requests.post(
-                self.companies_endpoint,
+            response = self._call(
+                "POST", "/companies", self.companies_endpoint,
                 json={"name": company_name},
                 timeout=5
             )
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error creating company: {e}")
+            self._log_failure("Error creating company", e)
             return None
     
     def delete_company(self, company_id: str) -> bool:
         """Delete a custom company"""
         try:
-            response = requests.delete(
-                f"{self.companies_endpoint}/{company_id}",
+            response = self._call(
+                "DELETE", "/companies/{id}", f"{self.companies_endpoint}/{company_id}",
                 timeout=5
             )
             response.raise_for_status()
             return True
         except requests.exceptions.RequestException as e:
-            print(f"Error deleting company {company_id}: {e}")
+            self._log_failure(f"Error deleting company {company_id}", e)
             return False
     
     def get_company_by_name(self, company_name: str) -> Optional[Dict]:
         """Get company details by name"""
         try:
-            response = requests.get(
-                f"{self.companies_endpoint}/by-name/{company_name}",
-                timeout=5
-            )
+            response = self._call("GET", "/companies/by-name/{name}", f"{self.companies_endpoint}/by-name/{company_name}")
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching company {company_name}: {e}")
+            self._log_failure(f"Error fetching company {company_name}", e)
             return None
\ No newline at end of file
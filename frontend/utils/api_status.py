@@ -0,0 +1,36 @@
+"""
+API status notice - tells users when a page shows old or missing data
+APIClient answers failing routes with their last good response where it has
+one (marked stale) and with an empty result where it has not; without this
+notice both look like real data, e.g. "No debts found" during an outage.
+"""
+import streamlit as st
+
+def describe_age(seconds: float) -> str:
+    """'less than a minute', '5 minutes', '2 hours'"""
+    if seconds < 60:
+        return "less than a minute"
+    if seconds < 3600:
+        minutes = int(seconds // 60)
+        return f"{minutes} minute{'s' if minutes > 1 else ''}"
+    hours = int(seconds // 3600)
+    return f"{hours} hour{'s' if hours > 1 else ''}"
+
+def api_status_notice(api_client) -> bool:
+    """Warn about stale or missing data so far this rerun; True if some data is missing
+
+    Call after the page's fetches, or after each section's fetches on pages
+    that load in sections; routes already warned about are not repeated.
+    Skip empty-state messages when it returns True.
+    """
+    unavailable = api_client.unavailable - api_client.reported
+    stale = {route: age for route, age in api_client.stale.items() if route not in api_client.reported}
+    if unavailable:
+        st.error("⚠️ The API is not responding, so some data could not be loaded. "
+                 "Please check the backend is running.")
+    if stale:
+        age = describe_age(max(stale.values()))
+        st.warning(f"⚠️ The API is not responding. Showing data from {age} ago; "
+                   "it will update once the API is back.")
+    api_client.reported.update(unavailable, stale)
+    return bool(api_client.unavailable)
@@ -0,0 +1,28 @@
+"""
+Company catalog cache - one copy per Streamlit session
+The catalog (built-in + custom companies, merged and sorted by the backend)
+is kept in session state and only revalidated against its version stamp
+every CATALOG_RECHECK_SECONDS, or right after this session changes it.
+"""
+import time
+import streamlit as st
+
+# How long a cached catalog is trusted before a (cheap, usually 304) revalidation
+CATALOG_RECHECK_SECONDS = 300
+
+def company_catalog(api_client) -> dict:
+    """The session's company catalog: {"version", "companies", "custom"}"""
+    cached = st.session_state.get("company_catalog")
+    checked_at = st.session_state.get("company_catalog_checked_at", 0.0)
+    if cached is not None and time.monotonic() - checked_at < CATALOG_RECHECK_SECONDS:
+        return cached
+
+    catalog = api_client.get_company_catalog(cached) or {"version": None, "companies": [], "custom": []}
+    if catalog.get("version") is not None:
+        st.session_state.company_catalog = catalog
+        st.session_state.company_catalog_checked_at = time.monotonic()
+    return catalog
+
+def invalidate_company_catalog() -> None:
+    """Revalidate on next use; call after adding or deleting companies"""
+    st.session_state.company_catalog_checked_at = 0.0
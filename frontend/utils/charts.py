@@ -0,0 +1,220 @@
+"""
+Chart builders - Plotly figures for the dashboard, memoized on their input data
+Each builder is a pure function of its aggregated DataFrame(s). Results are
+kept in a small per-process LRU keyed on a fingerprint of the frames'
+contents, so a rerun with unchanged aggregates reuses the built figure
+instead of running plotly express and update_layout again.
+
+Cached figures are shared between reruns and sessions: callers must not
+modify a returned figure. Amounts are labelled with the currency passed in,
+normally the backend's base currency.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from frontend.utils.money import currency_label
+
+# Figures kept per process across all builders
+CHART_CACHE_SIZE = 32
+
+STATUS_COLORS = {'Active': "#f7db0c", 'Overdue': '#d62728', 'Paid Off': '#2ca02c'}
+URGENCY_COLORS = {
+    "Overdue": '#d62728', "Due Today": '#ff7f0e', "1-3 days": '#ffbb00',
+    "4-7 days": '#f7db0c', "8-14 days": '#2ca02c', ">14 days": '#1f77b4'
+}
+
+_figure_cache: "OrderedDict[tuple, go.Figure]" = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame: column names, dtypes and row values in order"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(name), str(dtype)) for name, dtype in df.dtypes.items()]).encode())
+    try:
+        rows = pd.util.hash_pandas_object(df, index=False)
+    except TypeError:
+        # Unhashable cells (dicts, lists) are hashed by their text form
+        rows = pd.util.hash_pandas_object(df.astype(str), index=False)
+    digest.update(rows.values.tobytes())
+    return digest.hexdigest()
+
+def cached_figure(builder):
+    """Memoize a figure builder on the contents of its DataFrame arguments"""
+    @wraps(builder)
+    def wrapper(*args, **kwargs):
+        key = (builder.__name__,) + tuple(
+            frame_fingerprint(value) if isinstance(value, pd.DataFrame) else repr(value)
+            for value in (*args, *sorted(kwargs.items()))
+        )
+        with _figure_cache_lock:
+            figure = _figure_cache.get(key)
+            if figure is not None:
+                _figure_cache.move_to_end(key)
+                return figure
+        figure = builder(*args, **kwargs)
+        with _figure_cache_lock:
+            _figure_cache[key] = figure
+            while len(_figure_cache) > CHART_CACHE_SIZE:
+                _figure_cache.popitem(last=False)
+        return figure
+    return wrapper
+
+
+@cached_figure
+def trend_line(trend_df: pd.DataFrame, currency: str = "MYR") -> go.Figure:
+    """Outstanding vs paid-off totals over time"""
+    label = currency_label(currency)
+    fig = px.line(
+        trend_df, x='date', y=['outstanding', 'paid_off'],
+        color_discrete_map={'outstanding': '#d62728', 'paid_off': '#2ca02c'}
+    )
+    fig.update_traces(hovertemplate='%{x|%d %b %Y}<br>' + label + ' %{y:,.2f}<extra></extra>')
+    fig.update_layout(
+        xaxis_title="",
+        yaxis_title=f"Amount ({label})",
+        height=350,
+        margin=dict(t=20, l=10, r=10, b=20),
+        legend=dict(title=None, orientation="h", yanchor="bottom", y=1.02, xanchor="left", x=0)
+    )
+    return fig
+
+@cached_figure
+def company_trend_area(company_trend_df: pd.DataFrame, currency: str = "MYR") -> go.Figure:
+    """Outstanding per company over time, stacked"""
+    label = currency_label(currency)
+    fig = px.area(company_trend_df, x='date', y='amount', color='company_name')
+    fig.update_traces(hovertemplate='%{x|%d %b %Y}<br>' + label + ' %{y:,.2f}<extra></extra>')
+    fig.update_layout(
+        xaxis_title="",
+        yaxis_title=f"Outstanding by Company ({label})",
+        height=350,
+        margin=dict(t=20, l=10, r=10, b=20),
+        legend=dict(title=None, orientation="h", yanchor="bottom", y=1.02, xanchor="left", x=0)
+    )
+    return fig
+
+@cached_figure
+def status_pie(status_df: pd.DataFrame, currency: str = "MYR") -> go.Figure:
+    """Donut of amounts by display status"""
+    label = currency_label(currency)
+    fig = px.pie(
+        status_df, values='amount_owed', names='display_status', color='display_status',
+        color_discrete_map=STATUS_COLORS,
+        hole=0.4
+    )
+    fig.update_traces(
+        textposition='inside',
+        textinfo='label+percent',
+        textfont_size=14,
+        hovertemplate='<b>%{label}</b><br>Amount: ' + label + ' %{value:,.2f}<br>Percentage: %{percent}<extra></extra>'
+    )
+    fig.update_layout(
+        showlegend=True,
+        height=450,
+        margin=dict(t=20, l=10, r=10, b=20),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5
+        )
+    )
+    return fig
+
+@cached_figure
+def top_companies_bar(top_companies: pd.DataFrame, currency: str = "MYR") -> go.Figure:
+    """Horizontal bars for the largest active/overdue company totals"""
+    label = currency_label(currency)
+    fig = px.bar(
+        top_companies, y='company_name', x='amount_owed', color='display_status',
+        color_discrete_map={'Active': STATUS_COLORS['Active'], 'Overdue': STATUS_COLORS['Overdue']},
+        orientation='h', text='amount_owed'
+    )
+    fig.update_traces(
+        texttemplate=label + ' %{text:,.0f}',
+        textposition='inside',
+        textfont=dict(size=11, color='black'),
+        insidetextanchor='end',
+        hovertemplate='<b>%{y}</b><br>Amount: ' + label + ' %{x:,.2f}<br>Status: %{fullData.name}<extra></extra>'
+    )
+    fig.update_layout(
+        xaxis_title="",
+        yaxis_title="",
+        showlegend=True,
+        height=max(350, len(top_companies) * 40),
+        margin=dict(t=40, l=5, r=10, b=10),
+        yaxis={'categoryorder': 'total ascending'},
+        legend=dict(
+            title=dict(text="Status", font=dict(size=11)),
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="left",
+            x=0,
+            font=dict(size=10)
+        ),
+        xaxis=dict(visible=False)
+    )
+    return fig
+
+@cached_figure
+def urgency_bar(urgency_summary: pd.DataFrame, currency: str = "MYR") -> go.Figure:
+    """Amount and count of active debts per due-date bucket"""
+    label = currency_label(currency)
+    fig = px.bar(
+        urgency_summary, x='urgency', y='total_amount', color='urgency',
+        color_discrete_map=URGENCY_COLORS, text='count'
+    )
+    fig.update_traces(
+        texttemplate='%{text} debt(s)<br>' + label + ' %{y:,.0f}',
+        textposition='outside',
+        textfont_size=11,
+        hovertemplate='<b>%{x}</b><br>Total Amount: ' + label + ' %{y:,.2f}<br>Number of Debts: %{text}<extra></extra>'
+    )
+    fig.update_layout(
+        xaxis_title="",
+        yaxis_title=f"Total Amount ({label})",
+        showlegend=False,
+        height=400,
+        margin=dict(t=20, l=10, r=10, b=80),
+        xaxis_tickangle=-45,
+        xaxis=dict(tickfont=dict(size=11))
+    )
+    return fig
+
+def format_amount(amount: float, currency: str = "MYR") -> str:
+    """Treemap label: fewer decimals for larger amounts"""
+    label = currency_label(currency)
+    if amount >= 1000: return f"{label} {amount:,.0f}"
+    elif amount >= 1: return f"{label} {amount:.2f}"
+    else: return f"{label} {amount:.4f}"
+
+@cached_figure
+def composition_treemap(agg_df: pd.DataFrame, currency: str = "MYR") -> go.Figure:
+    """Treemap of amounts by display status, then company"""
+    agg_df = agg_df.assign(amount_text=agg_df['amount_owed'].apply(format_amount, currency=currency))
+    fig = px.treemap(
+        agg_df,
+        path=[px.Constant("All Debts"), 'display_status', 'company_name'],
+        values='amount_owed', color='display_status',
+        color_discrete_map=STATUS_COLORS,
+        custom_data=['amount_text']
+    )
+    fig.update_traces(
+        textposition='middle center',
+        texttemplate='%{label}<br>%{customdata[0]}',
+        hovertemplate='<b>%{label}</b><br>Amount: %{customdata[0]}<br>Category: %{parent}<extra></extra>',
+        marker=dict(line=dict(width=2, color='white')),
+        textfont=dict(size=12)
+    )
+    fig.update_layout(
+        height=500,
+        margin=dict(t=20, l=5, r=5, b=5),
+        uniformtext=dict(minsize=9, mode='hide')
+    )
+    return fig
@@ -0,0 +1,43 @@
+"""
+Money display - amounts labelled with their currency
+Each debt carries its own currency; dashboard totals come from the backend
+already converted to the base currency of its exchange rate table. Totals
+the pages add up themselves are kept per currency, in integer cents.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable
+import streamlit as st
+
+# Labels users know better than the ISO code
+CURRENCY_LABELS = {"MYR": "RM"}
+
+def currency_label(currency: str) -> str:
+    """'RM' for MYR, the ISO code for the rest"""
+    return CURRENCY_LABELS.get(currency, currency)
+
+def format_money(amount: float, currency: str = "MYR") -> str:
+    """'RM 1,250.00', 'USD 35.50'"""
+    return f"{currency_label(currency)} {amount:,.2f}"
+
+def cents_by_currency(debts: Iterable[Dict], field: str = "amount_owed") -> Dict[str, int]:
+    """Exact {currency: cents} totals of an amount field over API debt records"""
+    totals: Dict[str, int] = defaultdict(int)
+    for debt in debts:
+        # Amounts are whole cents, so rounding only removes float noise
+        totals[debt.get("currency", "MYR")] += round(debt[field] * 100)
+    return totals
+
+def format_totals(totals: Dict[str, int], base: str = "MYR") -> str:
+    """Per-currency cent totals, base currency first: 'RM 1,200.00 + USD 35.50'"""
+    currencies = sorted(totals, key=lambda currency: (currency != base, currency))
+    parts = [format_money(totals[currency] / 100, currency) for currency in currencies if totals[currency]]
+    return " + ".join(parts) or format_money(0, base)
+
+def currency_options(api_client) -> Dict:
+    """{"base", "currencies"} from the backend, fetched once per session"""
+    options = st.session_state.get("currency_options")
+    if options is None:
+        options = api_client.get_currencies()
+        if options:
+            st.session_state.currency_options = options
+    return options or {"base": "MYR", "currencies": ["MYR"]}
@@ -0,0 +1,95 @@
+"""
+Rerun timing - how long each stage of a Streamlit rerun takes
+Wrap API calls, DataFrame prep and chart building in `timed(stage, kind)`
+(a context manager that also works as a decorator). Timings for the current
+rerun are kept in session state and shown by perf_panel() in the sidebar
+when PERF_PANEL_ENABLED is set.
+"""
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import streamlit as st
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from core.config import settings
+
+# Stage kinds, in the order a chart goes through them
+FETCH = "fetch"
+TRANSFORM = "transform"
+RENDER = "render"
+
+# Reruns kept for the panel and its JSON lines export
+PERF_HISTORY_SIZE = 50
+
+def start_rerun(page: str, request_id: str = None) -> None:
+    """Begin recording a rerun of page; call once at the top of the script run
+
+    request_id is the X-Request-ID the page's API calls carry, so a slow rerun
+    can be matched with the API's log lines.
+    """
+    if not settings.PERF_PANEL_ENABLED:
+        return
+    st.session_state._perf_rerun = {
+        "page": page,
+        "request_id": request_id,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "stages": [],
+        "_start": time.perf_counter()
+    }
+
+@contextmanager
+def timed(stage: str, kind: str = TRANSFORM):
+    """Record the time spent in a block (or decorated function) as one stage"""
+    rerun = st.session_state.get("_perf_rerun") if settings.PERF_PANEL_ENABLED else None
+    if rerun is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        rerun["stages"].append({
+            "stage": stage,
+            "kind": kind,
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        })
+
+def finish_rerun() -> dict:
+    """Close the current rerun and add it to the history"""
+    rerun = st.session_state.pop("_perf_rerun")
+    rerun["total_ms"] = round((time.perf_counter() - rerun.pop("_start")) * 1000, 2)
+    history = st.session_state.setdefault("_perf_history", [])
+    history.append(rerun)
+    del history[:-PERF_HISTORY_SIZE]
+    if settings.PERF_LOG_PATH:
+        with open(settings.PERF_LOG_PATH, "a", encoding="utf-8") as log:
+            log.write(json.dumps(rerun) + "\n")
+    return rerun
+
+def perf_panel() -> None:
+    """Collapsible sidebar panel with this rerun's stage timings"""
+    if not settings.PERF_PANEL_ENABLED or "_perf_rerun" not in st.session_state:
+        return
+    rerun = finish_rerun()
+    with st.sidebar.expander(f"⏱️ Performance ({rerun['total_ms']:.0f} ms)"):
+        if rerun["stages"]:
+            st.dataframe(rerun["stages"], use_container_width=True, hide_index=True)
+            by_kind = {}
+            for stage in rerun["stages"]:
+                by_kind[stage["kind"]] = by_kind.get(stage["kind"], 0) + stage["ms"]
+            st.caption(" · ".join(f"{kind}: {ms:.0f} ms" for kind, ms in by_kind.items()))
+        if rerun.get("request_id"):
+            st.caption(f"Request ID: `{rerun['request_id']}`")
+        history = st.session_state._perf_history
+        st.download_button(
+            "Export timings (JSON lines)",
+            "\n".join(json.dumps(entry) for entry in history) + "\n",
+            file_name="hutangku-perf.jsonl",
+            mime="application/jsonl",
+            use_container_width=True
+        )
+        st.caption(f"Last {len(history)} rerun(s) in this session.")
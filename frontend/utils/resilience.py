@@ -0,0 +1,164 @@
+"""
+API resilience - circuit breakers, adaptive timeouts and stale responses
+Pages build a new APIClient on every rerun, so this state lives at module level
+and is shared by all sessions of the Streamlit process.
+
+Every API route ("GET /debts/trends") has an EndpointHealth. Its read timeout
+follows the route's recent latency the way TCP's retransmission timeout does
+(smoothed latency plus four deviations, doubled after each timeout) between
+API_MIN_TIMEOUT_SECONDS and API_TIMEOUT_SECONDS. After API_BREAKER_FAILURES
+failures in a row its breaker opens: calls fail at once instead of each waiting
+out a timeout, and one trial call is let through every
+API_BREAKER_COOLDOWN_SECONDS until one succeeds.
+
+Successful GET responses are kept in stale_responses, so a failing route can
+be answered with its last good response while refresher fetches a new one.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import requests
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from core.config import settings
+
+# Last good responses kept across all sessions and routes
+STALE_CACHE_SIZE = 256
+# Background refreshes running at once
+REFRESH_WORKERS = 2
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling a route whose breaker is open"""
+
+
+class EndpointHealth:
+    """Latency and failure tracking for one API route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.failures = 0
+        # Set while the breaker is open: when it opened or last let a trial through
+        self.opened_at: Optional[float] = None
+        # Smoothed latency and its mean deviation, in seconds
+        self.latency: Optional[float] = None
+        self.deviation = 0.0
+        self.backoff = 1
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def timeout(self) -> float:
+        """Read timeout for the next call (the longest until latency has been seen)"""
+        with self._lock:
+            if self.latency is None:
+                return settings.API_TIMEOUT_SECONDS
+            timeout = (self.latency + 4 * self.deviation) * self.backoff
+        return min(max(timeout, settings.API_MIN_TIMEOUT_SECONDS), settings.API_TIMEOUT_SECONDS)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; an open breaker lets one through per cooldown"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < settings.API_BREAKER_COOLDOWN_SECONDS:
+                return False
+            # This call is the trial; the next one waits for another cooldown
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self, seconds: float) -> None:
+        """The route answered (any status below 500) after seconds"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.backoff = 1
+            if self.latency is None:
+                self.latency, self.deviation = seconds, seconds / 2
+            else:
+                self.deviation = 0.75 * self.deviation + 0.25 * abs(self.latency - seconds)
+                self.latency = 0.875 * self.latency + 0.125 * seconds
+
+    def record_failure(self, timed_out: bool = False) -> None:
+        """The route could not be reached, timed out or answered with a 5xx"""
+        with self._lock:
+            self.failures += 1
+            if timed_out:
+                self.backoff = min(self.backoff * 2, 64)
+            if self.opened_at is not None or self.failures >= settings.API_BREAKER_FAILURES:
+                self.opened_at = time.monotonic()
+
+
+_health: Dict[str, EndpointHealth] = {}
+_health_lock = threading.Lock()
+
+def endpoint_health(route: str) -> EndpointHealth:
+    """The shared EndpointHealth of a route such as "GET /debts/{id}\""""
+    with _health_lock:
+        health = _health.get(route)
+        if health is None:
+            health = _health[route] = EndpointHealth()
+        return health
+
+
+class StaleCache:
+    """Last good response per request, the least recently stored dropped first"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: "OrderedDict[Hashable, Tuple[requests.Response, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[requests.Response, float]]:
+        """(response, age in seconds), or None if missing or older than API_STALE_MAX_AGE_SECONDS"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, stored_at = entry
+        age = time.time() - stored_at
+        if age > settings.API_STALE_MAX_AGE_SECONDS:
+            return None
+        return response, age
+
+    def put(self, key: Hashable, response: requests.Response) -> None:
+        with self._lock:
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+class BackgroundRefresher:
+    """Runs refreshes off the page's thread, at most one per key at a time"""
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-refresh")
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, refresh: Callable[[], None]) -> None:
+        """Start refresh unless one for key is already queued or running"""
+        with self._lock:
+            if key in self._running:
+                return
+            self._running.add(key)
+
+        def run():
+            try:
+                refresh()
+            finally:
+                with self._lock:
+                    self._running.discard(key)
+
+        self._executor.submit(run)
+
+
+stale_responses = StaleCache(STALE_CACHE_SIZE)
+refresher = BackgroundRefresher(REFRESH_WORKERS)
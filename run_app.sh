@@ -1,5 +1,12 @@
 #!/bin/bash
 
+# Usage: ./run_app.sh          development (auto-reload on code changes)
+#        ./run_app.sh --prod   production (API_WORKERS processes, no reloader)
+MODE="dev"
+if [ "$1" == "--prod" ]; then
+    MODE="prod"
+fi
+
 echo "🚀 Starting HutangKu - Debt Management..."
 echo ""
 
@@ -29,13 +36,17 @@ if ! pgrep -x "mongod" > /dev/null; then
     echo ""
 fi
 
-echo "🔧 Starting Backend (FastAPI on port 8000)..."
+echo "🔧 Starting Backend (FastAPI on port 8000, $MODE mode)..."
 echo "   API: http://localhost:8000"
 echo "   Docs: http://localhost:8000/docs"
 echo ""
 
 # Start backend in background
-uvicorn backend.main:app --reload --port 8000 &
+if [ "$MODE" == "prod" ]; then
+    python -m backend.server &
+else
+    uvicorn backend.main:app --reload --port 8000 &
+fi
 BACKEND_PID=$!
 
 # Wait for backend to start and check if it's running
@@ -54,7 +65,8 @@ echo ""
 # Start frontend in foreground
 streamlit run frontend/Dashboard.py
 
-# Cleanup: kill backend when frontend stops
-kill $BACKEND_PID 2>/dev/null
+# Cleanup: stop backend when frontend stops (SIGTERM lets in-flight requests finish)
+kill -TERM $BACKEND_PID 2>/dev/null
+wait $BACKEND_PID 2>/dev/null
 echo ""
 echo "✅ Services stopped"
@@ -0,0 +1,113 @@
+"""
+Profiling overhead benchmark - what request profiling costs per request
+Calls a small ASGI app directly (no HTTP) with profiling off (the middleware
+not installed, as when PROFILING_ENABLED is unset), installed but sampling no
+requests, sampling 1% of requests, and profiling every request. The route
+encodes a page of debts, like GET /debts.
+
+    python scripts/bench_profiling.py
+
+Exits non-zero if installed-but-unsampled profiling adds more than
+--max-overhead percent to the request time.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from fastapi import FastAPI
+from backend import profiling
+from backend.responses import ORJSONResponse
+from core.config import settings
+
+DEBTS = [{
+    "id": f"{i:024x}", "company_name": f"Company {i % 8}", "amount_owed": 100.0 + i,
+    "minimum_payment": 10.0, "currency": "MYR", "due_date": "2026-11-01",
+    "status": "Active Debt", "notes": "", "version": 1,
+} for i in range(100)]
+
+def make_app(profiled: bool):
+    app = FastAPI()
+
+    @app.get("/debts")
+    async def debts():
+        return ORJSONResponse(DEBTS)
+
+    if profiled:
+        app.add_middleware(profiling.ProfilingMiddleware)
+    return app
+
+async def call(app, headers) -> None:
+    """One GET /debts straight through the ASGI interface"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/debts", "raw_path": b"/debts", "root_path": "", "query_string": b"",
+        "headers": headers, "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 8000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+async def time_us(app, headers, sample_rate: float, requests: int) -> float:
+    """Mean microseconds per request over one batch"""
+    settings.PROFILE_SAMPLE_RATE = sample_rate
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app, headers)
+    return (time.perf_counter() - started) / requests * 1e6
+
+async def run(args) -> int:
+    plain, profiled = make_app(False), make_app(True)
+    settings.PROFILING_TOKEN = "bench"
+    opted_in = [(profiling.PROFILE_HEADER, b"1"), (profiling.PROFILE_TOKEN_HEADER, b"bench")]
+    setups = {
+        "off": (plain, [], 0.0),
+        "on, unsampled": (profiled, [], 0.0),
+        "on, 1% sampled": (profiled, [], 0.01),
+        "on, every request": (profiled, opted_in, 0.0),
+    }
+    for app, headers, rate in setups.values():
+        await time_us(app, headers, rate, 50)  # warm up
+    # Batches of each setup are interleaved in a shuffled order so drift and
+    # noise affect them all alike; like timeit, the fastest batch is reported
+    timings = {name: [] for name in setups}
+    order = list(setups)
+    rng = random.Random(0)
+    for _ in range(args.repeat):
+        rng.shuffle(order)
+        for name in order:
+            app, headers, rate = setups[name]
+            timings[name].append(await time_us(app, headers, rate, args.requests))
+            profiling.recent_profiles.clear()
+
+    print(f"{args.requests} requests x {args.repeat} batches (fastest batch, per request)")
+    print(f"{'setup':>18} {'us':>9} {'overhead':>9}")
+    best = {name: min(values) for name, values in timings.items()}
+    baseline = best["off"]
+    for name, us in best.items():
+        print(f"{name:>18} {us:>9.1f} {(us / baseline - 1) * 100:>8.1f}%")
+
+    overhead = (best["on, unsampled"] / baseline - 1) * 100
+    if overhead > args.max_overhead:
+        print(f"FAIL: unsampled profiling added {overhead:.1f}% (limit {args.max_overhead}%)")
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per batch")
+    parser.add_argument("--repeat", type=int, default=15, help="Batches per setup")
+    parser.add_argument("--max-overhead", type=float, default=10.0, help="Allowed unsampled overhead, percent (timings vary by a few percent run to run)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
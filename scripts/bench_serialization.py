@@ -0,0 +1,89 @@
+"""
+Serialization benchmark - encoding a large GET /debts response
+Times the ways the API can encode a list of debts: FastAPI's default
+response_model path (validate every item, jsonable_encoder, json.dumps), the
+orjson fast path GET /debts uses, and the Arrow IPC export.
+
+    python scripts/bench_serialization.py --debts 10000
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from backend.models.debt_schema import DebtResponse
+from backend.money import to_cents
+from backend.responses import ORJSONResponse, debts_to_arrow
+
+def make_debts(count: int) -> List[dict]:
+    """Debt rows shaped like storage returns them"""
+    rng = random.Random(0)
+    return [{
+        "id": f"{i:024x}",
+        "company_name": f"Company {i % 40}",
+        "amount_owed": rng.randint(100, 10_000_000) / 100,
+        "minimum_payment": rng.randint(100, 50_000) / 100,
+        "currency": rng.choice(["MYR", "MYR", "MYR", "USD", "SGD"]),
+        "due_date": (date(2026, 1, 1) + timedelta(days=i % 365)).isoformat(),
+        "status": "Paid Off" if i % 5 == 0 else "Active Debt",
+        "notes": f"account {rng.randint(100000, 999999)}" if i % 3 else "",
+        "version": 1 + i % 7,
+    } for i in range(count)]
+
+def response_model_path(debts: List[dict]) -> bytes:
+    """What FastAPI does with response_model=List[DebtResponse] and a plain list"""
+    adapter = TypeAdapter(List[DebtResponse])
+    content = jsonable_encoder(adapter.dump_python(adapter.validate_python(debts), mode="json"))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def orjson_path(debts: List[dict]) -> bytes:
+    """GET /debts: the rows already match the schema, so they are encoded as they are"""
+    return ORJSONResponse(debts).body
+
+def arrow_path(debts: List[dict]) -> bytes:
+    """GET /debts?format=arrow, whose rows also carry the stored integer cents"""
+    return debts_to_arrow(debts)
+
+def time_ms(encode, debts: List[dict], repeat: int):
+    """(median milliseconds, encoded size) over repeat runs"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encoded = encode(debts)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(encoded)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--debts", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    debts = make_debts(args.debts)
+    export_rows = [{
+        **debt, "amount_owed_cents": to_cents(debt["amount_owed"]), "minimum_payment_cents": to_cents(debt["minimum_payment"])
+    } for debt in debts]
+    # Both JSON paths must agree before their speed means anything
+    assert orjson.loads(orjson_path(debts)) == json.loads(response_model_path(debts))
+
+    print(f"{args.debts} debts, median of {args.repeat} runs")
+    print(f"{'path':>16} {'ms':>9} {'KiB':>8} {'speedup':>8}")
+    baseline = None
+    for name, encode, rows in (
+        ("response_model", response_model_path, debts), ("orjson", orjson_path, debts), ("arrow", arrow_path, export_rows)
+    ):
+        ms, size = time_ms(encode, rows, args.repeat)
+        baseline = baseline or ms
+        print(f"{name:>16} {ms:>9.1f} {size / 1024:>8.0f} {baseline / ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Worker scaling benchmark - API throughput for increasing API_WORKERS
+Starts the production server (python -m backend.server) once per worker count
+on a throwaway SQLite database, seeds it, then drives GET /debts from several
+client processes over keep-alive connections and reports requests per second.
+
+    python scripts/bench_workers.py --workers 1 2 4 --seconds 10
+
+Client processes compete with the server for cores, so run it on a machine
+with more cores than the largest worker count (or point --clients lower).
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+from backend.auth import issue_token
+from core.config import settings
+
+def wait_until_up(port: int, timeout: float = 30.0) -> None:
+    """Poll /health until the server answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+def seed(port: int, debts: int, headers: dict) -> None:
+    """Create debts spread over a handful of companies"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    for i in range(debts):
+        body = json.dumps({
+            "company_name": f"Company {i % 12}",
+            "amount_owed": 100 + i,
+            "minimum_payment": 10,
+            "due_date": f"2030-01-{i % 28 + 1:02d}"
+        })
+        conn.request("POST", "/debts", body, {**headers, "Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 201:
+            raise RuntimeError(f"Seeding failed: {response.status}")
+
+def client(port: int, path: str, seconds: float, headers: dict, results) -> None:
+    """One client process: request path back to back until time is up"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        done += 1
+    results.put(done)
+
+def run(workers: int, args) -> float:
+    """Requests per second with the given number of server workers"""
+    # Throwaway credentials: the server only accepts tokens signed with its secret
+    settings.AUTH_SECRET = secrets.token_urlsafe(32)
+    headers = {"Authorization": f"Bearer {issue_token('bench')}"}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            AUTH_SECRET=settings.AUTH_SECRET,
+            STORAGE_BACKEND="sqlite",
+            SQLITE_PATH=str(Path(tmp) / "bench.db"),
+            API_PORT=str(args.port),
+            API_WORKERS=str(workers),
+            ARCHIVE_SWEEP_MINUTES="0",
+            WRITE_RATE_PER_SECOND="0",
+            PROFILING_ENABLED="false",
+            DEBUG_MODE="false"
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "backend.server"], cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_up(args.port)
+            seed(args.port, args.debts, headers)
+            results = multiprocessing.Queue()
+            clients = [
+                multiprocessing.Process(target=client, args=(args.port, args.path, args.seconds, headers, results))
+                for _ in range(args.clients)
+            ]
+            for process in clients:
+                process.start()
+            total = sum(results.get() for _ in clients)
+            for process in clients:
+                process.join()
+            return total / args.seconds
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client processes")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measurement time per worker count")
+    parser.add_argument("--debts", type=int, default=200, help="Debts seeded before measuring")
+    parser.add_argument("--path", default="/debts", help="Endpoint to request")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores, {args.clients} clients, GET {args.path} with {args.debts} debts")
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        rate = run(workers, args)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Import check - a 50k-row CSV import finishes in seconds with flat memory
+Writes a CSV with --rows rows (mixed-case company names and a few invalid
+rows) to a temporary file, imports it through the same streaming path as
+POST /debts/import into a throwaway database, then verifies the report and
+the stored data. The import is also run for a tenth of the rows, and Python's
+peak traced memory for both sizes is compared: a streaming import should need
+about the same memory for ten times the rows.
+
+    python scripts/check_import.py                      # SQLite in a temporary file
+    python scripts/check_import.py --backend mongodb    # MONGODB_URI, throwaway database
+
+Exits non-zero if any check fails.
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from core.config import settings
+from backend.database import storage as storage_module
+from backend.importer import import_debts, iter_csv_rows
+
+COMPANIES = ["Maybank", "CIMB", "Atome", "Boost", "Grab PayLater", "Shopee PayLater", "Touch 'n Go", "AEON"]
+# Every INVALID_EVERY-th row has an amount that cannot be parsed
+INVALID_EVERY = 1000
+
+def write_csv(path: Path, rows: int) -> int:
+    """Write the test CSV, returning the expected total of valid amount_owed cents"""
+    total_cents = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("company_name,amount_owed,minimum_payment,due_date,currency,notes\n")
+        for i in range(1, rows + 1):
+            company = COMPANIES[i % len(COMPANIES)]
+            # The same company in three spellings resolves to one catalog entry
+            company = (company, company.upper(), company.lower())[i % 3]
+            cents = 1000 + i
+            amount = "n/a" if i % INVALID_EVERY == 0 else f"{cents // 100}.{cents % 100:02d}"
+            if i % INVALID_EVERY:
+                total_cents += cents
+            f.write(f"{company},{amount},10.00,2027-{i % 12 + 1:02d}-{i % 28 + 1:02d},MYR,row {i}\n")
+    return total_cents
+
+async def import_file(path: Path, user_id: str, trace_memory: bool = False):
+    """(report, seconds, peak traced MiB or None) for importing path as user_id"""
+    storage = storage_module.get_storage()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        report = await import_debts(storage, user_id, iter_csv_rows(f))
+    seconds = time.perf_counter() - started
+    if not trace_memory:
+        return report, seconds, None
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return report, seconds, peak / 2**20
+
+async def run(args, tmp: Path) -> int:
+    storage = storage_module.get_storage()
+    await storage.ensure_indexes()
+    failures = []
+
+    def check(condition: bool, message: str):
+        print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    try:
+        peaks = {}
+        for rows in (args.rows // 10, args.rows):
+            path = tmp / f"import_{rows}.csv"
+            expected_cents = write_csv(path, rows)
+            user_id = f"import-{rows}"
+            # Tracing allocations slows Python down several times, so the timed
+            # import runs untraced into a second user
+            report, seconds, _peak = await import_file(path, user_id)
+            _report, _seconds, peaks[rows] = await import_file(path, f"{user_id}-traced", trace_memory=True)
+            invalid = rows // INVALID_EVERY
+            print(f"{rows} rows: {report['imported']} imported, {report['failed']} failed in {seconds:.1f}s "
+                  f"({rows / seconds:,.0f} rows/s), peak {peaks[rows]:.1f} MiB")
+            check(report["imported"] == rows - invalid, f"imported {rows - invalid} valid rows")
+            check(report["failed"] == invalid, f"reported {invalid} invalid rows")
+            check(report["companies_added"] == len(COMPANIES), f"added {len(COMPANIES)} companies (one per spelling group)")
+            check(len(await storage.get_all_companies(user_id)) == len(COMPANIES), "catalog has no case duplicates")
+            debts = await storage.get_all_debts(user_id, with_cents=True)
+            check(len(debts) == rows - invalid, "every imported row is stored")
+            check(sum(debt["amount_owed_cents"] for debt in debts) == expected_cents, "stored amounts are exact")
+            if rows == args.rows:
+                check(seconds <= args.max_seconds, f"finished within {args.max_seconds:.0f}s")
+        small, large = peaks[args.rows // 10], peaks[args.rows]
+        check(large <= small * args.max_memory_growth,
+              f"peak memory for 10x the rows grew {large / small:.1f}x (limit {args.max_memory_growth}x)")
+    finally:
+        if settings.STORAGE_BACKEND == "mongodb":
+            from backend.database.connection import get_client
+            await get_client().drop_database(settings.MONGODB_DB_NAME)
+        await storage.close()
+    return 1 if failures else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "mongodb"], default="sqlite")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--max-seconds", type=float, default=20.0, help="Time allowed for the full import")
+    parser.add_argument("--max-memory-growth", type=float, default=2.0,
+                        help="Allowed peak memory ratio between --rows and a tenth of it")
+    args = parser.parse_args()
+
+    settings.STORAGE_BACKEND = args.backend
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.SQLITE_PATH = str(Path(tmp) / "check_import.db")
+        settings.MONGODB_DB_NAME = f"check_import_{uuid.uuid4().hex[:8]}"
+        sys.exit(asyncio.run(run(args, Path(tmp))))
+
+if __name__ == "__main__":
+    main()
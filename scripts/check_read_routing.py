@@ -0,0 +1,108 @@
+"""
+Read routing check - which replica set member serves each storage call
+Runs the MongoDB storage calls behind the API against MONGODB_URI and
+reports, per call, whether its commands went to the primary or a secondary.
+Analytical reads should land on secondaries; writes and the reads that must
+see them on the primary. Exits non-zero if any call went to the wrong member.
+
+A three-member replica set on one machine is enough to try it:
+
+    mkdir -p data/rs/0 data/rs/1 data/rs/2
+    for i in 0 1 2; do
+        mongod --replSet rs0 --port 2702$i --dbpath data/rs/$i --fork --logpath data/rs/$i.log
+    done
+    mongosh --port 27020 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27020"}, {_id: 1, host: "localhost:27021"}, {_id: 2, host: "localhost:27022"}]})'
+
+    MONGODB_URI="mongodb://localhost:27020,localhost:27021,localhost:27022/?replicaSet=rs0" \\
+        MONGODB_DB_NAME=routing_check python scripts/check_read_routing.py
+"""
+import asyncio
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from pymongo import monitoring
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from backend.database import crud_db
+from backend.database.connection import close_client, get_client, get_database
+from backend.database.history import utc_now
+from core.config import settings
+
+USER_ID = "routing-check"
+
+class CommandRecorder(monitoring.CommandListener):
+    """Remembers the server address of every command started"""
+
+    def __init__(self):
+        self.addresses = []
+
+    def started(self, event):
+        self.addresses.append(event.connection_id)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def check(recorder: CommandRecorder) -> bool:
+    client = get_client()
+    # Wait for server discovery so client.primary/secondaries are known
+    await client.admin.command("ping")
+    primary = client.primary
+    secondaries = client.secondaries
+    print(f"primary {primary}, secondaries {sorted(secondaries)}")
+    if not secondaries:
+        print("No secondaries: analytical reads fall back to the primary (secondaryPreferred).")
+
+    today = date.today()
+    now = utc_now()
+    # (label, call, expected: "primary" or "secondary")
+    calls = [
+        ("create_debt", lambda: crud_db.create_debt(USER_ID, {
+            "company_name": "Routing Check", "amount_owed": 10.0, "minimum_payment": 1.0, "currency": "MYR",
+            "due_date": today.isoformat(), "status": "Active Debt", "notes": ""
+        }), "primary"),
+        ("get_all_debts", lambda: crud_db.get_all_debts(USER_ID), "primary"),
+        ("get_all_debts(stale_ok)", lambda: crud_db.get_all_debts(USER_ID, stale_ok=True), "secondary"),
+        ("search_debts", lambda: crud_db.search_debts(USER_ID, "routing"), "secondary"),
+        ("get_debt_composition", lambda: crud_db.get_debt_composition(USER_ID, today), "secondary"),
+        ("get_rollup_buckets", lambda: crud_db.get_rollup_buckets(USER_ID, today - timedelta(days=30), today), "secondary"),
+        ("get_state_as_of", lambda: crud_db.get_state_as_of(USER_ID, now), "secondary"),
+        ("get_events", lambda: crud_db.get_events(USER_ID, now - timedelta(days=1), now), "secondary"),
+        ("get_archived_debts", lambda: crud_db.get_archived_debts(USER_ID), "secondary"),
+    ]
+
+    ok = True
+    print(f"{'call':<26} {'served by':<32} expected")
+    for label, call, expected in calls:
+        recorder.addresses.clear()
+        await call()
+        members = sorted({"primary" if address == primary else "secondary" for address in recorder.addresses})
+        served = ", ".join(members)
+        wrong = expected == "primary" and members != ["primary"]
+        wrong = wrong or (expected == "secondary" and secondaries and "primary" in members)
+        ok = ok and not wrong
+        print(f"{label:<26} {served:<32} {expected}{'   <-- WRONG' if wrong else ''}")
+
+    for name in (settings.MONGODB_COLLECTION, "debt_events", "debt_rollups", "debt_snapshots"):
+        await get_database()[name].delete_many({"user_id": USER_ID})
+    return ok
+
+def main():
+    recorder = CommandRecorder()
+    # Registered listeners apply to clients created afterwards
+    monitoring.register(recorder)
+    print(f"{settings.MONGODB_URI} / {settings.MONGODB_DB_NAME}: "
+          f"analytics {settings.MONGODB_ANALYTICS_READ_PREFERENCE}, "
+          f"max staleness {settings.MONGODB_ANALYTICS_MAX_STALENESS_SECONDS}s")
+    try:
+        ok = asyncio.run(check(recorder))
+    finally:
+        close_client()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Tenant scaling load test - per-user latency as the number of users grows
+Seeds a throwaway database with --debts debts for each of an increasing number
+of users (10, 100, 1000, 10000 by default), and after each step times the
+storage calls behind the dashboard for a random sample of users. Every query
+leads on user_id, so a user's latency should stay flat however many other
+users share the database; the script exits non-zero if the median latency of
+any call grows more than --max-growth times from the first step to the last.
+
+    python scripts/load_tenants.py                       # SQLite in a temporary file
+    python scripts/load_tenants.py --backend mongodb     # MONGODB_URI, throwaway database
+
+Timings cover the storage layer only (no HTTP), so they isolate the database
+work that grows with tenant count.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from core.config import settings
+from backend.database.storage import get_storage
+
+COMPANIES = ["Atome", "Boost", "CIMB", "Grab PayLater", "Maybank", "Shopee PayLater", "SPayLater", "Touch 'n Go"]
+
+def tenant(index: int) -> str:
+    return f"tenant-{index:05d}"
+
+def debts_for(index: int, count: int) -> list:
+    """count debts for one tenant, a quarter of them paid off"""
+    rng = random.Random(index)
+    return [{
+        "company_name": rng.choice(COMPANIES),
+        "amount_owed": rng.randint(1000, 500000) / 100,
+        "minimum_payment": rng.randint(100, 5000) / 100,
+        "currency": "MYR",
+        "due_date": (date(2030, 1, 1) + timedelta(days=rng.randint(0, 365))).isoformat(),
+        "status": "Paid Off" if i % 4 == 0 else "Active Debt",
+        "notes": f"account {rng.randint(100000, 999999)}",
+    } for i in range(count)]
+
+def calls(storage, user_id: str) -> dict:
+    """The timed storage calls for one user, by name"""
+    today = date.today()
+    return {
+        "debts": lambda: storage.get_all_debts(user_id),
+        "active": lambda: storage.get_all_debts(user_id, status="Active Debt"),
+        "composition": lambda: storage.get_debt_composition(user_id, today),
+        "rollups": lambda: storage.get_rollup_buckets(user_id, today - timedelta(days=89), today),
+        "archive": lambda: storage.get_archived_debts(user_id),
+    }
+
+async def measure(storage, users: list, repeat: int) -> dict:
+    """Median and 95th percentile milliseconds per call over the sampled users"""
+    timings = {}
+    for user_id in users:
+        for name, call in calls(storage, user_id).items():
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await call()
+                timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+    return {
+        name: (statistics.median(values), statistics.quantiles(values, n=20)[-1])
+        for name, values in timings.items()
+    }
+
+async def run(args) -> int:
+    storage = get_storage()
+    await storage.ensure_indexes()
+    names = list(calls(storage, "").keys())
+    print(f"{settings.STORAGE_BACKEND} backend, {args.debts} debts per tenant, "
+          f"{args.sample} sampled tenants x {args.repeat} calls (median / p95 ms)")
+    print(f"{'tenants':>8} " + " ".join(f"{name:>18}" for name in names))
+
+    results = {}
+    seeded = 0
+    try:
+        for tenants in sorted(args.tenants):
+            for index in range(seeded, tenants):
+                await storage.insert_debts(tenant(index), debts_for(index, args.debts), checkpoint=False)
+            seeded = tenants
+            sample = random.Random(tenants).sample(range(tenants), min(args.sample, tenants))
+            results[tenants] = await measure(storage, [tenant(index) for index in sample], args.repeat)
+            print(f"{tenants:>8} " + " ".join(
+                f"{results[tenants][name][0]:>8.2f} / {results[tenants][name][1]:>7.2f}" for name in names
+            ))
+    finally:
+        if settings.STORAGE_BACKEND == "mongodb":
+            from backend.database.connection import get_client
+            await get_client().drop_database(settings.MONGODB_DB_NAME)
+        await storage.close()
+
+    first, last = results[min(results)], results[max(results)]
+    growth = {name: last[name][0] / first[name][0] for name in names}
+    print("median growth: " + ", ".join(f"{name} {ratio:.2f}x" for name, ratio in growth.items()))
+    too_slow = [name for name, ratio in growth.items() if ratio > args.max_growth]
+    if too_slow:
+        print(f"FAIL: {', '.join(too_slow)} grew more than {args.max_growth}x")
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "mongodb"], default="sqlite")
+    parser.add_argument("--tenants", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--debts", type=int, default=20, help="Debts per tenant")
+    parser.add_argument("--sample", type=int, default=50, help="Tenants timed after each step")
+    parser.add_argument("--repeat", type=int, default=5, help="Calls per sampled tenant")
+    parser.add_argument("--max-growth", type=float, default=3.0, help="Largest allowed median latency growth")
+    args = parser.parse_args()
+
+    settings.STORAGE_BACKEND = args.backend
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.SQLITE_PATH = str(Path(tmp) / "load_tenants.db")
+        settings.MONGODB_DB_NAME = f"load_tenants_{uuid.uuid4().hex[:8]}"
+        sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,39 @@ pip install --upgrade pip
 echo "📥 Installing dependencies..."
 pip install -r requirements.txt
 
+# The API refuses every request without AUTH_SECRET; create one and a token
+# for the frontend in .env unless they are already set
+echo "🔑 Checking API credentials..."
+python - <<'EOF'
+import secrets
+from pathlib import Path
+
+env = Path(".env")
+lines = env.read_text().splitlines() if env.exists() else []
+values = dict(line.split("=", 1) for line in lines if "=" in line and not line.lstrip().startswith("#"))
+
+def put(key, value):
+    for i, line in enumerate(lines):
+        if line.startswith(f"{key}="):
+            lines[i] = f"{key}={value}"
+            return
+    lines.append(f"{key}={value}")
+
+from core.config import settings
+from backend.auth import issue_token
+
+new_secret = not values.get("AUTH_SECRET")
+settings.AUTH_SECRET = secrets.token_urlsafe(32) if new_secret else values["AUTH_SECRET"]
+if new_secret:
+    put("AUTH_SECRET", settings.AUTH_SECRET)
+if new_secret or not values.get("API_TOKEN"):
+    put("API_TOKEN", issue_token(values.get("DEFAULT_USER_ID") or settings.DEFAULT_USER_ID))
+    env.write_text("\n".join(lines) + "\n")
+    print("✅ Wrote AUTH_SECRET and API_TOKEN to .env")
+else:
+    print("✅ API credentials already set")
+EOF
+
 echo ""
 echo "✅ Setup complete!"
 echo ""
@@ -0,0 +1,87 @@
+"""
+Shared test fixtures
+Storage tests run against every backend: MongoDB through mongomock (or a real
+server when TEST_MONGODB_URI is set) and SQLite in a temporary file.
+"""
+import asyncio
+import inspect
+import os
+import sys
+import uuid
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.config import settings
+from backend.auth import issue_token
+from backend.database import connection, storage as storage_module
+
+# A real MongoDB for the tests that mongomock cannot run (text search, read routing)
+TEST_MONGODB_URI = os.getenv("TEST_MONGODB_URI", "")
+TEST_AUTH_SECRET = "test-secret"
+# User the client fixture sends requests as
+API_USER = "alice"
+
+def auth_headers(user_id: str) -> dict:
+    """Authorization header with a valid token for user_id"""
+    return {"Authorization": f"Bearer {issue_token(user_id)}"}
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Run async def tests on a fresh event loop"""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**arguments))
+    return True
+
+
+def use_mongodb(monkeypatch) -> bool:
+    """Point the MongoDB backend at a fresh database; True if it is mongomock"""
+    monkeypatch.setattr(settings, "MONGODB_DB_NAME", f"test_{uuid.uuid4().hex[:12]}")
+    monkeypatch.setattr(connection, "_client", None)
+    if TEST_MONGODB_URI:
+        monkeypatch.setattr(settings, "MONGODB_URI", TEST_MONGODB_URI)
+        return False
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    monkeypatch.setattr(connection, "AsyncIOMotorClient", lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient())
+    return True
+
+
+@pytest.fixture(params=["mongodb", "sqlite"])
+def storage(request, monkeypatch, tmp_path):
+    """An empty storage backend with its indexes created, installed as get_storage()'s backend"""
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", request.param)
+    monkeypatch.setattr(settings, "SQLITE_PATH", str(tmp_path / "hutangku.db"))
+    mock = request.param == "mongodb" and use_mongodb(monkeypatch)
+    monkeypatch.setattr(storage_module, "_storage", None)
+
+    backend = storage_module.get_storage()
+    backend.is_mongomock = mock
+    asyncio.run(backend.ensure_indexes())
+    yield backend
+    if request.param == "mongodb" and not mock:
+        asyncio.run(connection.get_client().drop_database(settings.MONGODB_DB_NAME))
+    asyncio.run(backend.close())
+
+
+@pytest.fixture(autouse=True)
+def auth_secret(monkeypatch):
+    """Tokens in every test are signed with TEST_AUTH_SECRET"""
+    monkeypatch.setattr(settings, "AUTH_SECRET", TEST_AUTH_SECRET)
+
+
+@pytest.fixture
+def client(storage, monkeypatch):
+    """API test client on the storage fixture's backend, authenticated as API_USER"""
+    from fastapi.testclient import TestClient
+    from backend.jobs import job_runner
+    from backend.main import app
+    # No background sweeps or rate limits to interfere with the test's own requests
+    monkeypatch.setattr(settings, "ARCHIVE_SWEEP_MINUTES", 0)
+    monkeypatch.setattr(settings, "RECURRING_SWEEP_MINUTES", 0)
+    monkeypatch.setattr(settings, "WRITE_RATE_PER_SECOND", 0)
+    # Each TestClient runs its own event loop, and a queue is bound to the first loop that uses it
+    monkeypatch.setattr(job_runner, "queue", asyncio.Queue())
+    with TestClient(app, headers=auth_headers(API_USER)) as test_client:
+        yield test_client
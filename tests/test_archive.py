@@ -0,0 +1,75 @@
+"""
+Archive and soft delete - paid-off debts move to a read-only archive tier
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from backend.database.storage import DebtArchived
+
+DEBT = {"company_name": "Atome", "amount_owed": 10.5, "minimum_payment": 1, "due_date": "2026-11-01"}
+
+
+def archive_now(storage) -> int:
+    """Run the archive sweep with a cutoff just in the future"""
+    return asyncio.run(storage.archive_paid_debts(datetime.now(timezone.utc) + timedelta(minutes=1)))
+
+
+def create_archived_debt(client, storage) -> dict:
+    debt = client.post("/debts", json=DEBT).json()
+    client.put(f"/debts/{debt['id']}", json={"status": "Paid Off"})
+    assert archive_now(storage) == 1
+    return debt
+
+
+def test_archived_debts_are_read_only(client, storage):
+    debt = create_archived_debt(client, storage)
+    fetched = client.get(f"/debts/{debt['id']}")
+    assert fetched.status_code == 200
+    assert fetched.json()["status"] == "Paid Off"
+
+    for response in (
+        client.put(f"/debts/{debt['id']}", json={"notes": "edited"}),
+        client.put(f"/debts/{debt['id']}", json={"notes": "edited"}, headers={"If-Match": fetched.headers["etag"]}),
+        client.patch(f"/debts/{debt['id']}", content='{"notes": "edited"}',
+                     headers={"Content-Type": "application/merge-patch+json"}),
+    ):
+        assert response.status_code == 409
+        assert response.headers["x-debt-archived"] == "true"
+        assert "archived" in response.json()["detail"]
+    assert client.get(f"/debts/{debt['id']}").json()["notes"] == ""
+
+
+async def test_storage_refuses_archived_writes(storage):
+    debt = await storage.create_debt("alice", {**DEBT, "currency": "MYR", "status": "Paid Off", "notes": ""})
+    await storage.archive_paid_debts(datetime.now(timezone.utc) + timedelta(minutes=1))
+    with pytest.raises(DebtArchived):
+        await storage.update_debt("alice", debt["id"], {"notes": "edited"})
+    with pytest.raises(DebtArchived):
+        await storage.patch_debt("alice", debt["id"], {"notes": "edited"})
+    # Other users still just get "not found"
+    assert await storage.update_debt("bob", debt["id"], {"notes": "edited"}) is None
+
+
+def test_archived_debts_can_be_deleted(client, storage):
+    debt = create_archived_debt(client, storage)
+    assert client.get("/debts/archive").json()["total"] == 1
+    assert client.delete(f"/debts/{debt['id']}").status_code == 200
+    assert client.get(f"/debts/{debt['id']}").status_code == 404
+    assert client.get("/debts/archive").json()["total"] == 0
+
+
+def test_soft_deleted_debts_disappear_everywhere(client, storage):
+    kept = client.post("/debts", json=DEBT).json()
+    deleted = client.post("/debts", json={**DEBT, "company_name": "Boost"}).json()
+    bulk_deleted = client.post("/debts", json={**DEBT, "company_name": "Grab"}).json()
+
+    assert client.delete(f"/debts/{deleted['id']}").status_code == 200
+    assert client.post("/debts/bulk", json={"delete": [bulk_deleted["id"]]}).json() == {"updated": 0, "deleted": 1}
+
+    assert [debt["id"] for debt in client.get("/debts").json()] == [kept["id"]]
+    for debt_id in (deleted["id"], bulk_deleted["id"]):
+        assert client.get(f"/debts/{debt_id}").status_code == 404
+        assert client.put(f"/debts/{debt_id}", json={"notes": "back"}).status_code == 404
+        assert client.delete(f"/debts/{debt_id}").status_code == 404
+    composition = client.get("/debts/composition").json()
+    assert sum(row["debt_count"] for row in composition["rows"]) == 1
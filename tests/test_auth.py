@@ -0,0 +1,63 @@
+"""
+Authentication - requests are scoped to the user of a server-signed token
+"""
+import pytest
+from backend.auth import issue_token, verify_token
+from core.config import settings
+from conftest import API_USER, auth_headers
+
+DEBT = {"company_name": "Atome", "amount_owed": 10.5, "minimum_payment": 1, "due_date": "2026-11-01"}
+
+
+def test_token_round_trip():
+    token = issue_token("alice.tan@example.com")
+    assert verify_token(token) == "alice.tan@example.com"
+
+
+def test_forged_tokens_are_rejected(monkeypatch):
+    token = issue_token("alice")
+    assert verify_token(token.replace("alice", "bob", 1)) is None
+    assert verify_token("alice") is None
+    assert verify_token("alice.") is None
+    monkeypatch.setattr(settings, "AUTH_SECRET", "another-secret")
+    assert verify_token(token) is None
+
+
+def test_issue_requires_secret_and_valid_user(monkeypatch):
+    with pytest.raises(ValueError):
+        issue_token("not a user id")
+    monkeypatch.setattr(settings, "AUTH_SECRET", "")
+    with pytest.raises(ValueError):
+        issue_token("alice")
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Bearer"},
+    {"Authorization": "Basic YWxpY2U6"},
+    {"Authorization": "Bearer alice.forged"},
+    # The old client-chosen user header is not a credential
+    {"X-User-ID": API_USER},
+])
+def test_requests_without_valid_token_are_refused(client, headers):
+    client.headers.pop("Authorization")
+    response = client.get("/debts", headers=headers)
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"].startswith("Bearer")
+
+
+def test_missing_secret_fails_closed(client, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_SECRET", "")
+    assert client.get("/debts").status_code == 503
+
+
+def test_data_is_scoped_to_the_token_user(client):
+    created = client.post("/debts", json=DEBT)
+    assert created.status_code == 201, created.text
+    debt_id = created.json()["id"]
+
+    assert [debt["id"] for debt in client.get("/debts").json()] == [debt_id]
+    other = auth_headers("bob")
+    assert client.get("/debts", headers=other).json() == []
+    assert client.get(f"/debts/{debt_id}", headers=other).status_code == 404
+    assert client.delete(f"/debts/{debt_id}", headers=other).status_code == 404
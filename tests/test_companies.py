@@ -0,0 +1,140 @@
+"""
+Company catalog - one entry per user and name, ignoring case
+"""
+import asyncio
+import sqlite3
+import pytest
+from pymongo.errors import BulkWriteError
+from backend.database import crud_db
+from backend.database.connection import get_database
+from backend.database.sqlite_db import INSERT_COMPANY, SQLiteStorage, new_id
+from conftest import use_mongodb
+
+
+async def test_names_are_unique_ignoring_case(storage):
+    maybank = await storage.add_company("alice", "Maybank")
+    assert (await storage.add_company("alice", "MAYBANK"))["id"] == maybank["id"]
+    assert (await storage.get_company_by_name("alice", "maybank"))["id"] == maybank["id"]
+    assert await storage.get_company_by_name("bob", "Maybank") is None
+    assert (await storage.add_company("bob", "maybank"))["id"] != maybank["id"]
+    assert await storage.get_all_companies("alice") == ["Maybank"]
+
+
+async def test_batch_add_resolves_existing_spellings(storage):
+    await storage.add_company("alice", "CIMB")
+    version = await storage.get_company_catalog_version("alice")
+
+    names, added = await storage.add_companies("alice", ["cimb", "Atome", "ATOME", "Boost"])
+    assert names == {"cimb": "CIMB", "Atome": "Atome", "ATOME": "Atome", "Boost": "Boost"}
+    assert added == 2
+    assert await storage.get_company_catalog_version("alice") == version + 1
+
+    # Nothing new: no insert and no catalog change
+    assert (await storage.add_companies("alice", ["boost"]))[1] == 0
+    assert await storage.get_company_catalog_version("alice") == version + 1
+
+
+class CompaniesStandIn:
+    """The companies collection with insert_many(collection, documents, **kwargs) replaced"""
+
+    def __init__(self, insert_many):
+        self.collection = get_database()["companies"]
+        self._insert_many = insert_many
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def insert_many(self, documents, **kwargs):
+        return await self._insert_many(self.collection, documents, **kwargs)
+
+
+def replace_insert_many(monkeypatch, insert_many):
+    """Make crud_db's company functions insert through insert_many"""
+    async def companies_collection():
+        return CompaniesStandIn(insert_many)
+    monkeypatch.setattr(crud_db, "get_companies_collection", companies_collection)
+
+
+async def test_batch_add_counts_only_its_own_inserts(storage, monkeypatch):
+    """Another request adds "MAYBANK" between the lookup and the insert"""
+    if isinstance(storage, SQLiteStorage):
+        real_lookup = SQLiteStorage._stored_company_names
+        calls = []
+
+        def racing_lookup(self, conn, user_id, lowers):
+            stored = real_lookup(self, conn, user_id, lowers)
+            if not calls:
+                with conn:
+                    conn.execute(INSERT_COMPANY, (new_id(), "alice", "MAYBANK"))
+            calls.append(lowers)
+            return stored
+        monkeypatch.setattr(SQLiteStorage, "_stored_company_names", racing_lookup)
+    else:
+        async def racing_insert_many(collection, documents, **kwargs):
+            await collection.insert_one({"user_id": "alice", "name": "MAYBANK", "name_lower": "maybank"})
+            return await collection.insert_many(documents, **kwargs)
+        replace_insert_many(monkeypatch, racing_insert_many)
+
+    names, added = await storage.add_companies("alice", ["Maybank", "Atome"])
+    assert added == 1
+    assert names == {"Maybank": "MAYBANK", "Atome": "Atome"}
+
+
+def test_other_insert_errors_are_raised(monkeypatch):
+    use_mongodb(monkeypatch)
+
+    async def failing_insert_many(collection, documents, **kwargs):
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "Document failed validation"}]})
+    replace_insert_many(monkeypatch, failing_insert_many)
+
+    async def run():
+        await crud_db.ensure_indexes()
+        with pytest.raises(BulkWriteError):
+            await crud_db.add_companies("alice", ["Maybank"])
+
+    asyncio.run(run())
+
+
+def test_legacy_duplicate_companies_are_merged_before_indexing(monkeypatch):
+    use_mongodb(monkeypatch)
+
+    async def run():
+        companies = get_database()["companies"]
+        await companies.insert_many([
+            {"user_id": "alice", "name": "Maybank"},
+            {"user_id": "alice", "name": "Maybank"},
+            {"user_id": "alice", "name": "maybank"},
+            {"user_id": "alice", "name": "CIMB"},
+            {"user_id": "bob", "name": "Maybank"},
+        ])
+        first = await companies.find_one({"user_id": "alice", "name": "Maybank"}, sort=[("_id", 1)])
+        await crud_db.ensure_indexes()
+        names = sorted([(company["user_id"], company["name"]) async for company in companies.find()])
+        assert names == [("alice", "CIMB"), ("alice", "Maybank"), ("bob", "Maybank")]
+        assert await companies.find_one({"_id": first["_id"]}) is not None
+        assert await crud_db.get_company_catalog_version("alice") == 1
+        assert await crud_db.get_company_catalog_version("bob") == 0
+
+    asyncio.run(run())
+
+
+def test_legacy_sqlite_case_variants_are_merged(tmp_path):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE companies (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, name TEXT NOT NULL, UNIQUE (user_id, name));
+        CREATE INDEX companies_user_name_lower ON companies (user_id, lower(name));
+        INSERT INTO companies VALUES ('a1', 'alice', 'Maybank'), ('a2', 'alice', 'MAYBANK'), ('b1', 'bob', 'maybank');
+    """)
+    conn.close()
+
+    async def run():
+        storage = SQLiteStorage(str(path))
+        await storage.ensure_indexes()
+        assert await storage.get_all_companies("alice") == ["Maybank"]
+        assert await storage.get_all_companies("bob") == ["maybank"]
+        assert await storage.get_company_catalog_version("alice") == 1
+        assert (await storage.add_companies("alice", ["maybank"]))[1] == 0
+        await storage.close()
+
+    asyncio.run(run())
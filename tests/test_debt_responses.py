@@ -0,0 +1,59 @@
+"""
+Debt list responses - the orjson fast path must produce what response_model would
+GET /debts returns its rows without FastAPI's per-item validation, so these
+tests validate the raw output against List[DebtResponse] instead.
+"""
+from typing import List
+import pyarrow as pa
+from pydantic import TypeAdapter
+from backend.models.debt_schema import DebtResponse
+from backend.money import to_cents
+
+debt_list_adapter = TypeAdapter(List[DebtResponse])
+
+DEBTS = [
+    {"company_name": "Atome", "amount_owed": 10.5, "minimum_payment": 1, "due_date": "2026-11-01", "notes": "acct 123"},
+    {"company_name": "Maybank", "amount_owed": 1250.99, "minimum_payment": 50.01, "due_date": "2026-10-10", "currency": "USD"},
+    {"company_name": "Boost", "amount_owed": 0.29, "minimum_payment": 0.01, "due_date": "2026-12-31", "status": "Paid Off"},
+]
+
+
+def test_fast_path_matches_the_response_schema(client):
+    for debt in DEBTS:
+        assert client.post("/debts", json=debt).status_code == 201
+    for params in ({}, {"status": "Paid Off"}):
+        body = client.get("/debts", params=params).json()
+        assert body
+        # Round-tripping through the schema changes nothing: no missing,
+        # extra or differently typed fields
+        assert debt_list_adapter.dump_python(debt_list_adapter.validate_python(body), mode="json") == body
+
+
+def test_arrow_export_matches_the_json_list(client):
+    for debt in DEBTS:
+        client.post("/debts", json=debt)
+    body = client.get("/debts").json()
+    table = pa.ipc.open_stream(client.get("/debts", params={"format": "arrow"}).content).read_all()
+    assert table.column("id").to_pylist() == [debt["id"] for debt in body]
+    assert table.column("amount_owed").to_pylist() == [debt["amount_owed"] for debt in body]
+    assert table.column("currency").to_pylist() == [debt["currency"] for debt in body]
+    # Cent columns are the stored integers, exact however the float amounts round
+    assert table.column("amount_owed_cents").to_pylist() == [to_cents(debt["amount_owed"]) for debt in body]
+    assert table.column("minimum_payment_cents").to_pylist() == [to_cents(debt["minimum_payment"]) for debt in body]
+    assert table.column("amount_owed_cents").type == pa.int64()
+    # JSON responses carry only the schema's decimal amounts
+    assert all("amount_owed_cents" not in debt for debt in body)
+
+
+def test_composition_labels_merged_rows_in_the_base_currency(client, monkeypatch, tmp_path):
+    from backend import money
+    from core.config import settings
+    rates = tmp_path / "fx_rates.json"
+    rates.write_text('{"base": "SGD", "rates": {"MYR": "0.30", "SGD": "1"}}')
+    monkeypatch.setattr(settings, "FX_RATES_PATH", str(rates))
+    monkeypatch.setattr(money, "_loaded", None)
+
+    client.post("/debts", json={**DEBTS[0], "currency": "SGD", "amount_owed": 0.5})
+    client.post("/debts", json={**DEBTS[1], "currency": "SGD", "amount_owed": 100})
+    rows = client.get("/debts/composition", params={"small_threshold": 1}).json()["rows"]
+    assert sorted(row["company_name"] for row in rows) == ["Maybank", "Other Debts (< SGD 1.00) - 1 items"]
@@ -0,0 +1,57 @@
+"""
+Bulk import - CSV rows validated in batches, companies resolved ignoring case
+"""
+import asyncio
+import pytest
+from backend import importer
+from core.config import settings
+from test_storage_contract import snapshot_count
+
+CSV = """company_name,amount_owed,minimum_payment,due_date,notes
+Maybank,"RM 1,250.00",50,2026-11-01,card
+MAYBANK,100.10,10,2026-11-15,
+Atome,abc,1,2026-11-01,bad amount
+atome,20,2,2026-12-01,
+"""
+
+
+def test_csv_import_reports_row_errors_and_merges_companies(client):
+    client.post("/companies/", json={"name": "maybank"})
+    response = client.post("/debts/import", files={"file": ("debts.csv", CSV, "text/csv")})
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert report["imported"] == 3
+    assert report["failed"] == 1
+    assert report["errors"][0]["row"] == 4
+    # "maybank" existed already; only "atome" is new
+    assert report["companies_added"] == 1
+    assert sorted(client.get("/companies/").json()) == ["atome", "maybank"]
+    debts = client.get("/debts").json()
+    assert sorted(debt["company_name"] for debt in debts) == ["atome", "maybank", "maybank"]
+    assert sum(round(debt["amount_owed"] * 100) for debt in debts) == 125000 + 10010 + 2000
+
+
+def test_import_rejects_a_bad_header(client):
+    response = client.post("/debts/import", files={"file": ("debts.csv", "name,amount\nA,1\n", "text/csv")})
+    assert response.status_code == 400
+    assert "missing required column" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("rows", [4, 5])
+def test_import_checks_for_a_snapshot_once_the_rows_run_out(client, storage, monkeypatch, rows):
+    # With batches of 2, four rows end on a full batch and the next read finds nothing
+    monkeypatch.setattr(importer, "IMPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "HISTORY_SNAPSHOT_INTERVAL", 3)
+    checks = []
+    checkpoint_history = storage.checkpoint_history
+
+    async def counted(user_id):
+        checks.append(user_id)
+        await checkpoint_history(user_id)
+
+    monkeypatch.setattr(storage, "checkpoint_history", counted)
+    csv = "company_name,amount_owed,minimum_payment,due_date\n" + "Atome,10,1,2026-11-01\n" * rows
+    response = client.post("/debts/import", files={"file": ("debts.csv", csv, "text/csv")})
+    assert response.json()["imported"] == rows
+    assert checks == ["alice"]
+    assert asyncio.run(snapshot_count(storage, "alice")) == 1
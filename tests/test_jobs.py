@@ -0,0 +1,185 @@
+"""
+Background jobs - progress reporting, cancellation and per-user scoping
+"""
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from backend import jobs
+from backend.database.storage import JOB_CANCELLED, JOB_FAILED, JOB_RUNNING, JOB_SUCCEEDED
+from core.config import settings
+from conftest import API_USER, auth_headers
+
+USER = API_USER
+
+def wait_for(poll, done, timeout=10.0):
+    """Call poll until done(result) holds, returning the last result"""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = poll()
+        if done(result) or time.monotonic() > deadline:
+            return result
+        time.sleep(0.02)
+
+
+def test_import_job_reports_progress_and_result(client):
+    rows = "".join(f"Maybank,{10 + i}.00,1,2026-11-01\n" for i in range(50))
+    csv = "company_name,amount_owed,minimum_payment,due_date\n" + rows
+    response = client.post("/jobs/import", files={"file": ("debts.csv", csv, "text/csv")})
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert job["type"] == "import"
+
+    job = wait_for(lambda: client.get(f"/jobs/{job['id']}").json(), lambda job: job["status"] == JOB_SUCCEEDED)
+    assert job["status"] == JOB_SUCCEEDED
+    assert job["progress"] == 1.0
+    assert job["result"]["imported"] == 50
+    assert len(client.get("/debts").json()) == 50
+    assert [listed["id"] for listed in client.get("/jobs").json()] == [job["id"]]
+    # Other users can neither see nor cancel it
+    other = auth_headers("bob")
+    assert client.get(f"/jobs/{job['id']}", headers=other).status_code == 404
+    assert client.post(f"/jobs/{job['id']}/cancel", headers=other).status_code == 404
+
+
+def test_only_per_user_jobs_can_be_started(client):
+    # The archive sweep covers every user's debts, so it is not a job type
+    assert client.post("/jobs", json={"type": "archive_sweep"}).status_code == 422
+    response = client.post("/jobs", json={"type": "rollup_rebuild"})
+    assert response.status_code == 202
+    job = wait_for(lambda: client.get(f"/jobs/{response.json()['id']}").json(),
+                   lambda job: job["status"] == JOB_SUCCEEDED)
+    assert job["status"] == JOB_SUCCEEDED
+
+
+async def test_running_job_stops_at_its_next_progress_report(storage, monkeypatch):
+    monkeypatch.setattr(jobs.JobContext, "REPORT_INTERVAL", 0)
+    steps = []
+
+    async def slow_job(context, params):
+        for step in range(1000):
+            steps.append(step)
+            context.result = {"steps": step}
+            await context.progress(step / 1000, f"step {step}")
+            await asyncio.sleep(0.005)
+        return {"steps": 1000}
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "slow", slow_job)
+    runner = jobs.JobRunner(1)
+    await runner.start()
+    try:
+        job = await runner.submit(USER, "slow")
+        while (await storage.get_job(USER, job["id"]))["status"] != JOB_RUNNING or len(steps) < 5:
+            await asyncio.sleep(0.01)
+        running = await storage.get_job(USER, job["id"])
+        assert 0 < running["progress"] < 1
+        assert running["message"].startswith("step ")
+
+        assert await storage.request_job_cancel("bob", job["id"]) is None
+        assert (await storage.request_job_cancel(USER, job["id"]))["cancel_requested"]
+        await asyncio.wait_for(runner.queue.join(), timeout=10)
+    finally:
+        await runner.stop()
+
+    cancelled = await storage.get_job(USER, job["id"])
+    assert cancelled["status"] == JOB_CANCELLED
+    assert cancelled["finished_at"] is not None
+    # The handler stopped early and its partial result was kept
+    assert len(steps) < 1000
+    assert cancelled["result"] == {"steps": steps[-1]}
+
+
+async def test_job_cancelled_while_queued_never_runs(storage, monkeypatch):
+    ran = []
+
+    async def never(context, params):
+        ran.append(context.job_id)
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "never", never)
+    runner = jobs.JobRunner(1)
+    # Queue and cancel before any worker starts
+    job = await runner.submit(USER, "never")
+    await storage.request_job_cancel(USER, job["id"])
+    await runner.start()
+    try:
+        await asyncio.wait_for(runner.queue.join(), timeout=10)
+    finally:
+        await runner.stop()
+    assert ran == []
+    assert (await storage.get_job(USER, job["id"]))["status"] == JOB_CANCELLED
+
+
+async def test_starting_workers_leaves_other_workers_jobs_alone(storage, monkeypatch):
+    # With no grace period every active job counts as left behind by a dead worker
+    monkeypatch.setattr(jobs, "STALE_JOB_MINUTES", -1)
+    job = await storage.create_job(USER, "slow", {})
+    await storage.update_job(job["id"], {"status": JOB_RUNNING})
+    runner = jobs.JobRunner(1)
+    await runner.start()
+    await runner.stop()
+    assert (await storage.get_job(USER, job["id"]))["status"] == JOB_RUNNING
+    # Only the cleanup, which runs in one process, fails it
+    assert (await jobs.clean_up_jobs())["failed"] == 1
+    assert (await storage.get_job(USER, job["id"]))["status"] == JOB_FAILED
+
+
+async def test_heartbeat_keeps_long_running_jobs_from_being_failed(storage, monkeypatch):
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.05)
+    release = asyncio.Event()
+
+    async def silent_job(context, params):
+        # Reports no progress at all until released
+        await release.wait()
+        return {}
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "silent", silent_job)
+    runner = jobs.JobRunner(1)
+    await runner.start()
+    try:
+        running = await runner.submit(USER, "silent")
+        queued = await runner.submit(USER, "silent")
+        while (await storage.get_job(USER, running["id"]))["status"] != JOB_RUNNING:
+            await asyncio.sleep(0.01)
+        cutoff = jobs.utc_now()
+        await asyncio.sleep(0.2)
+        # Both the running job and the one waiting behind it were last written
+        # before the cutoff, but the heartbeat has refreshed them since
+        assert await storage.fail_stale_jobs(cutoff) == 0
+        release.set()
+        await asyncio.wait_for(runner.queue.join(), timeout=10)
+    finally:
+        await runner.stop()
+    assert runner.held == set()
+    for job in (running, queued):
+        assert (await storage.get_job(USER, job["id"]))["status"] == JOB_SUCCEEDED
+
+
+async def test_job_failed_as_stale_while_queued_never_runs(storage, monkeypatch):
+    ran = []
+
+    async def never(context, params):
+        ran.append(context.job_id)
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, "never", never)
+    monkeypatch.setattr(jobs, "STALE_JOB_MINUTES", -1)
+    runner = jobs.JobRunner(1)
+    job = await runner.submit(USER, "never")
+    assert (await jobs.clean_up_jobs())["failed"] == 1
+    await runner.start()
+    try:
+        await asyncio.wait_for(runner.queue.join(), timeout=10)
+    finally:
+        await runner.stop()
+    assert ran == []
+    assert (await storage.get_job(USER, job["id"]))["status"] == JOB_FAILED
+
+
+def test_workers_of_a_prepared_server_skip_migrations_and_maintenance(storage, monkeypatch):
+    from backend.main import app
+    ensured = []
+    monkeypatch.setattr(settings, "SERVER_PREPARED", True)
+    monkeypatch.setattr(storage, "ensure_indexes", lambda: ensured.append(True))
+    monkeypatch.setattr(jobs.job_runner, "queue", asyncio.Queue())
+    with TestClient(app, headers=auth_headers(USER)) as client:
+        assert client.get("/health").status_code == 200
+        assert app.state.maintenance is None
+    assert ensured == []
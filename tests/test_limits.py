@@ -0,0 +1,142 @@
+"""
+Request limits - coalesced reads share one call until a write, and writes are
+rate limited per user
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from backend import limits
+from backend.limits import SingleFlight, TokenBucket
+from core.config import settings
+from conftest import auth_headers
+
+DEBT = {"company_name": "Atome", "amount_owed": 10, "minimum_payment": 1, "due_date": "2026-11-01"}
+
+class Loader:
+    """A read that blocks until released, counting how often it runs"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> dict:
+        self.calls += 1
+        call = self.calls
+        await self.release.wait()
+        return {"call": call}
+
+
+async def test_concurrent_identical_reads_run_the_loader_once():
+    flight, loader, other = SingleFlight(), Loader(), Loader()
+    readers = [asyncio.ensure_future(flight.do(("alice", "debts"), loader)) for _ in range(20)]
+    bob = asyncio.ensure_future(flight.do(("bob", "debts"), other))
+    await asyncio.sleep(0)
+    loader.release.set()
+    other.release.set()
+    results = await asyncio.gather(*readers)
+    assert loader.calls == 1
+    assert all(result is results[0] for result in results)
+    # Other users' reads are never joined
+    assert other.calls == 1 and await bob == {"call": 1}
+    # Once the call is done the next read runs it again
+    assert await flight.do(("alice", "debts"), loader) == {"call": 2}
+
+
+async def test_forget_after_a_write_refetches():
+    flight, loader = SingleFlight(), Loader()
+    before = asyncio.ensure_future(flight.do(("alice", "debts"), loader))
+    await asyncio.sleep(0)
+    flight.forget("bob")
+    joined = asyncio.ensure_future(flight.do(("alice", "debts"), loader))
+    await asyncio.sleep(0)
+    assert loader.calls == 1
+    # A write by alice detaches the read in flight; the next read starts afresh
+    flight.forget("alice")
+    after = asyncio.ensure_future(flight.do(("alice", "debts"), loader))
+    await asyncio.sleep(0)
+    loader.release.set()
+    assert await before == await joined == {"call": 1}
+    assert await after == {"call": 2}
+    assert loader.calls == 2
+
+
+async def test_one_reader_going_away_does_not_cancel_the_others():
+    flight, loader = SingleFlight(), Loader()
+    leaving = asyncio.ensure_future(flight.do(("alice", "debts"), loader))
+    staying = asyncio.ensure_future(flight.do(("alice", "debts"), loader))
+    await asyncio.sleep(0)
+    leaving.cancel()
+    loader.release.set()
+    assert await staying == {"call": 1}
+    assert leaving.cancelled()
+
+
+async def test_failed_read_reaches_every_waiter_and_is_not_kept():
+    flight, attempts = SingleFlight(), []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0)
+        raise RuntimeError("database down")
+
+    readers = [flight.do(("alice", "debts"), failing) for _ in range(3)]
+    results = await asyncio.gather(*readers, return_exceptions=True)
+    assert [type(result) for result in results] == [RuntimeError] * 3
+    assert len(attempts) == 1
+    with pytest.raises(RuntimeError):
+        await flight.do(("alice", "debts"), failing)
+    assert len(attempts) == 2
+
+
+def test_token_bucket_allows_a_burst_then_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(limits, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take("alice") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take("alice") == pytest.approx(0.5)
+    assert bucket.take("bob") == 0.0
+    now[0] += 0.5
+    assert bucket.take("alice") == 0.0
+    assert bucket.take("alice") > 0
+    # Refilling stops at the burst size
+    now[0] += 60
+    assert [bucket.take("alice") for _ in range(4)][-1] > 0
+
+
+def test_token_bucket_prunes_full_buckets(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(limits, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    monkeypatch.setattr(limits, "MAX_BUCKETS", 2)
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.take("alice")
+    bucket.take("bob")
+    now[0] += 10
+    bucket.take("carol")
+    # alice and bob had refilled, so dropping them forgets nothing
+    assert set(bucket._buckets) == {"carol"}
+
+
+@pytest.fixture
+def write_limit(monkeypatch):
+    """Writes limited to a burst of 3 per user, with next to no refill"""
+    monkeypatch.setattr(settings, "WRITE_RATE_PER_SECOND", 0.01)
+    monkeypatch.setattr(limits, "write_buckets", TokenBucket(rate=0.01, burst=3))
+
+
+def test_write_burst_is_limited_per_user(client, write_limit):
+    assert [client.post("/debts", json=DEBT).status_code for _ in range(3)] == [201] * 3
+    response = client.post("/debts", json=DEBT)
+    assert response.status_code == 429
+    assert 0 < int(response.headers["retry-after"]) <= 100
+    debt_id = client.get("/debts").json()[0]["id"]
+    assert client.delete(f"/debts/{debt_id}").status_code == 429
+    # Reads are not limited, and other users have budgets of their own
+    assert client.get("/debts").status_code == 200
+    bob = auth_headers("bob")
+    assert [client.post("/debts", json=DEBT, headers=bob).status_code for _ in range(3)] == [201] * 3
+    assert client.post("/debts", json=DEBT, headers=bob).status_code == 429
+
+
+def test_no_rate_disables_the_limit(client, write_limit, monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_RATE_PER_SECOND", 0)
+    assert [client.post("/debts", json=DEBT).status_code for _ in range(5)] == [201] * 5
@@ -0,0 +1,58 @@
+"""
+JSON Merge Patch - only changed fields are written, no-op patches write nothing
+"""
+import asyncio
+from datetime import datetime, timezone
+
+DEBT = {"company_name": "Atome", "amount_owed": 10, "minimum_payment": 1, "due_date": "2026-11-01", "notes": "acct"}
+MERGE_PATCH = {"Content-Type": "application/merge-patch+json"}
+
+
+def patch(client, debt_id, body: str, **headers):
+    return client.patch(f"/debts/{debt_id}", content=body, headers={**MERGE_PATCH, **headers})
+
+
+def event_count(storage, user_id: str) -> int:
+    """History events logged for a user so far"""
+    start, end = datetime(2000, 1, 1, tzinfo=timezone.utc), datetime(2100, 1, 1, tzinfo=timezone.utc)
+    return len(asyncio.run(storage.get_events(user_id, start, end)))
+
+
+def test_noop_patch_skips_the_write(client, storage):
+    debt = client.post("/debts", json=DEBT).json()
+    events = event_count(storage, "alice")
+
+    response = patch(client, debt["id"], '{"notes": "acct", "amount_owed": 10}')
+    assert response.status_code == 200
+    assert response.headers["x-debt-modified"] == "false"
+    assert response.json()["version"] == 1
+    # No write means no history event either
+    assert event_count(storage, "alice") == events
+
+
+def test_patch_writes_only_changed_fields(client, storage):
+    debt = client.post("/debts", json=DEBT).json()
+    events = event_count(storage, "alice")
+
+    response = patch(client, debt["id"], '{"notes": "acct", "amount_owed": 8.5}')
+    assert response.status_code == 200
+    assert response.headers["x-debt-modified"] == "true"
+    body = response.json()
+    assert body["version"] == 2
+    assert body["amount_owed"] == 8.5
+    assert body["notes"] == "acct"
+    assert event_count(storage, "alice") == events + 1
+
+
+def test_patch_null_clears_notes_only(client):
+    debt = client.post("/debts", json=DEBT).json()
+    assert patch(client, debt["id"], '{"notes": null}').json()["notes"] == ""
+    assert patch(client, debt["id"], '{"amount_owed": null}').status_code == 400
+
+
+def test_patch_honours_if_match(client):
+    debt = client.post("/debts", json=DEBT).json()
+    patch(client, debt["id"], '{"notes": "new"}')
+    stale = patch(client, debt["id"], '{"notes": "newer"}', **{"If-Match": '"1"'})
+    assert stale.status_code == 409
+    assert stale.headers["etag"] == '"2"'
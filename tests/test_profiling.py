@@ -0,0 +1,105 @@
+"""
+Request profiling - nothing installed when disabled, pass-through when unsampled,
+and profiles only for the PROFILING_TOKEN admin
+"""
+import sys
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend import profiling
+from backend.database import connection
+from backend.routers import debug_router
+from core.config import settings
+
+ADMIN_TOKEN = "profiling-admin"
+ADMIN = {"X-Profile-Token": ADMIN_TOKEN}
+
+def profiled_app() -> FastAPI:
+    """A one-route app behind ProfilingMiddleware with the debug routes, reporting whether a profiler was running"""
+    app = FastAPI()
+    app.include_router(debug_router.router)
+
+    @app.get("/ping")
+    async def ping():
+        return {"profiled": sys.getprofile() is not None}
+
+    app.add_middleware(profiling.ProfilingMiddleware)
+    return app
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    """An empty buffer of recent profiles, with ADMIN_TOKEN as the admin token"""
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", ADMIN_TOKEN)
+    # The debug routes hold their own reference to the buffer, so it is emptied in place
+    profiling.recent_profiles.clear()
+    yield profiling.recent_profiles
+    profiling.recent_profiles.clear()
+
+
+def test_disabled_profiling_installs_nothing(client):
+    if settings.PROFILING_ENABLED:
+        pytest.skip("PROFILING_ENABLED is set in this environment")
+    from backend.main import app
+    assert all(middleware.cls is not profiling.ProfilingMiddleware for middleware in app.user_middleware)
+    assert not any(getattr(route, "path", "").startswith("/debug") for route in app.routes)
+    assert client.get("/debug/profiles").status_code == 404
+    response = client.get("/debts", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_mongo_command_timer_only_when_enabled(monkeypatch, enabled):
+    created = {}
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", enabled)
+    monkeypatch.setattr(connection, "_client", None)
+    monkeypatch.setattr(connection, "AsyncIOMotorClient", lambda uri, **kwargs: created.update(kwargs) or object())
+    connection.get_client()
+    timers = [listener for listener in created["event_listeners"] if isinstance(listener, profiling.MongoCommandTimer)]
+    assert len(timers) == (1 if enabled else 0)
+
+
+def test_unsampled_requests_run_without_a_profiler(monkeypatch, profiles):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 0)
+    with TestClient(profiled_app()) as client:
+        response = client.get("/ping")
+    assert response.json() == {"profiled": False}
+    assert "x-profile-id" not in response.headers
+    assert len(profiles) == 0
+
+
+def test_admin_opted_in_request_is_profiled(monkeypatch, profiles):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 0)
+    with TestClient(profiled_app()) as client:
+        response = client.get("/ping", headers={"X-Profile": "1", **ADMIN})
+        listed = client.get("/debug/profiles", headers=ADMIN)
+    assert response.json() == {"profiled": True}
+    assert [profile.id for profile in profiles] == [response.headers["x-profile-id"]]
+    assert profiles[0].summary()["status_code"] == 200
+    assert [profile["id"] for profile in listed.json()] == [response.headers["x-profile-id"]]
+    # The profiler is switched off again once the request is done
+    assert sys.getprofile() is None
+
+
+@pytest.mark.parametrize("headers", [{"X-Profile": "1"}, {"X-Profile": "1", "X-Profile-Token": "guess"}])
+def test_x_profile_needs_the_admin_token(monkeypatch, profiles, headers):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 0)
+    with TestClient(profiled_app()) as client:
+        response = client.get("/ping", headers=headers)
+    assert response.json() == {"profiled": False}
+    assert len(profiles) == 0
+
+
+def test_debug_routes_need_the_admin_token(monkeypatch, profiles):
+    with TestClient(profiled_app()) as client:
+        client.get("/ping", headers={"X-Profile": "1", **ADMIN})
+        profile_id = profiles[0].id
+        for path in ("/debug/profiles", f"/debug/profiles/{profile_id}"):
+            assert client.get(path).status_code == 401
+            assert client.get(path, headers={"X-Profile-Token": "guess"}).status_code == 401
+            assert client.get(path, headers=ADMIN).status_code == 200
+        # Without a configured token nobody gets in, not even with an empty header
+        monkeypatch.setattr(settings, "PROFILING_TOKEN", "")
+        assert client.get("/debug/profiles", headers={"X-Profile-Token": ""}).status_code == 503
+        assert client.get("/ping", headers={"X-Profile": "1", "X-Profile-Token": ""}).json() == {"profiled": False}
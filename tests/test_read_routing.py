@@ -0,0 +1,102 @@
+"""
+Read routing - analytical MongoDB reads use the analytics handle, the rest the primary
+Which replica set member actually serves each call is checked against a live
+replica set by scripts/check_read_routing.py; these tests check the handles
+themselves and which one each storage call goes through.
+"""
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from pymongo import ReadPreference
+from backend.database import connection, crud_db
+from core.config import settings
+from test_storage_contract import debt_data
+
+USER = "alice"
+# Every handle crud_db reads or writes through, and the route each one takes
+HANDLES = {
+    "get_database": "primary",
+    "get_collection": "primary",
+    "get_analytics_database": "analytics",
+    "get_analytics_collection": "analytics",
+}
+
+@pytest.fixture
+def motor_client(monkeypatch):
+    """Handles on a real (never connected) Motor client"""
+    monkeypatch.setattr(connection, "_client", None)
+    monkeypatch.setattr(settings, "MONGODB_URI", "mongodb://localhost:1")
+    yield
+    connection.close_client()
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    """The route ("primary" or "analytics") of every handle crud_db asks for, in order"""
+    used = []
+    for name, route in HANDLES.items():
+        original = getattr(crud_db, name)
+        monkeypatch.setattr(crud_db, name, lambda original=original, route=route: used.append(route) or original())
+    return used
+
+
+def test_analytics_handle_reads_secondaries_with_bounded_staleness(motor_client, monkeypatch):
+    monkeypatch.setattr(settings, "MONGODB_ANALYTICS_MAX_STALENESS_SECONDS", 90)
+    analytics = connection.get_analytics_database()
+    assert analytics.read_preference.mongos_mode == "secondaryPreferred"
+    assert analytics.read_preference.max_staleness == 90
+    assert analytics.read_concern.level == "local"
+    assert connection.get_analytics_collection().read_preference == analytics.read_preference
+
+    assert connection.get_database().read_preference == ReadPreference.PRIMARY
+    assert connection.get_collection().read_preference == ReadPreference.PRIMARY
+
+
+def test_primary_analytics_preference_drops_the_staleness_bound(motor_client, monkeypatch):
+    monkeypatch.setattr(settings, "MONGODB_ANALYTICS_READ_PREFERENCE", "primary")
+    assert connection.get_analytics_database().read_preference == ReadPreference.PRIMARY
+
+
+@pytest.mark.parametrize("storage", ["mongodb"], indirect=True)
+async def test_writes_and_own_reads_use_the_primary(storage, routes):
+    created = await storage.create_debt(USER, debt_data())
+    await storage.update_debt(USER, created["id"], {"notes": "changed"})
+    await storage.patch_debt(USER, created["id"], {"notes": "patched"})
+    await storage.get_debt(USER, created["id"])
+    await storage.get_all_debts(USER)
+    await storage.get_all_debts(USER, status="Active Debt")
+    await storage.delete_debt(USER, created["id"])
+    assert routes and set(routes) == {"primary"}
+
+
+@pytest.mark.parametrize("storage", ["mongodb"], indirect=True)
+async def test_analytical_reads_use_the_analytics_handle(storage, routes):
+    created = await storage.create_debt(USER, debt_data())
+    await storage.update_debt(USER, created["id"], {"status": "Paid Off"})
+    await storage.archive_paid_debts(datetime.now(timezone.utc) + timedelta(minutes=1))
+    today = date.today()
+    now = datetime.now(timezone.utc)
+    routes.clear()
+
+    calls = {
+        "export": lambda: storage.get_all_debts(USER, stale_ok=True, with_cents=True),
+        "composition": lambda: storage.get_debt_composition(USER, today),
+        "rollups": lambda: storage.get_rollup_buckets(USER, today - timedelta(days=7), today),
+        "state": lambda: storage.get_state_as_of(USER, now),
+        "events": lambda: storage.get_events(USER, now - timedelta(days=1), now),
+        "archive": lambda: storage.get_archived_debts(USER),
+    }
+    for name, call in calls.items():
+        await call()
+        assert routes and set(routes) == {"analytics"}, name
+        routes.clear()
+
+
+@pytest.mark.parametrize("storage", ["mongodb"], indirect=True)
+def test_dashboard_export_reads_analytics_and_plain_list_reads_primary(storage, client, routes):
+    client.post("/debts/", json=debt_data())
+    routes.clear()
+    assert client.get("/debts", params={"format": "arrow"}).status_code == 200
+    assert set(routes) == {"analytics"}
+    routes.clear()
+    assert client.get("/debts").status_code == 200
+    assert set(routes) == {"primary"}
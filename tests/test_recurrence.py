@@ -0,0 +1,130 @@
+"""
+Recurring debts - rule validation, expansion, materialization watermarks and the calendar
+"""
+import time
+from datetime import date, timedelta
+import pytest
+from backend.recurrence import debt_calendar, falls_due, first_watermark, materialize_recurring, occurrences, valid_rule
+from core.config import settings
+
+USER = "alice"
+OTHER_USER = "bob"
+
+def template(rule: str, start_date: str = "2026-01-31", **fields) -> dict:
+    """Template fields as the router stores them"""
+    return {
+        "company_name": "Atome",
+        "amount_owed": 50.0,
+        "minimum_payment": 50.0,
+        "currency": "MYR",
+        "notes": "",
+        "rule": valid_rule(rule),
+        "start_date": start_date,
+        **fields,
+    }
+
+
+def test_valid_rule_normalizes():
+    assert valid_rule("rrule:freq=monthly;bymonthday=15") == "FREQ=MONTHLY;BYMONTHDAY=15"
+    assert valid_rule(" FREQ=WEEKLY;INTERVAL=2;COUNT=6 ") == "FREQ=WEEKLY;INTERVAL=2;COUNT=6"
+    # A UTC UNTIL is made floating, like the start date
+    assert valid_rule("FREQ=DAILY;UNTIL=20270101T000000Z") == "FREQ=DAILY;UNTIL=20270101T000000"
+
+
+@pytest.mark.parametrize("rule", [
+    "", "FREQ=HOURLY", "FREQ=DAILY;BYHOUR=9", "DTSTART:20260101\nRRULE:FREQ=DAILY", "FREQ=DAILY;EXDATE=20260101",
+    "FREQ=DAILY;INTERVAL=0", "FREQ=DAILY;INTERVAL=-1", "FREQ=DAILY;INTERVAL=1.5", "FREQ=DAILY;INTERVAL=two",
+    "FREQ=WEEKLY;COUNT=0", "FREQ=WEEKLY;COUNT=2.5", "FREQ=NONSENSE;BYDAY=XX",
+])
+def test_valid_rule_rejects(rule):
+    with pytest.raises(ValueError):
+        valid_rule(rule)
+
+
+def test_rules_that_never_fall_due_are_rejected_quickly():
+    started = time.perf_counter()
+    with pytest.raises(ValueError, match="never falls due"):
+        valid_rule("FREQ=DAILY;BYMONTH=2;BYMONTHDAY=30")
+    # dateutil alone searches such a rule for over ten seconds
+    assert time.perf_counter() - started < 3
+    # Some rules only fall due from some start dates
+    assert falls_due("FREQ=MONTHLY;BYMONTH=2", date(2026, 1, 28))
+    assert not falls_due("FREQ=MONTHLY;BYMONTH=2", date(2026, 1, 31))
+    assert falls_due("FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=29", date(2026, 1, 1))
+
+
+def test_occurrences_skip_months_without_the_day():
+    monthly = template("FREQ=MONTHLY;BYMONTHDAY=31")
+    assert occurrences(monthly, date(2026, 1, 1), date(2026, 6, 30)) == [
+        date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)
+    ]
+    month_end = template("FREQ=MONTHLY;BYMONTHDAY=-1")
+    assert occurrences(month_end, date(2026, 2, 1), date(2026, 4, 30)) == [
+        date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)
+    ]
+    # Both ends are inclusive, nothing falls before the start date, and COUNT ends the rule
+    limited = template("FREQ=WEEKLY;INTERVAL=2;COUNT=3", start_date="2026-03-02")
+    assert occurrences(limited, date(2026, 1, 1), date(2026, 12, 31)) == [
+        date(2026, 3, 2), date(2026, 3, 16), date(2026, 3, 30)
+    ]
+    assert occurrences(limited, date(2026, 3, 16), date(2026, 3, 16)) == [date(2026, 3, 16)]
+    assert occurrences(limited, date(2026, 4, 1), date(2026, 3, 1)) == []
+
+
+def test_first_watermark_does_not_back_fill():
+    today = date(2026, 6, 15)
+    assert first_watermark(date(2026, 1, 1), today) == "2026-06-14"
+    assert first_watermark(date(2026, 7, 1), today) == "2026-06-30"
+
+
+async def test_materialization_advances_the_watermark_once(storage, monkeypatch):
+    monkeypatch.setattr(settings, "RECURRING_HORIZON_DAYS", 60)
+    today = date(2026, 1, 10)
+    stored = await storage.create_template(USER, template(
+        "FREQ=MONTHLY;BYMONTHDAY=31", materialized_through=first_watermark(date(2026, 1, 31), today)
+    ))
+    await storage.create_template(OTHER_USER, template(
+        "FREQ=WEEKLY", start_date="2026-01-05", materialized_through=first_watermark(date(2026, 1, 5), today)
+    ))
+
+    assert await materialize_recurring(storage, user_id=USER, today=today) == 1
+    debts = await storage.get_all_debts(USER)
+    assert [debt["due_date"] for debt in debts] == ["2026-01-31"]
+    assert (await storage.get_template(USER, stored["id"]))["materialized_through"] == "2026-03-11"
+    # The same window again adds nothing; a later run adds only what is new
+    assert await materialize_recurring(storage, user_id=USER, today=today) == 0
+    assert await materialize_recurring(storage, user_id=USER, today=today + timedelta(days=30)) == 1
+    assert sorted(debt["due_date"] for debt in await storage.get_all_debts(USER)) == ["2026-01-31", "2026-03-31"]
+    assert await storage.get_all_debts(OTHER_USER) == []
+
+
+async def test_calendar_joins_stored_and_projected_occurrences(storage, monkeypatch):
+    monkeypatch.setattr(settings, "RECURRING_HORIZON_DAYS", 30)
+    today = date(2026, 1, 10)
+    await storage.create_template(USER, template(
+        "FREQ=MONTHLY;BYMONTHDAY=31", materialized_through=first_watermark(date(2026, 1, 31), today)
+    ))
+    await storage.create_template(OTHER_USER, template(
+        "FREQ=DAILY", start_date="2026-01-01", materialized_through=first_watermark(date(2026, 1, 1), today)
+    ))
+    await materialize_recurring(storage, today=today)
+
+    entries = await debt_calendar(storage, USER, date(2026, 1, 1), date(2026, 5, 31))
+    assert [(entry["due_date"], entry["projected"]) for entry in entries] == [
+        ("2026-01-31", False), ("2026-03-31", True), ("2026-05-31", True)
+    ]
+    assert entries[0]["debt_id"]
+    assert all(entry["company_name"] == "Atome" for entry in entries)
+
+
+def test_recurring_api_rejects_rules_that_would_hang(client):
+    debt = {"company_name": "Atome", "amount_owed": 50, "minimum_payment": 50, "start_date": "2026-01-31"}
+    assert client.post("/recurring", json={**debt, "rule": "FREQ=DAILY;INTERVAL=0"}).status_code == 422
+    assert client.post("/recurring", json={**debt, "rule": "FREQ=MONTHLY;BYMONTH=2"}).status_code == 422
+    created = client.post("/recurring", json={**debt, "rule": "FREQ=MONTHLY;BYMONTHDAY=31"})
+    assert created.status_code == 201, created.text
+    template_id = created.json()["id"]
+    # Updating only one of rule and start date is checked against the other
+    assert client.put(f"/recurring/{template_id}", json={"rule": "FREQ=MONTHLY;BYMONTH=2"}).status_code == 400
+    assert client.put(f"/recurring/{template_id}", json={"start_date": "2026-01-28"}).status_code == 200
+    assert client.put(f"/recurring/{template_id}", json={"rule": "FREQ=MONTHLY;BYMONTH=2"}).status_code == 200
@@ -0,0 +1,231 @@
+"""
+Frontend resilience - circuit breakers, adaptive timeouts and stale responses
+APIClient runs against a scripted session, so no API is needed.
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+import pytest
+import requests
+from core.config import settings
+from frontend.utils import api_client, resilience
+from frontend.utils.api_client import APIClient
+from frontend.utils.resilience import CircuitOpenError, EndpointHealth, StaleCache
+
+BASE_URL = "http://api.test"
+
+class FakeClock:
+    """Stands in for the time module in resilience.py"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+def response(status: int = 200, body: bytes = b"[]", seconds: float = 0.1) -> requests.Response:
+    """A requests.Response as the API would send it"""
+    answer = requests.Response()
+    answer.status_code = status
+    answer._content = body
+    answer.headers["Content-Type"] = "application/json"
+    answer.elapsed = timedelta(seconds=seconds)
+    answer.url = f"{BASE_URL}/debts"
+    return answer
+
+
+class ScriptedSession:
+    """Answers each request with the next scripted response, or raises it"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.timeouts = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fresh breakers and stale responses on a fake clock, with small limits"""
+    fake = FakeClock()
+    monkeypatch.setattr(resilience, "time", fake)
+    monkeypatch.setattr(resilience, "_health", {})
+    monkeypatch.setattr(api_client, "stale_responses", StaleCache(8))
+    monkeypatch.setattr(settings, "API_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(settings, "API_BREAKER_COOLDOWN_SECONDS", 15)
+    monkeypatch.setattr(settings, "API_TIMEOUT_SECONDS", 5)
+    monkeypatch.setattr(settings, "API_MIN_TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(settings, "API_STALE_MAX_AGE_SECONDS", 3600)
+    return fake
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    """Background refreshes, held back until the test runs them"""
+    pending = []
+    monkeypatch.setattr(api_client, "refresher", SimpleNamespace(submit=lambda key, refresh: pending.append(refresh)))
+    return pending
+
+
+def make_client(monkeypatch, session: ScriptedSession) -> APIClient:
+    """An APIClient whose page and refresh requests all go to session"""
+    client = APIClient(base_url=BASE_URL, token="token")
+    client.session = session
+    monkeypatch.setattr(client, "_new_session", lambda: session)
+    return client
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    health = EndpointHealth()
+    health.record_failure()
+    health.record_failure()
+    assert not health.is_open and health.allow()
+    health.record_success(0.1)
+    health.record_failure()
+    health.record_failure()
+    # The success reset the count, so this is only the second failure in a row
+    assert not health.is_open
+    health.record_failure()
+    assert health.is_open
+    assert not health.allow()
+
+
+def test_open_breaker_lets_one_trial_through_per_cooldown(clock):
+    health = EndpointHealth()
+    for _ in range(3):
+        health.record_failure()
+    clock.now += 14
+    assert not health.allow()
+    clock.now += 1
+    assert health.allow()
+    # Only one trial, however many calls are waiting
+    assert not health.allow()
+    health.record_failure()
+    clock.now += 10
+    assert not health.allow()
+    clock.now += 5
+    assert health.allow()
+    health.record_success(0.1)
+    assert not health.is_open
+    assert all(health.allow() for _ in range(3))
+
+
+def test_timeout_follows_latency_and_backs_off_after_timeouts(clock):
+    health = EndpointHealth()
+    # Nothing seen yet: the longest timeout
+    assert health.timeout() == 5
+    health.record_success(0.2)
+    assert health.timeout() == pytest.approx(0.2 + 4 * 0.1)
+    health.record_failure(timed_out=True)
+    assert health.timeout() == pytest.approx(1.2)
+    health.record_failure()
+    assert health.timeout() == pytest.approx(1.2)
+    for _ in range(5):
+        health.record_failure(timed_out=True)
+    assert health.timeout() == 5
+    health.record_success(0.2)
+    assert health.timeout() < 1
+    # Never below the minimum, however fast the route
+    for _ in range(50):
+        health.record_success(0.001)
+    assert health.timeout() == 0.1
+
+
+def test_stale_cache_expires_and_evicts(clock):
+    cache = StaleCache(2)
+    first, second, third = response(body=b"[1]"), response(body=b"[2]"), response(body=b"[3]")
+    cache.put("a", first)
+    clock.now += 60
+    assert cache.get("a") == (first, 60)
+    assert cache.get("missing") is None
+    cache.put("b", second)
+    cache.put("c", third)
+    # The least recently stored entry goes first
+    assert cache.get("a") is None
+    assert cache.get("b")[0] is second
+    clock.now += 3601
+    assert cache.get("c") is None
+
+
+def test_read_serves_the_last_good_response_while_the_route_fails(clock, refreshes, monkeypatch):
+    good = response(body=b'[{"id": "1"}]')
+    session = ScriptedSession(good, requests.exceptions.ConnectionError("refused"), response(500))
+    client = make_client(monkeypatch, session)
+    assert client._read("/debts", client.debts_endpoint).json() == [{"id": "1"}]
+    assert client.stale == {}
+
+    clock.now += 30
+    assert client._read("/debts", client.debts_endpoint) is good
+    assert client.stale == {"/debts": 30}
+    # A 5xx falls back too
+    assert client._read("/debts", client.debts_endpoint) is good
+    assert client.unavailable == set()
+    assert len(refreshes) == 2
+
+
+def test_open_breaker_serves_stale_without_calling(clock, refreshes, monkeypatch):
+    good = response()
+    failures = [requests.exceptions.ConnectionError("refused")] * 3
+    session = ScriptedSession(good, *failures, response(body=b'[{"id": "2"}]'))
+    client = make_client(monkeypatch, session)
+    client._read("/debts", client.debts_endpoint)
+    for _ in range(3):
+        client._read("/debts", client.debts_endpoint)
+    assert resilience.endpoint_health("GET /debts").is_open
+    calls = len(session.timeouts)
+
+    assert client._read("/debts", client.debts_endpoint) is good
+    assert len(session.timeouts) == calls
+    # The background refresh waits out the cooldown, then replaces the response
+    refreshes.pop()()
+    assert len(session.timeouts) == calls
+    clock.now += 15
+    refreshes.pop()()
+    assert session.timeouts[-1] == settings.API_TIMEOUT_SECONDS
+    assert not resilience.endpoint_health("GET /debts").is_open
+    refreshed, _age = api_client.stale_responses.get(("token", client.debts_endpoint, ()))
+    assert refreshed.json() == [{"id": "2"}]
+
+
+def test_read_times_out_sooner_on_a_fast_route(clock, refreshes, monkeypatch):
+    session = ScriptedSession(response(seconds=0.05), requests.exceptions.ReadTimeout("slow"), response())
+    client = make_client(monkeypatch, session)
+    client._read("/debts", client.debts_endpoint)
+    client._read("/debts", client.debts_endpoint)
+    client._read("/debts", client.debts_endpoint)
+    first, fast, backed_off = session.timeouts
+    assert first == 5
+    assert fast == pytest.approx(0.15)
+    assert backed_off == pytest.approx(0.3)
+
+
+def test_failing_route_without_a_fallback_is_unavailable(clock, refreshes, monkeypatch):
+    session = ScriptedSession(*[requests.exceptions.ConnectionError("refused")] * 4)
+    client = make_client(monkeypatch, session)
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client._read("/debts/trends", f"{BASE_URL}/debts/trends")
+    # With the breaker open nothing is sent at all
+    with pytest.raises(CircuitOpenError):
+        client._read("/debts/trends", f"{BASE_URL}/debts/trends")
+    assert len(session.timeouts) == 3
+    assert client.unavailable == {"/debts/trends"}
+    # Pages get an empty answer, and can tell it apart from having no debts
+    assert client.get_all_debts() == []
+    assert client.unavailable == {"/debts/trends", "/debts"}
+    assert client.stale == {}
+    assert refreshes == []
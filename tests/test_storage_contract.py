@@ -0,0 +1,332 @@
+"""
+Storage contract - behaviour every StorageBackend must share
+Each test runs once per backend (see the storage fixture in conftest.py).
+"""
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from backend.database import connection
+from backend.database.history import apply_event, daily_series, day_start, debt_history
+from backend.database.storage import VersionConflict, decode_archive_cursor, encode_archive_cursor
+from core.config import settings
+
+USER = "alice"
+OTHER_USER = "bob"
+# First day of the history written by write_history
+HISTORY_START = date(2026, 3, 1)
+
+def debt_data(company_name="Maybank", amount_owed=100.0, **fields) -> dict:
+    """Debt fields as the router passes them to create_debt"""
+    return {
+        "company_name": company_name,
+        "amount_owed": amount_owed,
+        "minimum_payment": 10.0,
+        "currency": "MYR",
+        "due_date": "2026-11-01",
+        "status": "Active Debt",
+        "notes": "",
+        **fields,
+    }
+
+
+async def test_create_and_get(storage):
+    created = await storage.create_debt(USER, debt_data(notes="acct 123"))
+    assert created["version"] == 1
+    assert created["amount_owed"] == 100.0
+    fetched = await storage.get_debt(USER, created["id"])
+    assert fetched == created
+    assert await storage.get_debt(OTHER_USER, created["id"]) is None
+
+
+async def test_get_all_debts_filters_by_user_and_status(storage):
+    active = await storage.create_debt(USER, debt_data("Atome"))
+    paid = await storage.create_debt(USER, debt_data("Boost", status="Paid Off"))
+    await storage.create_debt(OTHER_USER, debt_data("Grab"))
+
+    assert {debt["id"] for debt in await storage.get_all_debts(USER)} == {active["id"], paid["id"]}
+    assert [debt["id"] for debt in await storage.get_all_debts(USER, status="Paid Off")] == [paid["id"]]
+
+
+async def test_update_changes_only_the_given_fields(storage):
+    created = await storage.create_debt(USER, debt_data(notes="keep"))
+    updated = await storage.update_debt(USER, created["id"], {"amount_owed": 80.25})
+    assert updated["amount_owed"] == 80.25
+    assert updated["notes"] == "keep"
+    assert updated["version"] == 2
+    assert await storage.update_debt(OTHER_USER, created["id"], {"amount_owed": 1.0}) is None
+
+
+async def test_update_with_stale_version_conflicts(storage):
+    created = await storage.create_debt(USER, debt_data())
+    await storage.update_debt(USER, created["id"], {"notes": "first"}, expected_version=1)
+    with pytest.raises(VersionConflict) as conflict:
+        await storage.update_debt(USER, created["id"], {"notes": "second"}, expected_version=1)
+    assert conflict.value.current_version == 2
+    assert (await storage.get_debt(USER, created["id"]))["notes"] == "first"
+
+
+async def test_patch_skips_unchanged_fields(storage):
+    created = await storage.create_debt(USER, debt_data(notes="same"))
+    debt, modified = await storage.patch_debt(USER, created["id"], {"notes": "same", "amount_owed": 100.0})
+    assert not modified
+    assert debt["version"] == 1
+
+    debt, modified = await storage.patch_debt(USER, created["id"], {"notes": "same", "amount_owed": 90.0})
+    assert modified
+    assert debt["version"] == 2
+    assert debt["amount_owed"] == 90.0
+
+    with pytest.raises(VersionConflict):
+        await storage.patch_debt(USER, created["id"], {"notes": "other"}, expected_version=1)
+    assert await storage.patch_debt(USER, "0" * 24, {"notes": "other"}) is None
+
+
+async def test_delete(storage):
+    created = await storage.create_debt(USER, debt_data())
+    assert not await storage.delete_debt(OTHER_USER, created["id"])
+    assert await storage.delete_debt(USER, created["id"])
+    assert await storage.get_debt(USER, created["id"]) is None
+    assert await storage.get_all_debts(USER) == []
+    assert not await storage.delete_debt(USER, created["id"])
+
+
+async def test_bulk_status_and_delete(storage):
+    first = await storage.create_debt(USER, debt_data("Atome"))
+    second = await storage.create_debt(USER, debt_data("Boost"))
+    assert await storage.bulk_update_status(USER, [first["id"], second["id"]], "Paid Off") == 2
+    assert await storage.bulk_delete_debts(OTHER_USER, [first["id"]]) == 0
+    assert await storage.bulk_delete_debts(USER, [first["id"]]) == 1
+    assert [debt["id"] for debt in await storage.get_all_debts(USER)] == [second["id"]]
+
+
+async def test_search_ranks_matches(storage):
+    if storage.is_mongomock:
+        pytest.skip("mongomock has no $text search; set TEST_MONGODB_URI to run against MongoDB")
+    await storage.create_debt(USER, debt_data("Shopee PayLater", notes="account 998877"))
+    await storage.create_debt(USER, debt_data("Maybank", notes="card"))
+    await storage.create_debt(OTHER_USER, debt_data("Shopee"))
+
+    found = await storage.search_debts(USER, "998877")
+    assert found["total"] == 1
+    assert found["results"][0]["company_name"] == "Shopee PayLater"
+    assert (await storage.search_debts(USER, "shopee"))["total"] == 1
+    assert (await storage.search_debts(USER, "nothing"))["total"] == 0
+
+
+async def test_archive_pages_with_cursors(storage):
+    ids = []
+    for index in range(5):
+        debt = await storage.create_debt(USER, debt_data(f"Company {index}", amount_owed=10.0 + index))
+        await storage.update_debt(USER, debt["id"], {"status": "Paid Off"})
+        ids.append(debt["id"])
+    await storage.create_debt(USER, debt_data("Still active"))
+
+    cutoff = datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert await storage.archive_paid_debts(cutoff) == 5
+    assert [debt["company_name"] for debt in await storage.get_all_debts(USER)] == ["Still active"]
+    # Archived debts are still found by id
+    assert (await storage.get_debt(USER, ids[0]))["status"] == "Paid Off"
+
+    first = await storage.get_archived_debts(USER, limit=2)
+    assert first["total"] == 5
+    assert first["amount_cents"] == {"MYR": 6000}
+    seen = [debt["id"] for debt in first["results"]]
+    after = first["next_after"]
+    while after is not None:
+        # The cursor survives its round trip through the API's opaque form
+        page = await storage.get_archived_debts(USER, limit=2, after=decode_archive_cursor(encode_archive_cursor(after)))
+        assert page["total"] is None
+        seen += [debt["id"] for debt in page["results"]]
+        after = page["next_after"]
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(set(seen))
+    assert (await storage.get_archived_debts(OTHER_USER))["total"] == 0
+
+
+class FakeClock:
+    """Stands in for utc_now() in the storage backends, so writes land on chosen days
+
+    Each reading is a second after the last, so no two writes share a timestamp.
+    """
+
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        self.now += timedelta(seconds=1)
+        return self.now
+
+    def advance(self, **delta) -> None:
+        self.now += timedelta(**delta)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Writes are stamped with a fake clock starting at noon on HISTORY_START"""
+    from backend.database import crud_db, sqlite_db
+    fake = FakeClock(datetime.combine(HISTORY_START, datetime.min.time()) + timedelta(hours=12))
+    monkeypatch.setattr(crud_db, "utc_now", fake)
+    monkeypatch.setattr(sqlite_db, "utc_now", fake)
+    return fake
+
+
+async def snapshot_count(storage, user_id: str) -> int:
+    """History snapshots written for a user, read straight from the backend"""
+    if settings.STORAGE_BACKEND == "sqlite":
+        query = "SELECT COUNT(*) FROM debt_snapshots WHERE user_id = ?"
+        return storage._connect().execute(query, (user_id,)).fetchone()[0]
+    return await connection.get_database()["debt_snapshots"].count_documents({"user_id": user_id})
+
+
+async def replayed_history(storage, user_id: str, start: date, end: date) -> list:
+    """Daily balances from replaying every event since the first, with no snapshot"""
+    events = await storage.get_events(user_id, datetime(2000, 1, 1), day_start(end + timedelta(days=1)))
+    return daily_series({}, events, start, end)
+
+
+async def write_history(storage, clock) -> None:
+    """A week of creates, edits, status changes, soft deletes and an archive sweep"""
+    atome = await storage.create_debt(USER, debt_data("Atome", amount_owed=100.0))
+    boost = await storage.create_debt(USER, debt_data("Boost", amount_owed=50.0))
+    grab = await storage.create_debt(USER, debt_data("Grab", amount_owed=30.0))
+    await storage.create_debt(OTHER_USER, debt_data("Shopee", amount_owed=999.0))
+    clock.advance(days=1)
+    await storage.update_debt(USER, atome["id"], {"amount_owed": 80.0})
+    await storage.patch_debt(USER, boost["id"], {"status": "Paid Off"})
+    split = await storage.create_debt(USER, debt_data("SPayLater", amount_owed=20.0, currency="USD"))
+    clock.advance(days=1)
+    await storage.delete_debt(USER, grab["id"])
+    await storage.patch_debt(USER, split["id"], {"amount_owed": 15.0})
+    clock.advance(days=1)
+    # Moving Boost to the archive changes no balance
+    assert await storage.archive_paid_debts(clock() - timedelta(hours=1)) == 1
+    await storage.update_debt(USER, atome["id"], {"amount_owed": 60.0})
+    await storage.create_debt(USER, debt_data("Kredivo", amount_owed=40.0))
+    clock.advance(days=2)
+    await storage.delete_debt(USER, boost["id"])
+    await storage.patch_debt(USER, split["id"], {"status": "Paid Off"})
+    await storage.update_debt(USER, atome["id"], {"amount_owed": 10.0})
+    clock.advance(days=1)
+
+
+async def test_history_across_snapshots_matches_a_full_replay(storage, clock, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_SNAPSHOT_INTERVAL", 3)
+    await write_history(storage, clock)
+    assert await snapshot_count(storage, USER) >= 4
+
+    end = HISTORY_START + timedelta(days=6)
+    full = await replayed_history(storage, USER, HISTORY_START - timedelta(days=1), end)
+    assert full[0]["outstanding"] == 0 and full[-1]["active_count"] == 2
+    # Every window starts from a snapshot (or none) plus its tail of events
+    for offset, _day in enumerate(full):
+        start = HISTORY_START + timedelta(days=offset - 1)
+        assert await debt_history(storage, USER, start, end) == full[offset:], start
+    # So does the state part way through a day, between two checkpoints
+    events = await storage.get_events(USER, datetime(2000, 1, 1), day_start(end))
+    for count, event in enumerate(events):
+        state = {}
+        for earlier in events[:count]:
+            apply_event(state, earlier)
+        assert await storage.get_state_as_of(USER, event["ts"] + timedelta(microseconds=-1)) == state
+    assert await debt_history(storage, OTHER_USER, HISTORY_START, HISTORY_START) == [
+        {"date": HISTORY_START.isoformat(), "outstanding": 999.0, "paid_off": 0.0, "active_count": 1}
+    ]
+
+
+def test_history_endpoint_matches_a_full_replay(storage, client, clock, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_SNAPSHOT_INTERVAL", 3)
+    asyncio.run(write_history(storage, clock))
+    end = HISTORY_START + timedelta(days=6)
+    for start in (HISTORY_START, HISTORY_START + timedelta(days=3)):
+        response = client.get("/debts/history", params={"from": start.isoformat(), "to": end.isoformat()})
+        assert response.status_code == 200, response.text
+        assert response.json() == asyncio.run(replayed_history(storage, USER, start, end))
+
+
+def totals(rows) -> dict:
+    """Summed cents per (status, company, currency) over rollup rows"""
+    summed = {}
+    for row in rows:
+        key = (row["status"], row["company_name"], row["currency"])
+        summed[key] = summed.get(key, 0) + row["amount_cents"]
+    return summed
+
+
+async def test_rollups_follow_writes(storage):
+    today = date.today()
+    atome = await storage.create_debt(USER, debt_data("Atome", amount_owed=100.0))
+    await storage.create_debt(USER, debt_data("Boost", amount_owed=50.0))
+    await storage.update_debt(USER, atome["id"], {"amount_owed": 70.0})
+
+    baseline, rows = await storage.get_rollup_buckets(USER, today, today)
+    assert totals(baseline) == {} or set(totals(baseline).values()) == {0}
+    assert totals(rows) == {("Active Debt", "Atome", "MYR"): 7000, ("Active Debt", "Boost", "MYR"): 5000}
+    assert all(row["day"] == today.isoformat() for row in rows)
+
+    # Rebuilding from the event log gives the same buckets
+    await storage.rebuild_rollups(USER)
+    _baseline, rebuilt = await storage.get_rollup_buckets(USER, today, today)
+    assert totals(rebuilt) == totals(rows)
+    assert (await storage.get_rollup_buckets(OTHER_USER, today, today)) == ([], [])
+
+
+@pytest.mark.parametrize("storage", ["sqlite"], indirect=True)
+async def test_write_during_rollup_rebuild_is_not_lost(storage, monkeypatch):
+    from backend.database import sqlite_db
+    today = date.today()
+    await storage.create_debt(USER, debt_data("Atome", amount_owed=100.0))
+    loop = asyncio.get_running_loop()
+    written = []
+    original = sqlite_db.rollups_from_events
+
+    def rollups_with_a_concurrent_write(events):
+        events = list(events)
+        # Another request writes a debt after the rebuild has read the events
+        written.append(asyncio.run_coroutine_threadsafe(
+            storage.create_debt(USER, debt_data("Boost", amount_owed=50.0)), loop
+        ))
+        time.sleep(0.3)
+        return original(events)
+
+    monkeypatch.setattr(sqlite_db, "rollups_from_events", rollups_with_a_concurrent_write)
+    await storage.rebuild_rollups(USER)
+    await asyncio.wrap_future(written[0])
+    _baseline, rows = await storage.get_rollup_buckets(USER, today, today)
+    assert totals(rows) == {
+        ("Active Debt", "Atome", "MYR"): 10000, ("Active Debt", "Boost", "MYR"): 5000
+    }
+
+
+@pytest.mark.parametrize("storage", ["mongodb"], indirect=True)
+async def test_rollup_rebuild_retries_transient_conflicts(storage, monkeypatch):
+    from pymongo.errors import OperationFailure
+    from backend.database import crud_db
+    today = date.today()
+    await storage.create_debt(USER, debt_data("Atome", amount_owed=100.0))
+    attempts = []
+    original = crud_db.rebuild_user_rollups
+
+    async def conflicting_once(database, user_id, session=None):
+        attempts.append(user_id)
+        if len(attempts) == 1:
+            raise OperationFailure("WriteConflict", 112, {"errorLabels": ["TransientTransactionError"]})
+        await original(database, user_id, session)
+
+    monkeypatch.setattr(crud_db, "rebuild_user_rollups", conflicting_once)
+    await storage.rebuild_rollups(USER)
+    assert attempts == [USER, USER]
+    _baseline, rows = await storage.get_rollup_buckets(USER, today, today)
+    assert totals(rows) == {("Active Debt", "Atome", "MYR"): 10000}
+
+    # Anything else is not retried
+    attempts.clear()
+
+    async def unauthorized(database, user_id, session=None):
+        attempts.append(user_id)
+        raise OperationFailure("Unauthorized", 13)
+
+    monkeypatch.setattr(crud_db, "rebuild_user_rollups", unauthorized)
+    with pytest.raises(OperationFailure):
+        await storage.rebuild_rollups(USER)
+    assert attempts == [USER]
@@ -0,0 +1,46 @@
+"""
+Optimistic concurrency - debt versions, ETags and If-Match
+"""
+import pyarrow as pa
+
+DEBT = {"company_name": "Atome", "amount_owed": 10, "minimum_payment": 1, "due_date": "2026-11-01"}
+
+
+def test_versions_increase_on_every_write(client):
+    debt = client.post("/debts", json=DEBT).json()
+    assert debt["version"] == 1
+    assert client.get(f"/debts/{debt['id']}").headers["etag"] == '"1"'
+
+    updated = client.put(f"/debts/{debt['id']}", json={"notes": "a"})
+    assert updated.json()["version"] == 2
+    assert updated.headers["etag"] == '"2"'
+
+    client.post("/debts/bulk", json={"updates": [{"id": debt["id"], "status": "Paid Off"}]})
+    assert client.get("/debts").json()[0]["version"] == 3
+    table = pa.ipc.open_stream(client.get("/debts", params={"format": "arrow"}).content).read_all()
+    assert table.column("version").to_pylist() == [3]
+
+
+def test_stale_if_match_is_rejected(client):
+    debt = client.post("/debts", json=DEBT).json()
+    first = client.put(f"/debts/{debt['id']}", json={"notes": "first"}, headers={"If-Match": '"1"'})
+    assert first.status_code == 200
+
+    # A second writer still holding version 1 must not overwrite the first
+    stale = client.put(f"/debts/{debt['id']}", json={"notes": "second"}, headers={"If-Match": '"1"'})
+    assert stale.status_code == 409
+    assert stale.headers["etag"] == '"2"'
+    assert client.get(f"/debts/{debt['id']}").json()["notes"] == "first"
+
+    # Retrying with the current ETag (weak form accepted) succeeds
+    retry = client.put(f"/debts/{debt['id']}", json={"notes": "second"}, headers={"If-Match": 'W/"2"'})
+    assert retry.status_code == 200
+    assert retry.json()["notes"] == "second"
+
+
+def test_if_match_edge_cases(client):
+    debt = client.post("/debts", json=DEBT).json()
+    assert client.put(f"/debts/{debt['id']}", json={"notes": "x"}, headers={"If-Match": "*"}).status_code == 200
+    assert client.put(f"/debts/{debt['id']}", json={"notes": "x"}, headers={"If-Match": '"abc"'}).status_code == 400
+    missing = client.put(f"/debts/{'0' * 24}", json={"notes": "x"}, headers={"If-Match": '"1"'})
+    assert missing.status_code == 404